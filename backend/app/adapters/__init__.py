@@ -1,7 +1,22 @@
 """Data source adapters: CCXT, blockchain. Each returns normalized positions/balances."""
+import importlib
+
 from .base import AdapterResult, BalanceItem
-from .exchange_adapter import ExchangeAdapter
-from .wallet_adapter import WalletAdapter
+
+# Adapter modules pull in httpx, ccxt glue and chain helpers; they load on first use (or from the startup
+# warm-up in app.main), not when the app is imported.
+_LAZY = {
+    "ExchangeAdapter": ".exchange_adapter",
+    "WalletAdapter": ".wallet_adapter",
+}
+
+
+def __getattr__(name: str):
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(module, __name__), name)
+
 
 __all__ = [
     "AdapterResult",
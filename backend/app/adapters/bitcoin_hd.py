@@ -0,0 +1,460 @@
+"""
+Bitcoin HD wallet support: parse xpub/ypub/zpub keys and output descriptors, derive addresses locally.
+Public derivation only (no private keys). Pure Python: secp256k1, BIP32 CKDpub, base58check, bech32/bech32m.
+"""
+import hashlib
+import hmac
+import re
+from dataclasses import dataclass
+
+# --- secp256k1 ---------------------------------------------------------------------------------
+
+_P = 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEFFFFFC2F
+_N = 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEBAAEDCE6AF48A03BBFD25E8CD0364141
+_G = (
+    0x79BE667EF9DCBBAC55A06295CE870B07029BFCDB2DCE28D959F2815B16F81798,
+    0x483ADA7726A3C4655DA4FBFC0E1108A8FD17B448A68554199C47D08FFB10D4B8,
+)
+
+Point = tuple[int, int] | None
+
+
+def _jacobian_double(p: tuple[int, int, int]) -> tuple[int, int, int]:
+    x, y, z = p
+    if y == 0:
+        return (0, 0, 0)
+    ysq = (y * y) % _P
+    s = (4 * x * ysq) % _P
+    m = (3 * x * x) % _P
+    nx = (m * m - 2 * s) % _P
+    ny = (m * (s - nx) - 8 * ysq * ysq) % _P
+    nz = (2 * y * z) % _P
+    return (nx, ny, nz)
+
+
+def _jacobian_add(p: tuple[int, int, int], q: tuple[int, int, int]) -> tuple[int, int, int]:
+    if p[1] == 0:
+        return q
+    if q[1] == 0:
+        return p
+    u1 = (p[0] * q[2] ** 2) % _P
+    u2 = (q[0] * p[2] ** 2) % _P
+    s1 = (p[1] * q[2] ** 3) % _P
+    s2 = (q[1] * p[2] ** 3) % _P
+    if u1 == u2:
+        if s1 != s2:
+            return (0, 0, 1)
+        return _jacobian_double(p)
+    h = u2 - u1
+    r = s2 - s1
+    h2 = (h * h) % _P
+    h3 = (h * h2) % _P
+    u1h2 = (u1 * h2) % _P
+    nx = (r * r - h3 - 2 * u1h2) % _P
+    ny = (r * (u1h2 - nx) - s1 * h3) % _P
+    nz = (h * p[2] * q[2]) % _P
+    return (nx, ny, nz)
+
+
+def _from_jacobian(p: tuple[int, int, int]) -> Point:
+    if p[1] == 0 or p[2] == 0:
+        return None
+    z_inv = pow(p[2], -1, _P)
+    return ((p[0] * z_inv ** 2) % _P, (p[1] * z_inv ** 3) % _P)
+
+
+def _point_mul(k: int, point: tuple[int, int] = _G) -> Point:
+    result = (0, 0, 1)
+    addend = (point[0], point[1], 1)
+    while k:
+        if k & 1:
+            result = _jacobian_add(result, addend)
+        addend = _jacobian_double(addend)
+        k >>= 1
+    return _from_jacobian(result)
+
+
+def _point_add(a: Point, b: Point) -> Point:
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return _from_jacobian(_jacobian_add((a[0], a[1], 1), (b[0], b[1], 1)))
+
+
+def _decompress(pubkey: bytes) -> tuple[int, int]:
+    if len(pubkey) != 33 or pubkey[0] not in (2, 3):
+        raise ValueError("Invalid compressed public key")
+    x = int.from_bytes(pubkey[1:], "big")
+    y = pow((pow(x, 3, _P) + 7) % _P, (_P + 1) // 4, _P)
+    if (y * y - x ** 3 - 7) % _P != 0:
+        raise ValueError("Public key not on curve")
+    if (y & 1) != (pubkey[0] & 1):
+        y = _P - y
+    return (x, y)
+
+
+def _compress(point: tuple[int, int]) -> bytes:
+    return bytes([2 + (point[1] & 1)]) + point[0].to_bytes(32, "big")
+
+
+# --- hashing / encodings -------------------------------------------------------------------------
+
+def _ripemd160(data: bytes) -> bytes:
+    try:
+        return hashlib.new("ripemd160", data).digest()
+    except ValueError:
+        # OpenSSL 3 builds may not ship RIPEMD-160; fall back to a pure Python implementation.
+        return _ripemd160_py(data)
+
+
+def _ripemd160_py(data: bytes) -> bytes:
+    def rol(x: int, n: int) -> int:
+        return ((x << n) | (x >> (32 - n))) & 0xFFFFFFFF
+
+    fs = [
+        lambda x, y, z: x ^ y ^ z,
+        lambda x, y, z: (x & y) | (~x & z),
+        lambda x, y, z: (x | ~y) ^ z,
+        lambda x, y, z: (x & z) | (y & ~z),
+        lambda x, y, z: x ^ (y | ~z),
+    ]
+    kl = [0x00000000, 0x5A827999, 0x6ED9EBA1, 0x8F1BBCDC, 0xA953FD4E]
+    kr = [0x50A28BE6, 0x5C4DD124, 0x6D703EF3, 0x7A6D76E9, 0x00000000]
+    rl = [
+        0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15,
+        7, 4, 13, 1, 10, 6, 15, 3, 12, 0, 9, 5, 2, 14, 11, 8,
+        3, 10, 14, 4, 9, 15, 8, 1, 2, 7, 0, 6, 13, 11, 5, 12,
+        1, 9, 11, 10, 0, 8, 12, 4, 13, 3, 7, 15, 14, 5, 6, 2,
+        4, 0, 5, 9, 7, 12, 2, 10, 14, 1, 3, 8, 11, 6, 15, 13,
+    ]
+    rr = [
+        5, 14, 7, 0, 9, 2, 11, 4, 13, 6, 15, 8, 1, 10, 3, 12,
+        6, 11, 3, 7, 0, 13, 5, 10, 14, 15, 8, 12, 4, 9, 1, 2,
+        15, 5, 1, 3, 7, 14, 6, 9, 11, 8, 12, 2, 10, 0, 4, 13,
+        8, 6, 4, 1, 3, 11, 15, 0, 5, 12, 2, 13, 9, 7, 10, 14,
+        12, 15, 10, 4, 1, 5, 8, 7, 6, 2, 13, 14, 0, 3, 9, 11,
+    ]
+    sl = [
+        11, 14, 15, 12, 5, 8, 7, 9, 11, 13, 14, 15, 6, 7, 9, 8,
+        7, 6, 8, 13, 11, 9, 7, 15, 7, 12, 15, 9, 11, 7, 13, 12,
+        11, 13, 6, 7, 14, 9, 13, 15, 14, 8, 13, 6, 5, 12, 7, 5,
+        11, 12, 14, 15, 14, 15, 9, 8, 9, 14, 5, 6, 8, 6, 5, 12,
+        9, 15, 5, 11, 6, 8, 13, 12, 5, 12, 13, 14, 11, 8, 5, 6,
+    ]
+    sr = [
+        8, 9, 9, 11, 13, 15, 15, 5, 7, 7, 8, 11, 14, 14, 12, 6,
+        9, 13, 15, 7, 12, 8, 9, 11, 7, 7, 12, 7, 6, 15, 13, 11,
+        9, 7, 15, 11, 8, 6, 6, 14, 12, 13, 5, 14, 13, 13, 7, 5,
+        15, 5, 8, 11, 14, 14, 6, 14, 6, 9, 12, 9, 12, 5, 15, 8,
+        8, 5, 12, 9, 12, 5, 14, 6, 8, 13, 6, 5, 15, 13, 11, 11,
+    ]
+    h = [0x67452301, 0xEFCDAB89, 0x98BADCFE, 0x10325476, 0xC3D2E1F0]
+    msg = data + b"\x80" + b"\x00" * ((55 - len(data)) % 64) + (len(data) * 8).to_bytes(8, "little")
+    for off in range(0, len(msg), 64):
+        x = [int.from_bytes(msg[off + 4 * i : off + 4 * i + 4], "little") for i in range(16)]
+        al, bl, cl, dl, el = h
+        ar, br, cr, dr, er = h
+        for j in range(80):
+            rnd = j // 16
+            t = (rol((al + fs[rnd](bl, cl, dl) + x[rl[j]] + kl[rnd]) & 0xFFFFFFFF, sl[j]) + el) & 0xFFFFFFFF
+            al, el, dl, cl, bl = el, dl, rol(cl, 10), bl, t
+            t = (rol((ar + fs[4 - rnd](br, cr, dr) + x[rr[j]] + kr[rnd]) & 0xFFFFFFFF, sr[j]) + er) & 0xFFFFFFFF
+            ar, er, dr, cr, br = er, dr, rol(cr, 10), br, t
+        t = (h[1] + cl + dr) & 0xFFFFFFFF
+        h[1] = (h[2] + dl + er) & 0xFFFFFFFF
+        h[2] = (h[3] + el + ar) & 0xFFFFFFFF
+        h[3] = (h[4] + al + br) & 0xFFFFFFFF
+        h[4] = (h[0] + bl + cr) & 0xFFFFFFFF
+        h[0] = t
+    return b"".join(v.to_bytes(4, "little") for v in h)
+
+
+def hash160(data: bytes) -> bytes:
+    return _ripemd160(hashlib.sha256(data).digest())
+
+
+def _tagged_hash(tag: str, data: bytes) -> bytes:
+    tag_hash = hashlib.sha256(tag.encode()).digest()
+    return hashlib.sha256(tag_hash + tag_hash + data).digest()
+
+
+_B58_ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+
+
+def base58check_encode(payload: bytes) -> str:
+    data = payload + hashlib.sha256(hashlib.sha256(payload).digest()).digest()[:4]
+    n = int.from_bytes(data, "big")
+    out = ""
+    while n:
+        n, rem = divmod(n, 58)
+        out = _B58_ALPHABET[rem] + out
+    pad = len(data) - len(data.lstrip(b"\x00"))
+    return "1" * pad + out
+
+
+def base58check_decode(s: str) -> bytes:
+    n = 0
+    for ch in s:
+        idx = _B58_ALPHABET.find(ch)
+        if idx < 0:
+            raise ValueError("Invalid base58 character")
+        n = n * 58 + idx
+    body = n.to_bytes((n.bit_length() + 7) // 8, "big") if n else b""
+    pad = len(s) - len(s.lstrip("1"))
+    data = b"\x00" * pad + body
+    if len(data) < 4:
+        raise ValueError("Invalid base58check length")
+    payload, checksum = data[:-4], data[-4:]
+    if hashlib.sha256(hashlib.sha256(payload).digest()).digest()[:4] != checksum:
+        raise ValueError("Invalid base58check checksum")
+    return payload
+
+
+_BECH32_CHARSET = "qpzry9x8gf2tvdw0s3jn54khce6mua7l"
+_BECH32M_CONST = 0x2BC830A3
+
+
+def _bech32_polymod(values: list[int]) -> int:
+    gen = [0x3B6A57B2, 0x26508E6D, 0x1EA119FA, 0x3D4233DD, 0x2A1462B3]
+    chk = 1
+    for v in values:
+        top = chk >> 25
+        chk = ((chk & 0x1FFFFFF) << 5) ^ v
+        for i in range(5):
+            chk ^= gen[i] if ((top >> i) & 1) else 0
+    return chk
+
+
+def _bech32_hrp_expand(hrp: str) -> list[int]:
+    return [ord(c) >> 5 for c in hrp] + [0] + [ord(c) & 31 for c in hrp]
+
+
+def _convertbits(data: bytes, frombits: int, tobits: int, pad: bool = True) -> list[int]:
+    acc = 0
+    bits = 0
+    out: list[int] = []
+    maxv = (1 << tobits) - 1
+    for value in data:
+        acc = (acc << frombits) | value
+        bits += frombits
+        while bits >= tobits:
+            bits -= tobits
+            out.append((acc >> bits) & maxv)
+    if pad and bits:
+        out.append((acc << (tobits - bits)) & maxv)
+    return out
+
+
+def segwit_address(hrp: str, witver: int, witprog: bytes) -> str:
+    """Encode a segwit address (bech32 for v0, bech32m for v1+)."""
+    data = [witver] + _convertbits(witprog, 8, 5)
+    const = 1 if witver == 0 else _BECH32M_CONST
+    polymod = _bech32_polymod(_bech32_hrp_expand(hrp) + data + [0] * 6) ^ const
+    checksum = [(polymod >> 5 * (5 - i)) & 31 for i in range(6)]
+    return hrp + "1" + "".join(_BECH32_CHARSET[d] for d in data + checksum)
+
+
+def decode_segwit_address(address: str) -> tuple[int, bytes] | None:
+    """Decode a bech32/bech32m address to (witness version, program). None when not a valid segwit address."""
+    addr = address.strip().lower()
+    pos = addr.rfind("1")
+    if pos < 1 or pos + 7 > len(addr):
+        return None
+    hrp, data_part = addr[:pos], addr[pos + 1 :]
+    try:
+        data = [_BECH32_CHARSET.index(c) for c in data_part]
+    except ValueError:
+        return None
+    const = _bech32_polymod(_bech32_hrp_expand(hrp) + data)
+    if not data or const not in (1, _BECH32M_CONST):
+        return None
+    witver = data[0]
+    if (witver == 0) != (const == 1):
+        return None
+    prog = bytes(_convertbits(bytes(data[1:-6]), 5, 8, pad=False))
+    return witver, prog
+
+
+# --- BIP32 extended public keys ------------------------------------------------------------------
+
+# Version bytes -> default script type implied by the SLIP-132 prefix.
+_XPUB_VERSIONS: dict[bytes, str] = {
+    bytes.fromhex("0488b21e"): "pkh",       # xpub
+    bytes.fromhex("049d7cb2"): "sh-wpkh",   # ypub
+    bytes.fromhex("04b24746"): "wpkh",      # zpub
+}
+_XPUB_PREFIXES = ("xpub", "ypub", "zpub")
+
+
+@dataclass(frozen=True)
+class ExtendedPubKey:
+    """BIP32 node: compressed public key + chain code."""
+    pubkey: bytes
+    chain_code: bytes
+
+    def child(self, index: int) -> "ExtendedPubKey":
+        """Public child derivation (CKDpub). Hardened indexes are not derivable from an xpub."""
+        if index >= 0x80000000:
+            raise ValueError("Cannot derive hardened child from a public key")
+        digest = hmac.new(self.chain_code, self.pubkey + index.to_bytes(4, "big"), hashlib.sha512).digest()
+        il = int.from_bytes(digest[:32], "big")
+        if il >= _N:
+            raise ValueError("Invalid child key; skip this index")
+        point = _point_add(_point_mul(il), _decompress(self.pubkey))
+        if point is None:
+            raise ValueError("Invalid child key; skip this index")
+        return ExtendedPubKey(pubkey=_compress(point), chain_code=digest[32:])
+
+    def derive_path(self, path: list[int]) -> "ExtendedPubKey":
+        node = self
+        for index in path:
+            node = node.child(index)
+        return node
+
+
+def parse_extended_pubkey(s: str) -> tuple[ExtendedPubKey, str]:
+    """Parse an xpub/ypub/zpub. Returns (node, implied script type)."""
+    raw = base58check_decode(s.strip())
+    if len(raw) != 78:
+        raise ValueError("Invalid extended public key length")
+    script_type = _XPUB_VERSIONS.get(raw[:4])
+    if script_type is None:
+        raise ValueError("Unsupported extended key version (expected mainnet xpub, ypub or zpub)")
+    pubkey = raw[45:78]
+    _decompress(pubkey)  # validate
+    return ExtendedPubKey(pubkey=pubkey, chain_code=raw[13:45]), script_type
+
+
+# --- scripts / addresses -------------------------------------------------------------------------
+
+def _taproot_output_key(pubkey: bytes) -> bytes:
+    """BIP86 key-path-only output key: P + H_TapTweak(x(P))·G, with P lifted to even y."""
+    x = pubkey[1:]
+    p = _decompress(b"\x02" + x)
+    tweak = int.from_bytes(_tagged_hash("TapTweak", x), "big")
+    q = _point_add(p, _point_mul(tweak))
+    if q is None:
+        raise ValueError("Invalid taproot tweak")
+    return q[0].to_bytes(32, "big")
+
+
+def address_for_pubkey(pubkey: bytes, script_type: str) -> str:
+    """Mainnet address for a compressed pubkey and script type (pkh, sh-wpkh, wpkh, tr)."""
+    if script_type == "pkh":
+        return base58check_encode(b"\x00" + hash160(pubkey))
+    if script_type == "sh-wpkh":
+        redeem = b"\x00\x14" + hash160(pubkey)
+        return base58check_encode(b"\x05" + hash160(redeem))
+    if script_type == "wpkh":
+        return segwit_address("bc", 0, hash160(pubkey))
+    if script_type == "tr":
+        return segwit_address("bc", 1, _taproot_output_key(pubkey))
+    raise ValueError(f"Unsupported script type: {script_type}")
+
+
+def script_pubkey_for_address(address: str) -> bytes:
+    """scriptPubKey bytes for a mainnet address (P2PKH, P2SH, segwit v0/v1)."""
+    segwit = decode_segwit_address(address)
+    if segwit is not None:
+        witver, prog = segwit
+        return bytes([0x50 + witver if witver else 0, len(prog)]) + prog
+    raw = base58check_decode(address.strip())
+    if len(raw) != 21:
+        raise ValueError("Invalid base58 address length")
+    if raw[0] == 0x00:
+        return b"\x76\xa9\x14" + raw[1:] + b"\x88\xac"
+    if raw[0] == 0x05:
+        return b"\xa9\x14" + raw[1:] + b"\x87"
+    raise ValueError("Unsupported address version")
+
+
+# --- descriptors ---------------------------------------------------------------------------------
+
+_DESCRIPTOR_WRAPPERS = (
+    ("sh(wpkh(", "))", "sh-wpkh"),
+    ("wpkh(", ")", "wpkh"),
+    ("pkh(", ")", "pkh"),
+    ("tr(", ")", "tr"),
+)
+_KEY_ORIGIN_RE = re.compile(r"^\[[0-9a-fA-F]{8}(/[0-9]+[hH']?)*\]")
+
+
+@dataclass(frozen=True)
+class HDWallet:
+    """One account-level key and the chains to scan, e.g. receive (0) and change (1)."""
+    key: ExtendedPubKey
+    script_type: str
+    chains: tuple[tuple[int, ...], ...]
+    # Stable identifier (normalized input) used for scan-state and address caches.
+    fingerprint: str
+
+    def chain_node(self, chain: int) -> ExtendedPubKey:
+        return self.key.derive_path(list(self.chains[chain]))
+
+    def address_at(self, chain_node: ExtendedPubKey, index: int) -> str:
+        return address_for_pubkey(chain_node.child(index).pubkey, self.script_type)
+
+
+def _parse_path(steps: str) -> list[int]:
+    path: list[int] = []
+    for step in steps.split("/"):
+        if not step:
+            continue
+        if step[-1] in "hH'":
+            raise ValueError("Hardened derivation after an xpub is not possible")
+        path.append(int(step))
+    return path
+
+
+def is_hd_wallet_input(s: str) -> bool:
+    """True for an extended public key (xpub/ypub/zpub) or an output descriptor."""
+    v = (s or "").strip()
+    return v.startswith(_XPUB_PREFIXES) or "(" in v
+
+
+def parse_hd_wallet(s: str) -> HDWallet:
+    """
+    Parse xpub/ypub/zpub or a single-key descriptor: pkh(), wpkh(), sh(wpkh()), tr().
+    Bare keys scan receive (0) and change (1). Descriptors may end in /<0;1>/* (multipath),
+    /0/* (change chain /1/* inferred) or /* (single chain).
+    """
+    raw = (s or "").strip()
+    if not raw:
+        raise ValueError("Empty wallet descriptor")
+    if raw.startswith(_XPUB_PREFIXES):
+        key, script_type = parse_extended_pubkey(raw)
+        return HDWallet(key=key, script_type=script_type, chains=((0,), (1,)), fingerprint=raw)
+
+    desc = raw.split("#", 1)[0].strip()  # checksum is optional
+    for prefix, suffix, script_type in _DESCRIPTOR_WRAPPERS:
+        if desc.startswith(prefix) and desc.endswith(suffix):
+            inner = desc[len(prefix) : len(desc) - len(suffix)]
+            break
+    else:
+        raise ValueError("Unsupported descriptor (expected pkh, wpkh, sh(wpkh) or tr with one xpub)")
+
+    inner = _KEY_ORIGIN_RE.sub("", inner)
+    key_str, _, path_str = inner.partition("/")
+    key, _ = parse_extended_pubkey(key_str)
+    if not path_str:
+        return HDWallet(key=key, script_type=script_type, chains=((),), fingerprint=desc)
+    if not path_str.endswith("*"):
+        raise ValueError("Descriptor must end with /* (ranged)")
+    path_str = path_str[:-1].rstrip("/")
+
+    multipath = re.search(r"<(\d+);(\d+)>", path_str)
+    if multipath:
+        pre, post = path_str[: multipath.start()], path_str[multipath.end() :]
+        chains = tuple(
+            tuple(_parse_path(pre) + [int(multipath.group(g))] + _parse_path(post)) for g in (1, 2)
+        )
+        return HDWallet(key=key, script_type=script_type, chains=chains, fingerprint=desc)
+
+    path = _parse_path(path_str)
+    if path and path[-1] == 0:
+        # Receive chain given; scan the matching change chain too (wallet exports usually list both).
+        return HDWallet(
+            key=key, script_type=script_type, chains=(tuple(path), tuple(path[:-1] + [1])), fingerprint=desc
+        )
+    return HDWallet(key=key, script_type=script_type, chains=(tuple(path),), fingerprint=desc)
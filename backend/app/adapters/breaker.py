@@ -0,0 +1,145 @@
+"""
+Circuit breakers per upstream endpoint (host plus first path segment, so rpc.ankr.com/polygon and
+rpc.ankr.com/eth trip separately). After CIRCUIT_FAILURE_THRESHOLD consecutive failures (timeouts, connect
+errors, 5xx) the circuit opens and calls fail fast with CircuitOpenError instead of waiting out their timeout.
+After CIRCUIT_OPEN_SECONDS one trial request is let through (half-open): success closes the circuit, failure
+opens it again for twice as long (up to CIRCUIT_MAX_OPEN_SECONDS). 429s are left to quota handling and never
+trip a circuit. State is exported in /metrics and served at /debug/circuits.
+"""
+import re
+import time
+
+import httpx
+
+from app.config import get_settings
+from app.metrics import registry
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+_KEY_LIKE_SEGMENT = re.compile(r"^[A-Za-z0-9_\-]{20,}$")
+
+upstream_circuit_opened_total = registry.counter(
+    "mantracker_upstream_circuit_opened_total",
+    "Times an upstream endpoint's circuit opened after consecutive failures.",
+    ("endpoint",),
+)
+upstream_circuit_rejected_total = registry.counter(
+    "mantracker_upstream_circuit_rejected_total",
+    "Upstream calls failed fast because the endpoint's circuit was open.",
+    ("endpoint",),
+)
+
+
+class CircuitOpenError(httpx.TransportError):
+    """Raised instead of calling an endpoint whose circuit is open."""
+
+
+def endpoint_for(url: httpx.URL) -> str:
+    """Breaker key: host plus the first path segment (key-like segments masked)."""
+    first = next((seg for seg in url.path.split("/") if seg), "")
+    if _KEY_LIKE_SEGMENT.match(first):
+        first = "*"
+    return f"{url.host}/{first}" if first else url.host
+
+
+class CircuitBreaker:
+    def __init__(self, endpoint: str, threshold: int, open_seconds: float, max_open_seconds: float):
+        self.endpoint = endpoint
+        self.threshold = threshold
+        self.base_open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self.state = CLOSED
+        self.failures = 0  # consecutive
+        self.open_seconds = open_seconds
+        self.opened_at = 0.0
+        self.probing = False  # a half-open trial request is in flight
+        self.last_error: str | None = None
+
+    def allow(self) -> bool:
+        """True when a call may go out now (for half-open, this call becomes the trial)."""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.open_seconds:
+                return False
+            self.state = HALF_OPEN
+        if self.probing:
+            return False
+        self.probing = True
+        return True
+
+    def success(self) -> None:
+        self.failures = 0
+        self.probing = False
+        if self.state != CLOSED:
+            self.state = CLOSED
+            self.open_seconds = self.base_open_seconds
+
+    def failure(self, error: str) -> None:
+        self.failures += 1
+        self.last_error = error
+        if self.state == HALF_OPEN:
+            self.probing = False
+            self._open(min(self.open_seconds * 2, self.max_open_seconds))
+        elif self.state == CLOSED and self.failures >= self.threshold:
+            self._open(self.base_open_seconds)
+
+    def abandon(self) -> None:
+        """The call ended without an outcome (cancelled): free the half-open trial slot."""
+        self.probing = False
+
+    def _open(self, seconds: float) -> None:
+        self.state = OPEN
+        self.open_seconds = seconds
+        self.opened_at = time.monotonic()
+        upstream_circuit_opened_total.inc(endpoint=self.endpoint)
+
+    def status(self) -> dict:
+        retry_in = max(0.0, self.opened_at + self.open_seconds - time.monotonic()) if self.state == OPEN else 0.0
+        return {
+            "endpoint": self.endpoint,
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "retry_in_s": round(retry_in, 1),
+            "last_error": self.last_error,
+        }
+
+
+class BreakerRegistry:
+    def __init__(self) -> None:
+        settings = get_settings()
+        self.enabled = settings.circuit_breaker_enabled
+        self.threshold = max(1, settings.circuit_failure_threshold)
+        self.open_seconds = max(0.1, settings.circuit_open_seconds)
+        self.max_open_seconds = max(self.open_seconds, settings.circuit_max_open_seconds)
+        self._breakers: dict[str, CircuitBreaker] = {}
+
+    def get(self, endpoint: str) -> CircuitBreaker:
+        breaker = self._breakers.get(endpoint)
+        if breaker is None:
+            breaker = self._breakers[endpoint] = CircuitBreaker(endpoint, self.threshold, self.open_seconds, self.max_open_seconds)
+        return breaker
+
+    def state_samples(self) -> dict[tuple[str, ...], float]:
+        return {(b.endpoint,): _STATE_VALUES[b.state] for b in list(self._breakers.values())}
+
+    def status(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "failure_threshold": self.threshold,
+            "open_seconds": self.open_seconds,
+            "endpoints": [b.status() for b in sorted(self._breakers.values(), key=lambda b: b.endpoint)],
+        }
+
+
+breakers = BreakerRegistry()
+
+registry.gauge(
+    "mantracker_upstream_circuit_state",
+    "Circuit state per upstream endpoint: 0 closed, 1 half-open, 2 open.",
+    ("endpoint",),
+    callback=breakers.state_samples,
+)
@@ -0,0 +1,259 @@
+"""
+Bitcoin balance backends. Esplora HTTP (mempool.space or a self-hosted Esplora) and the Electrum protocol
+(electrs, Fulcrum, ElectrumX) over one persistent TCP connection with batched JSON-RPC requests.
+Selected via BTC_BACKEND in config.
+"""
+import asyncio
+import hashlib
+import json
+import ssl
+from typing import Any
+
+import httpx
+
+from app.adapters.http import upstream_client
+from app.adapters.bitcoin_hd import script_pubkey_for_address
+from app.config import get_settings
+
+# address -> (confirmed balance in sats, used: has any on-chain or mempool history)
+AddressStats = dict[str, tuple[int, bool]]
+
+
+class BtcBackend:
+    """Address lookups for Bitcoin balances."""
+
+    name = "base"
+
+    async def address_stats(self, addresses: list[str]) -> AddressStats:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+class EsploraBackend(BtcBackend):
+    """Esplora REST API (GET /address/{address}). Parallel lookups under a limiter, one keep-alive client."""
+
+    name = "esplora"
+
+    def __init__(self, base_url: str, concurrency: int = 8, timeout: float = 15.0):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self._limiter = asyncio.Semaphore(concurrency)
+        self._client: httpx.AsyncClient | None = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = upstream_client(timeout=self.timeout)
+        return self._client
+
+    async def _one(self, address: str) -> tuple[int, bool]:
+        async with self._limiter:
+            r = await self._get_client().get(f"{self.base_url}/address/{address}")
+        r.raise_for_status()
+        data = r.json()
+        chain = data.get("chain_stats", {})
+        mempool = data.get("mempool_stats", {})
+        satoshi = chain.get("funded_txo_sum", 0) - chain.get("spent_txo_sum", 0)
+        used = (chain.get("tx_count", 0) + mempool.get("tx_count", 0)) > 0
+        return satoshi, used
+
+    async def address_stats(self, addresses: list[str]) -> AddressStats:
+        results = await asyncio.gather(*(self._one(a) for a in addresses))
+        return dict(zip(addresses, results))
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class ElectrumError(Exception):
+    """Error response from an Electrum server."""
+
+
+def electrum_scripthash(address: str) -> str:
+    """Electrum script hash: sha256(scriptPubKey), byte-reversed, hex."""
+    return hashlib.sha256(script_pubkey_for_address(address)).digest()[::-1].hex()
+
+
+class ElectrumBackend(BtcBackend):
+    """
+    Electrum protocol client. Keeps one TCP (optionally TLS) connection open, sends requests as JSON-RPC
+    batches and matches responses by id. Reconnects on the next call after the connection drops.
+    """
+
+    name = "electrum"
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        use_ssl: bool = True,
+        verify_ssl: bool = True,
+        timeout: float = 15.0,
+        batch_size: int = 100,
+    ):
+        self.host = host
+        self.port = port
+        self.use_ssl = use_ssl
+        self.verify_ssl = verify_ssl
+        self.timeout = timeout
+        self.batch_size = batch_size
+        self._writer: asyncio.StreamWriter | None = None
+        self._reader_task: asyncio.Task | None = None
+        self._pending: dict[int, asyncio.Future] = {}
+        self._next_id = 0
+        self._connect_lock = asyncio.Lock()
+
+    def _connected(self) -> bool:
+        return self._writer is not None and not self._writer.is_closing()
+
+    async def _ensure_connected(self) -> None:
+        if self._connected():
+            return
+        async with self._connect_lock:
+            if self._connected():
+                return
+            ctx: ssl.SSLContext | None = None
+            if self.use_ssl:
+                ctx = ssl.create_default_context()
+                if not self.verify_ssl:
+                    # Self-hosted servers commonly use self-signed certificates.
+                    ctx.check_hostname = False
+                    ctx.verify_mode = ssl.CERT_NONE
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port, ssl=ctx, limit=2**24),
+                timeout=self.timeout,
+            )
+            self._writer = writer
+            self._reader_task = asyncio.create_task(self._read_loop(reader))
+            await self._send([("server.version", ["mantracker", "1.4"])])
+
+    async def _read_loop(self, reader: asyncio.StreamReader) -> None:
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    raise ConnectionError("Electrum server closed the connection")
+                msg = json.loads(line)
+                for item in msg if isinstance(msg, list) else [msg]:
+                    # Subscription notifications carry no id and are ignored.
+                    fut = self._pending.pop(item.get("id"), None) if isinstance(item, dict) else None
+                    if fut is not None and not fut.done():
+                        fut.set_result(item)
+        except Exception as e:
+            self._drop_connection(e)
+
+    def _drop_connection(self, exc: Exception) -> None:
+        if self._writer is not None:
+            self._writer.close()
+        self._writer = None
+        pending, self._pending = self._pending, {}
+        for fut in pending.values():
+            if not fut.done():
+                fut.set_exception(ConnectionError(str(exc) or "Electrum connection lost"))
+
+    async def _send(self, calls: list[tuple[str, list[Any]]]) -> list[Any]:
+        """Send calls as one batch (single object when only one) and return results in order."""
+        writer = self._writer
+        if writer is None or writer.is_closing():
+            # Dropped between _ensure_connected() and here: call_batch reconnects and retries.
+            raise ConnectionError("Electrum connection lost")
+        loop = asyncio.get_running_loop()
+        ids: list[int] = []
+        payload: list[dict] = []
+        for method, params in calls:
+            self._next_id += 1
+            ids.append(self._next_id)
+            self._pending[self._next_id] = loop.create_future()
+            payload.append({"jsonrpc": "2.0", "id": self._next_id, "method": method, "params": params})
+        futures = [self._pending[i] for i in ids]
+        body = payload[0] if len(payload) == 1 else payload
+        try:
+            writer.write((json.dumps(body) + "\n").encode())
+            await writer.drain()
+            responses = await asyncio.wait_for(asyncio.gather(*futures), timeout=self.timeout)
+        except (asyncio.TimeoutError, ConnectionError):
+            for i in ids:
+                self._pending.pop(i, None)
+            raise
+        results: list[Any] = []
+        for resp in responses:
+            err = resp.get("error")
+            if err:
+                raise ElectrumError(err.get("message") if isinstance(err, dict) else str(err))
+            results.append(resp.get("result"))
+        return results
+
+    async def call_batch(self, calls: list[tuple[str, list[Any]]]) -> list[Any]:
+        """Batched JSON-RPC over the persistent connection; retries once after a dropped connection."""
+        for attempt in range(2):
+            await self._ensure_connected()
+            try:
+                return await self._send(calls)
+            except ConnectionError:
+                if attempt:
+                    raise
+        raise ConnectionError("Electrum connection lost")
+
+    async def address_stats(self, addresses: list[str]) -> AddressStats:
+        out: AddressStats = {}
+        for i in range(0, len(addresses), self.batch_size):
+            chunk = addresses[i : i + self.batch_size]
+            hashes = [electrum_scripthash(a) for a in chunk]
+            balances = await self.call_batch([("blockchain.scripthash.get_balance", [h]) for h in hashes])
+            empty: list[int] = []
+            for j, bal in enumerate(balances):
+                bal = bal or {}
+                confirmed = int(bal.get("confirmed", 0))
+                unconfirmed = int(bal.get("unconfirmed", 0))
+                out[chunk[j]] = (confirmed, confirmed > 0 or unconfirmed != 0)
+                if not out[chunk[j]][1]:
+                    empty.append(j)
+            # Zero balance doesn't mean unused (spent outputs); history decides for the gap-limit scan.
+            if empty:
+                histories = await self.call_batch(
+                    [("blockchain.scripthash.get_history", [hashes[j]]) for j in empty]
+                )
+                for j, hist in zip(empty, histories):
+                    out[chunk[j]] = (out[chunk[j]][0], bool(hist))
+        return out
+
+    async def close(self) -> None:
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            self._reader_task = None
+        self._drop_connection(ConnectionError("Electrum backend closed"))
+
+
+_btc_backend: BtcBackend | None = None
+
+
+def get_btc_backend() -> BtcBackend:
+    """Process-wide backend chosen by settings (BTC_BACKEND=esplora|electrum)."""
+    global _btc_backend
+    if _btc_backend is None:
+        settings = get_settings()
+        kind = (settings.btc_backend or "esplora").strip().lower()
+        if kind == "electrum":
+            if not (settings.btc_electrum_host or "").strip():
+                raise ValueError("BTC_BACKEND=electrum requires BTC_ELECTRUM_HOST")
+            _btc_backend = ElectrumBackend(
+                host=settings.btc_electrum_host.strip(),
+                port=settings.btc_electrum_port,
+                use_ssl=settings.btc_electrum_ssl,
+                verify_ssl=settings.btc_electrum_ssl_verify,
+            )
+        elif kind == "esplora":
+            _btc_backend = EsploraBackend(settings.btc_esplora_url)
+        else:
+            raise ValueError(f"Unknown BTC_BACKEND: {kind}")
+    return _btc_backend
+
+
+async def close_btc_backend() -> None:
+    global _btc_backend
+    if _btc_backend is not None:
+        await _btc_backend.close()
+        _btc_backend = None
@@ -0,0 +1,246 @@
+"""
+Record/replay of upstream HTTP traffic ("cassettes") for reproducible performance runs.
+
+record: every request through the shared upstream transport is passed on and captured (status, content type,
+body, latency) into a gzip NDJSON cassette, written on shutdown or via POST /debug/cassette/save.
+replay: requests are answered from the cassette without network access, either with each response's
+recorded latency or with none, so adapter CPU cost and call counts can be compared between builds.
+
+Secrets never reach the file: request headers are not stored, API keys from settings and key-like query
+parameters are replaced with placeholders, and path segments on key-in-URL RPC hosts are masked. Requests are
+matched on the redacted method, URL and a hash of the redacted body, so replay applies the same redaction.
+Wallet addresses and balances are recorded as-is; treat cassettes as private data.
+
+Only httpx traffic goes through here: CCXT exchange calls and the Electrum backend use their own connections.
+"""
+import asyncio
+import base64
+import gzip
+import hashlib
+import json
+import os
+import re
+import time
+from collections import deque
+from urllib.parse import parse_qsl, urlencode
+
+import httpx
+
+from app.adapters.quota import quotas
+from app.config import get_settings
+from app.metrics import cache_hit, cache_miss
+
+CASSETTE_VERSION = 1
+MODES = ("off", "record", "replay")
+
+# Query parameters holding keys, signatures or per-call values (these also vary between runs).
+_SECRET_PARAM = re.compile(r"key|token|secret|sign|passphrase|password|auth|nonce|timestamp|recvwindow", re.I)
+# RPC providers that put the API key in the URL path (https://eth-mainnet.g.alchemy.com/v2/<key>).
+_KEY_IN_PATH_HOSTS = ("alchemy.com", "infura.io", "quiknode.pro", "ankr.com", "helius-rpc.com")
+_KEY_LIKE_SEGMENT = re.compile(r"^[A-Za-z0-9_\-]{20,}$")
+_REDACTED = "REDACTED"
+# Response headers worth replaying; the rest (dates, cookies, CDN ids) only make cassettes noisy.
+_KEPT_RESPONSE_HEADERS = ("content-type", "retry-after")
+
+
+def _configured_secrets() -> list[str]:
+    """Secret values from settings that can appear in upstream URLs or bodies (longest first)."""
+    settings = get_settings()
+    values = [(settings.alchemy_api_key or "").strip()]
+    solana = (settings.solana_rpc_url or "").strip()
+    if solana:
+        url = httpx.URL(solana)
+        values += [seg for seg in url.path.split("/") if len(seg) >= 8]
+        values += [v for _, v in parse_qsl(url.query.decode()) if len(v) >= 8]
+    return sorted({v for v in values if v}, key=len, reverse=True)
+
+
+def _scrub(text: str, secrets: list[str]) -> str:
+    for secret in secrets:
+        text = text.replace(secret, _REDACTED)
+    return text
+
+
+def redact_url(url: httpx.URL, secrets: list[str]) -> str:
+    host = url.host
+    path = url.path
+    if any(host == h or host.endswith("." + h) for h in _KEY_IN_PATH_HOSTS):
+        path = "/".join(_REDACTED if _KEY_LIKE_SEGMENT.match(seg) else seg for seg in path.split("/"))
+    query = [(k, _REDACTED if _SECRET_PARAM.search(k) else v) for k, v in parse_qsl(url.query.decode(), keep_blank_values=True)]
+    out = f"{url.scheme}://{host}{path}"
+    if query:
+        out += "?" + urlencode(query, safe=",:/")
+    return _scrub(out, secrets)
+
+
+def request_key(method: str, url: str, body: bytes, secrets: list[str]) -> str:
+    body_hash = hashlib.sha256(_scrub(body.decode("utf-8", "replace"), secrets).encode()).hexdigest()[:16] if body else ""
+    return f"{method} {url} {body_hash}"
+
+
+class Cassette:
+    """Recorded exchanges in request order, indexed by request key for replay."""
+
+    def __init__(self, path: str, mode: str, timing: str = "original"):
+        self.path = path
+        self.mode = mode
+        self.timing = timing
+        self.entries: list[dict] = []
+        self._by_key: dict[str, deque[dict]] = {}
+        self._last_by_key: dict[str, dict] = {}
+        self._started = time.perf_counter()
+        self._secrets = _configured_secrets()
+        self.hits = 0
+        self.repeats = 0
+        self.misses = 0
+        self.dirty = False
+
+    def key_for(self, request: httpx.Request) -> str:
+        return request_key(request.method, redact_url(request.url, self._secrets), request.content, self._secrets)
+
+    # --- Recording ---
+
+    def record(self, key: str, response: httpx.Response, body: bytes, elapsed: float) -> None:
+        try:
+            text = _scrub(body.decode("utf-8"), self._secrets)
+            payload = {"body": text}
+        except UnicodeDecodeError:
+            payload = {"body_b64": base64.b64encode(body).decode()}
+        self.entries.append({
+            "seq": len(self.entries),
+            "t_ms": round((time.perf_counter() - self._started - elapsed) * 1000, 1),
+            "key": key,
+            "status": response.status_code,
+            "headers": {h: response.headers[h] for h in _KEPT_RESPONSE_HEADERS if h in response.headers},
+            "elapsed_ms": round(elapsed * 1000, 1),
+            **payload,
+        })
+        self.dirty = True
+
+    def save(self) -> int:
+        """Write all entries (header line first); returns the number written."""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            header = {"cassette": CASSETTE_VERSION, "recorded_at": time.time(), "entries": len(self.entries)}
+            f.write(json.dumps(header, separators=(",", ":")) + "\n")
+            for entry in self.entries:
+                f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        os.replace(tmp, self.path)
+        self.dirty = False
+        return len(self.entries)
+
+    # --- Replay ---
+
+    def load(self) -> None:
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            header = json.loads(f.readline() or "{}")
+            if header.get("cassette") != CASSETTE_VERSION:
+                raise ValueError(f"Unsupported cassette format in {self.path}")
+            self.entries = [json.loads(line) for line in f if line.strip()]
+        for entry in self.entries:
+            self._by_key.setdefault(entry["key"], deque()).append(entry)
+
+    def match(self, request: httpx.Request) -> dict | None:
+        """Next recorded response for this request; once they run out, the last one again (later refreshes)."""
+        key = self.key_for(request)
+        queue = self._by_key.get(key)
+        if queue:
+            entry = queue.popleft()
+            self._last_by_key[key] = entry
+            self.hits += 1
+            cache_hit("upstream_cassette")
+            return entry
+        entry = self._last_by_key.get(key)
+        if entry is not None:
+            self.repeats += 1
+            cache_hit("upstream_cassette")
+            return entry
+        self.misses += 1
+        cache_miss("upstream_cassette")
+        return None
+
+    def status(self) -> dict:
+        return {
+            "mode": self.mode,
+            "path": self.path,
+            "timing": self.timing,
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "repeats": self.repeats,
+            "misses": self.misses,
+            "unsaved": self.dirty,
+        }
+
+
+class CassetteTransport(httpx.AsyncBaseTransport):
+    """Innermost transport layer: records real responses or serves recorded ones."""
+
+    def __init__(self, inner: httpx.AsyncBaseTransport):
+        self._inner = inner
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        active = cassette
+        if active is None:
+            return await self._inner.handle_async_request(request)
+        await request.aread()
+        if active.mode == "replay":
+            entry = active.match(request)
+            if entry is None:
+                raise httpx.ConnectError(f"No cassette entry for {request.method} {request.url.host}", request=request)
+            if active.timing == "original" and entry["elapsed_ms"] > 0:
+                await asyncio.sleep(entry["elapsed_ms"] / 1000)
+            body = base64.b64decode(entry["body_b64"]) if "body_b64" in entry else entry["body"].encode("utf-8")
+            return httpx.Response(entry["status"], headers=entry["headers"], content=body, request=request)
+
+        key = active.key_for(request)  # before inner layers can touch the request
+        started = time.perf_counter()
+        response = await self._inner.handle_async_request(request)
+        try:
+            body = await response.aread()
+        finally:
+            await response.aclose()
+        active.record(key, response, body, time.perf_counter() - started)
+        # aread() decoded the body, so hand back a plain response without transfer/content encodings.
+        headers = [(k, v) for k, v in response.headers.multi_items() if k.lower() not in ("content-encoding", "content-length", "transfer-encoding")]
+        return httpx.Response(response.status_code, headers=headers, content=body, request=request, extensions=response.extensions)
+
+    async def aclose(self) -> None:
+        await self._inner.aclose()
+
+
+cassette: Cassette | None = None
+
+
+def configure_cassette() -> Cassette | None:
+    """Set up record/replay from settings; call before any upstream client is created."""
+    global cassette
+    settings = get_settings()
+    mode = (settings.upstream_cassette_mode or "off").lower()
+    if mode not in MODES:
+        raise ValueError(f"UPSTREAM_CASSETTE_MODE must be one of {', '.join(MODES)}")
+    if mode == "off":
+        cassette = None
+        return None
+    timing = (settings.upstream_cassette_timing or "original").lower()
+    active = Cassette(settings.upstream_cassette_path, mode, timing)
+    if mode == "replay":
+        active.load()
+        # Replayed calls cost nothing upstream; budgets would only make call counts depend on quota state.
+        quotas.enforce = False
+    from app.adapters.http import add_transport_layer
+
+    add_transport_layer(CassetteTransport, innermost=True)
+    cassette = active
+    return active
+
+
+def close_cassette() -> None:
+    """Write pending recordings (best-effort on shutdown)."""
+    global cassette
+    if cassette is not None and cassette.mode == "record" and cassette.dirty:
+        try:
+            cassette.save()
+        except Exception:
+            pass
+    cassette = None
@@ -2,9 +2,11 @@
 import asyncio
 from typing import Any
 
-import httpx
-
 from app.adapters.base import AdapterResult, BalanceItem
+from app.adapters.http import instrumented_fetch, upstream_client
+from app.adapters.jupiter import fetch_jupiter_prices
+from app.deadline import publish_partial, should_skip
+from app.executors import run_exchange
 
 # Stablecoin fallback: Solana (Jupiter) -> Ethereum (DefiLlama) -> CoinGecko
 STABLECOIN_SOLANA_MINTS: dict[str, str] = {
@@ -21,7 +23,6 @@ STABLECOIN_COINGECKO_IDS: dict[str, str] = {
     "USDC": "usd-coin",
     "BUSD": "binance-usd",
 }
-JUPITER_LITE_PRICE_URL = "https://lite-api.jup.ag/price/v3"
 DEFILLAMA_PRICE_URL = "https://coins.llama.fi/prices/current"
 COINGECKO_SIMPLE_PRICE_URL = "https://api.coingecko.com/api/v3/simple/price"
 
@@ -42,6 +43,11 @@ async def _get_ccxt():
             return None, False
 
 
+async def _call_sync(exchange: Any, fn, *args: Any) -> Any:
+    """Blocking call on a sync CCXT client, in that exchange's own worker pool."""
+    return await run_exchange(getattr(exchange, "id", None) or "ccxt", fn, *args)
+
+
 async def _ensure_markets(exchange: Any, is_async: bool) -> dict[str, Any] | None:
     """
     Make sure exchange.markets is populated (load_markets) so we can map
@@ -57,7 +63,7 @@ async def _ensure_markets(exchange: Any, is_async: bool) -> dict[str, Any] | Non
         if is_async:
             markets = await load_markets()
         else:
-            markets = await asyncio.to_thread(load_markets)
+            markets = await _call_sync(exchange, load_markets)
     except Exception:
         return None
     return markets
@@ -97,7 +103,7 @@ async def _fetch_usd_prices(exchange: Any, currencies: list[str], is_async: bool
         if is_async:
             tickers = await exchange.fetch_tickers()
         else:
-            tickers = await asyncio.to_thread(exchange.fetch_tickers)
+            tickers = await _call_sync(exchange, exchange.fetch_tickers)
     except Exception:
         return {}
     if not tickers:
@@ -138,7 +144,7 @@ async def _fetch_usd_prices(exchange: Any, currencies: list[str], is_async: bool
                         if is_async:
                             ticker = await exchange.fetch_ticker(sym)
                         else:
-                            ticker = await asyncio.to_thread(exchange.fetch_ticker, sym)
+                            ticker = await _call_sync(exchange, exchange.fetch_ticker, sym)
                         # If that worked, optionally cache it back into tickers dict.
                         if isinstance(tickers, dict):
                             tickers[sym] = ticker
@@ -179,7 +185,7 @@ async def _fetch_stablecoin_prices_fallback(currencies: list[str]) -> dict[str,
     result: dict[str, float] = {}
     still_missing = [c for c in currencies if c not in result or result.get(c, 0) <= 0]
 
-    async with httpx.AsyncClient(timeout=8.0) as client:
+    async with upstream_client(timeout=8.0) as client:
         # 1) Solana (Jupiter Lite) – only for symbols we have a mint
         mints: list[str] = []
         symbol_by_mint: dict[str, str] = {}
@@ -189,21 +195,10 @@ async def _fetch_stablecoin_prices_fallback(currencies: list[str]) -> dict[str,
                 mints.append(mint)
                 symbol_by_mint[mint] = c
         if mints:
-            try:
-                ids = ",".join(mints[:50])
-                r = await client.get(f"{JUPITER_LITE_PRICE_URL}?ids={ids}")
-                r.raise_for_status()
-                data = r.json() or {}
-                for mint, info in data.items():
-                    if isinstance(info, dict) and "usdPrice" in info:
-                        try:
-                            price = float(info["usdPrice"])
-                            if price > 0 and mint in symbol_by_mint:
-                                result[symbol_by_mint[mint]] = price
-                        except (TypeError, ValueError):
-                            pass
-            except Exception:
-                pass
+            jup_prices = await fetch_jupiter_prices(mints, client)
+            for mint, price in jup_prices.items():
+                if price > 0 and mint in symbol_by_mint:
+                    result[symbol_by_mint[mint]] = price
         still_missing = [c for c in still_missing if c not in result or result.get(c, 0) <= 0]
 
         # 2) Ethereum (DefiLlama)
@@ -262,23 +257,15 @@ async def _fetch_stablecoin_prices_fallback(currencies: list[str]) -> dict[str,
     return result
 
 
-async def fetch_exchange_balances(provider: str, credential_payload: dict) -> AdapterResult:
-    """Fetch balances from a supported exchange. Credentials from encrypted payload only."""
-    ccxt, is_async = await _get_ccxt()
-    if ccxt is None:
-        return AdapterResult(balances=[], error="Exchange support not available (ccxt import failed)")
-
+def _exchange_config(credential_payload: dict) -> dict | None:
+    """CCXT constructor config from the decrypted payload. None when api_key/secret are missing."""
     api_key = credential_payload.get("api_key") or credential_payload.get("apiKey")
     secret = credential_payload.get("secret") or credential_payload.get("api_secret")
     password = credential_payload.get("password") or credential_payload.get("passphrase")
     sandbox = credential_payload.get("sandbox", False)
 
     if not api_key or not secret:
-        return AdapterResult(balances=[], error="Missing api_key or secret")
-
-    exchange_id = provider.lower() if provider else "binance"
-    if exchange_id not in ccxt.exchanges:
-        return AdapterResult(balances=[], error=f"Unsupported exchange: {exchange_id}")
+        return None
 
     config = {
         "apiKey": api_key,
@@ -290,6 +277,75 @@ async def fetch_exchange_balances(provider: str, credential_payload: dict) -> Ad
         config["password"] = password
     if sandbox:
         config["sandbox"] = True
+    return config
+
+
+def _balances_from_ccxt(balance: dict) -> list[BalanceItem]:
+    """Non-zero totals from a CCXT balance structure (no USD values yet)."""
+    balances = []
+    for currency, data in (balance.get("total") or {}).items():
+        if data is None or (isinstance(data, (int, float)) and data == 0):
+            continue
+        amount = float(data) if data else 0
+        if amount <= 0:
+            continue
+        balances.append(
+            BalanceItem(
+                asset=currency,
+                amount=amount,
+                currency=currency,
+                usd_value=None,
+            )
+        )
+    return balances
+
+
+def _with_usd_values(balances: list[BalanceItem], prices: dict[str, float]) -> list[BalanceItem]:
+    """Copy of balances with usd_value set for assets that have a price."""
+    if not prices:
+        return balances
+    new_balances = []
+    for b in balances:
+        if b.asset in prices:
+            new_balances.append(
+                BalanceItem(
+                    asset=b.asset,
+                    amount=b.amount,
+                    currency=b.currency,
+                    usd_value=round(b.amount * prices[b.asset], 2),
+                )
+            )
+        else:
+            new_balances.append(b)
+    return new_balances
+
+
+async def _resolve_usd_prices(exchange: Any, currencies: list[str], is_async: bool) -> dict[str, float]:
+    """Exchange tickers first, then stablecoin fallbacks (Solana/Jupiter -> Ethereum/DefiLlama -> CoinGecko)."""
+    if not currencies:
+        return {}
+    prices = await _fetch_usd_prices(exchange, currencies, is_async)
+    still_missing = [c for c in currencies if c not in prices]
+    stablecoin_missing = [c for c in still_missing if _is_stablecoin_for_fallback(c)]
+    if stablecoin_missing:
+        fallback_prices = await _fetch_stablecoin_prices_fallback(stablecoin_missing)
+        prices.update(fallback_prices)
+    return prices
+
+
+async def fetch_exchange_balances(provider: str, credential_payload: dict) -> AdapterResult:
+    """Fetch balances from a supported exchange. Credentials from encrypted payload only."""
+    ccxt, is_async = await _get_ccxt()
+    if ccxt is None:
+        return AdapterResult(balances=[], error="Exchange support not available (ccxt import failed)")
+
+    config = _exchange_config(credential_payload)
+    if config is None:
+        return AdapterResult(balances=[], error="Missing api_key or secret")
+
+    exchange_id = provider.lower() if provider else "binance"
+    if exchange_id not in ccxt.exchanges:
+        return AdapterResult(balances=[], error=f"Unsupported exchange: {exchange_id}")
 
     try:
         exchange_class = getattr(ccxt, exchange_id)
@@ -298,48 +354,14 @@ async def fetch_exchange_balances(provider: str, credential_payload: dict) -> Ad
             if is_async:
                 balance = await exchange.fetch_balance()
             else:
-                balance = await asyncio.to_thread(exchange.fetch_balance)
-            balances = []
-            for currency, data in (balance.get("total") or {}).items():
-                if data is None or (isinstance(data, (int, float)) and data == 0):
-                    continue
-                amount = float(data) if data else 0
-                if amount <= 0:
-                    continue
-                balances.append(
-                    BalanceItem(
-                        asset=currency,
-                        amount=amount,
-                        currency=currency,
-                        usd_value=None,
-                    )
-                )
+                balance = await _call_sync(exchange, exchange.fetch_balance)
+            balances = _balances_from_ccxt(balance)
+            publish_partial(AdapterResult(balances=balances))
+            if should_skip("exchange.prices"):
+                return AdapterResult(balances=balances)
             # Resolve USD value for all assets via exchange tickers, then stablecoin fallbacks
-            need_price = [b.asset for b in balances]
-            if need_price:
-                prices = await _fetch_usd_prices(exchange, need_price, is_async)
-                # For stablecoins still missing a price: Solana (Jupiter) -> Ethereum (DefiLlama) -> CoinGecko
-                still_missing = [c for c in need_price if c not in prices]
-                stablecoin_missing = [c for c in still_missing if _is_stablecoin_for_fallback(c)]
-                if stablecoin_missing:
-                    fallback_prices = await _fetch_stablecoin_prices_fallback(stablecoin_missing)
-                    prices.update(fallback_prices)
-                if prices:
-                    new_balances = []
-                    for b in balances:
-                        if b.asset in prices:
-                            new_balances.append(
-                                BalanceItem(
-                                    asset=b.asset,
-                                    amount=b.amount,
-                                    currency=b.currency,
-                                    usd_value=round(b.amount * prices[b.asset], 2),
-                                )
-                            )
-                        else:
-                            new_balances.append(b)
-                    balances = new_balances
-            return AdapterResult(balances=balances)
+            prices = await _resolve_usd_prices(exchange, [b.asset for b in balances], is_async)
+            return AdapterResult(balances=_with_usd_values(balances, prices))
         finally:
             # Async CCXT clients have an async close; sync ones don't.
             close = getattr(exchange, "close", None)
@@ -347,7 +369,7 @@ async def fetch_exchange_balances(provider: str, credential_payload: dict) -> Ad
                 if asyncio.iscoroutinefunction(close):
                     await close()
                 else:
-                    await asyncio.to_thread(close)
+                    await _call_sync(exchange, close)
     except Exception as e:
         return AdapterResult(balances=[], error=str(e))
 
@@ -355,4 +377,4 @@ async def fetch_exchange_balances(provider: str, credential_payload: dict) -> Ad
 class ExchangeAdapter:
     @staticmethod
     async def fetch_balances(provider: str, credential_payload: dict) -> AdapterResult:
-        return await fetch_exchange_balances(provider, credential_payload)
+        return await instrumented_fetch("exchange", provider, fetch_exchange_balances(provider, credential_payload))
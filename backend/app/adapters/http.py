@@ -0,0 +1,288 @@
+"""
+Shared HTTP layer for upstream APIs. Adapters get their httpx clients from upstream_client(), whose transport
+records per-host metrics and trace spans. It charges calls to provider quotas and fails fast on endpoints
+whose circuit is open. Request timeouts are kept within the request deadline and observed latency. Other
+cross-cutting layers (see add_transport_layer) wrap the same transport, so every upstream call goes through
+one chain.
+"""
+import asyncio
+import time
+from contextvars import ContextVar
+from typing import Awaitable, Callable
+
+import httpx
+
+from app.adapters.base import AdapterResult
+from app.adapters.breaker import CircuitOpenError, breakers, endpoint_for, upstream_circuit_rejected_total
+from app.adapters.quota import (
+    QuotaExceededError,
+    key_id,
+    quotas,
+    request_cost,
+    upstream_quota_rejected_total,
+    upstream_quota_wait_seconds_total,
+)
+from app.deadline import latencies, remaining, upstream_timeout
+from app.metrics import (
+    adapter_errors_total,
+    adapter_fetch_seconds,
+    upstream_errors_total,
+    upstream_rate_limited_total,
+    upstream_request_seconds,
+)
+from app.tracing import redact_path, span
+
+# Host suffix -> provider label. Unknown hosts are labeled by host.
+_PROVIDER_HOSTS = (
+    ("alchemy.com", "alchemy"),
+    ("mempool.space", "mempool"),
+    ("hyperliquid.xyz", "hyperliquid"),
+    ("jup.ag", "jupiter"),
+    ("llama.fi", "defillama"),
+    ("llamarpc.com", "llamarpc"),
+    ("coingecko.com", "coingecko"),
+    ("diadata.org", "diadata"),
+    ("solana.com", "solana-rpc"),
+    ("ankr.com", "ankr"),
+    ("githubusercontent.com", "github"),
+)
+
+# Account provider (exchange id or chain) the current upstream calls are made for; set by instrumented_fetch.
+upstream_chain: ContextVar[str] = ContextVar("upstream_chain", default="")
+
+
+def provider_for_host(host: str) -> str:
+    host = (host or "").lower()
+    for suffix, provider in _PROVIDER_HOSTS:
+        if host == suffix or host.endswith("." + suffix):
+            return provider
+    return host
+
+
+class MetricsTransport(httpx.AsyncBaseTransport):
+    """Latency (to response headers), status, 429 and failure counts per provider/host/chain."""
+
+    def __init__(self, inner: httpx.AsyncBaseTransport):
+        self._inner = inner
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        labels = {"provider": provider_for_host(host), "host": host, "chain": upstream_chain.get()}
+        started = time.perf_counter()
+        try:
+            response = await self._inner.handle_async_request(request)
+        except httpx.TimeoutException:
+            upstream_errors_total.inc(kind="timeout", **labels)
+            if not request.extensions.get(DEADLINE_CAPPED):
+                # The provider took at least this long: count it, so a too-tight adaptive timeout widens again.
+                timeouts = [v for v in (request.extensions.get("timeout") or {}).values() if v is not None]
+                latencies.observe(labels["provider"], max(timeouts, default=time.perf_counter() - started))
+            raise
+        except httpx.ConnectError:
+            upstream_errors_total.inc(kind="connect", **labels)
+            raise
+        except Exception:
+            upstream_errors_total.inc(kind="other", **labels)
+            raise
+        elapsed = time.perf_counter() - started
+        upstream_request_seconds.observe(elapsed, method=request.method, status=str(response.status_code), **labels)
+        if response.status_code < 500:
+            latencies.observe(labels["provider"], elapsed)
+        if response.status_code == 429:
+            upstream_rate_limited_total.inc(**labels)
+        return response
+
+    async def aclose(self) -> None:
+        await self._inner.aclose()
+
+
+class TracingTransport(httpx.AsyncBaseTransport):
+    """CLIENT span per upstream request (host and redacted path only; query strings may carry keys)."""
+
+    def __init__(self, inner: httpx.AsyncBaseTransport):
+        self._inner = inner
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        attributes = {
+            "http.request.method": request.method,
+            "server.address": host,
+            "url.path": redact_path(request.url.path),
+            "upstream.provider": provider_for_host(host),
+            "upstream.chain": upstream_chain.get(),
+        }
+        with span(f"{request.method} {host}", "CLIENT", **attributes) as s:
+            response = await self._inner.handle_async_request(request)
+            if s is not None:
+                s.set_attribute("http.response.status_code", response.status_code)
+                if response.status_code >= 400:
+                    s.set_error(f"HTTP {response.status_code}")
+            return response
+
+    async def aclose(self) -> None:
+        await self._inner.aclose()
+
+
+class QuotaTransport(httpx.AsyncBaseTransport):
+    """Charges each call to its provider's budgets; waits briefly for headroom or fails fast (QuotaExceededError)."""
+
+    def __init__(self, inner: httpx.AsyncBaseTransport):
+        self._inner = inner
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        provider = provider_for_host(request.url.host)
+        key = key_id(request.url)
+        cost = request_cost(provider, request)
+        waited = 0.0
+        while (wait := quotas.wait_for(provider, key, cost)) > 0:
+            left = remaining()
+            if waited + wait > quotas.max_wait or (left is not None and wait >= left):
+                upstream_quota_rejected_total.inc(provider=provider, key=key)
+                raise QuotaExceededError(f"{provider} budget exhausted (retry in {wait:.0f}s)", request=request)
+            await asyncio.sleep(wait)
+            waited += wait
+        if waited:
+            upstream_quota_wait_seconds_total.inc(waited, provider=provider, key=key)
+        quotas.charge(provider, key, cost)
+        return await self._inner.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        await self._inner.aclose()
+
+
+class CircuitBreakerTransport(httpx.AsyncBaseTransport):
+    """Per-endpoint circuit breaker: fails fast while open; timeouts, connect errors and 5xx count as failures."""
+
+    def __init__(self, inner: httpx.AsyncBaseTransport):
+        self._inner = inner
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if not breakers.enabled:
+            return await self._inner.handle_async_request(request)
+        endpoint = endpoint_for(request.url)
+        breaker = breakers.get(endpoint)
+        if not breaker.allow():
+            upstream_circuit_rejected_total.inc(endpoint=endpoint)
+            raise CircuitOpenError(f"{endpoint} unavailable (circuit open after {breaker.failures} failures)", request=request)
+        try:
+            response = await self._inner.handle_async_request(request)
+        except QuotaExceededError:
+            breaker.abandon()  # our own budget, not the endpoint's health
+            raise
+        except httpx.TimeoutException as e:
+            if request.extensions.get(DEADLINE_CAPPED) or request.extensions.get(ADAPTIVE_CAPPED):
+                breaker.abandon()  # cut short by our deadline or adaptive timeout, not a sign the endpoint is down
+            else:
+                breaker.failure(type(e).__name__)
+            raise
+        except httpx.TransportError as e:
+            breaker.failure(type(e).__name__)
+            raise
+        except BaseException:
+            breaker.abandon()
+            raise
+        if response.status_code >= 500:
+            breaker.failure(f"HTTP {response.status_code}")
+        else:
+            breaker.success()
+        return response
+
+    async def aclose(self) -> None:
+        await self._inner.aclose()
+
+
+class DeadlineExceededError(httpx.TimeoutException):
+    """Raised instead of starting a request after the current deadline has passed."""
+
+
+# Request extensions set when the deadline, or else the provider's adaptive timeout, shortened a request's timeout.
+DEADLINE_CAPPED = "mantracker_deadline_capped"
+ADAPTIVE_CAPPED = "mantracker_adaptive_capped"
+
+
+class DeadlineTransport(httpx.AsyncBaseTransport):
+    """Caps each request's timeouts at the provider's adaptive timeout and the time left before the deadline."""
+
+    def __init__(self, inner: httpx.AsyncBaseTransport):
+        self._inner = inner
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        left = remaining()
+        if left is not None and left <= 0:
+            raise DeadlineExceededError("Deadline exceeded before the request was sent", request=request)
+        timeouts = dict(request.extensions.get("timeout") or {})
+        configured = max((v for v in timeouts.values() if v is not None), default=None)
+        if configured is not None:
+            limit = upstream_timeout(provider_for_host(request.url.host), configured)
+            if limit < configured:
+                request.extensions["timeout"] = {k: limit if v is None else min(v, limit) for k, v in timeouts.items()}
+                if left is not None and left <= limit:
+                    request.extensions[DEADLINE_CAPPED] = True
+                else:
+                    request.extensions[ADAPTIVE_CAPPED] = True
+        return await self._inner.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        await self._inner.aclose()
+
+
+TransportLayer = Callable[[httpx.AsyncBaseTransport], httpx.AsyncBaseTransport]
+
+# Applied innermost first around the network transport. Quota, circuit breaker and deadline sit inside tracing,
+# so refused and delayed calls show up in the waterfall, and outside metrics, so refused calls are not counted as
+# upstream requests. An open circuit refuses before the quota is charged.
+_transport_layers: list[TransportLayer] = [
+    MetricsTransport,
+    QuotaTransport,
+    CircuitBreakerTransport,
+    DeadlineTransport,
+    TracingTransport,
+]
+
+# Arguments httpx.AsyncClient would otherwise hand to its default transport.
+_TRANSPORT_ARGS = ("verify", "cert", "http1", "http2", "limits", "trust_env")
+
+
+def add_transport_layer(layer: TransportLayer, innermost: bool = False) -> None:
+    """
+    Wrap every upstream transport created from now on (outermost so far). innermost=True puts the layer
+    right around the network transport instead, below metrics and tracing (e.g. to redirect requests).
+    """
+    if layer not in _transport_layers:
+        if innermost:
+            _transport_layers.insert(0, layer)
+        else:
+            _transport_layers.append(layer)
+
+
+def build_transport(**transport_kwargs) -> httpx.AsyncBaseTransport:
+    transport: httpx.AsyncBaseTransport = httpx.AsyncHTTPTransport(**transport_kwargs)
+    for layer in _transport_layers:
+        transport = layer(transport)
+    return transport
+
+
+def upstream_client(**kwargs) -> httpx.AsyncClient:
+    """httpx.AsyncClient for upstream APIs (same arguments), routed through the shared transport chain."""
+    transport_kwargs = {k: kwargs.pop(k) for k in _TRANSPORT_ARGS if k in kwargs}
+    return httpx.AsyncClient(transport=build_transport(**transport_kwargs), **kwargs)
+
+
+async def instrumented_fetch(adapter: str, provider: str, fetch: Awaitable[AdapterResult]) -> AdapterResult:
+    """Await an adapter fetch, recording latency and errors; upstream calls inside are labeled with the provider."""
+    provider = (provider or "").lower()
+    token = upstream_chain.set(provider)
+    started = time.perf_counter()
+    try:
+        with span(f"{adapter}.fetch_balances", adapter=adapter, provider=provider) as s:
+            result = await fetch
+            if s is not None:
+                s.set_attribute("balances", len(result.balances))
+                if result.error:
+                    s.set_error(result.error)
+    finally:
+        adapter_fetch_seconds.observe(time.perf_counter() - started, adapter=adapter, provider=provider)
+        upstream_chain.reset(token)
+    if result.error:
+        adapter_errors_total.inc(adapter=adapter, provider=provider)
+    return result
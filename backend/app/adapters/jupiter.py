@@ -0,0 +1,156 @@
+"""
+Jupiter Lite price client. Batches run concurrently; prices are cached per mint and shared across wallets, and a
+mint already being fetched by another call is awaited rather than requested again.
+"""
+import asyncio
+import weakref
+
+import httpx
+
+from app.adapters.http import upstream_client
+from app.metrics import cache_coalesced, cache_hit, cache_miss
+
+JUPITER_LITE_PRICE_URL = "https://lite-api.jup.ag/price/v3"
+
+# Keep requests small enough for URL length, but large enough to avoid many round-trips.
+_JUPITER_BATCH_SIZE = 75
+# Max batches in flight at once (token-heavy wallets fan out into many batches).
+_JUPITER_CONCURRENCY = 8
+_JUPITER_PRICE_TTL = 60.0  # seconds
+# Expired entries are kept this long as a fallback when Jupiter fails, and at most this many entries are kept.
+_JUPITER_STALE_MAX_AGE = 3600.0  # seconds
+_JUPITER_PRICE_CACHE_MAX = 20_000
+
+# mint -> (usd_price or None when Jupiter has no price, fetched_at). Misses are cached too so
+# unpriceable spam tokens don't trigger a request on every refresh. Kept in fetch order (oldest first).
+_jupiter_price_cache: dict[str, tuple[float | None, float]] = {}
+# One limiter per event loop (a semaphore is bound to the loop it is first used on).
+_jupiter_limiters: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore] = weakref.WeakKeyDictionary()
+# mint -> future for the fetch already in flight (resolves to the price served, or None). Concurrent calls for the
+# same mints (a batch of wallets on a cold cache) await it instead of requesting those mints again.
+_jupiter_inflight: dict[str, asyncio.Future] = {}
+
+
+def _limiter() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    limiter = _jupiter_limiters.get(loop)
+    if limiter is None:
+        limiter = _jupiter_limiters[loop] = asyncio.Semaphore(_JUPITER_CONCURRENCY)
+    return limiter
+
+
+def _sweep_price_cache(now: float) -> None:
+    """Drop entries older than _JUPITER_STALE_MAX_AGE, then the oldest ones beyond _JUPITER_PRICE_CACHE_MAX."""
+    excess = len(_jupiter_price_cache) - _JUPITER_PRICE_CACHE_MAX
+    for mint, (_, fetched_at) in list(_jupiter_price_cache.items()):
+        if excess <= 0 and now - fetched_at < _JUPITER_STALE_MAX_AGE:
+            break
+        del _jupiter_price_cache[mint]
+        excess -= 1
+
+
+async def _fetch_batch(client: httpx.AsyncClient, batch: list[str]) -> dict[str, float] | None:
+    """One Jupiter request under the shared limiter. Returns None when the request failed."""
+    async with _limiter():
+        try:
+            # Best-effort: prices are optional. Fail fast so balances still return.
+            r = await client.get(f"{JUPITER_LITE_PRICE_URL}?ids={','.join(batch)}", timeout=6.0)
+            r.raise_for_status()
+            data = r.json()
+        except Exception:
+            return None
+    out: dict[str, float] = {}
+    for mint, info in (data or {}).items():
+        if isinstance(info, dict) and "usdPrice" in info:
+            try:
+                out[mint] = float(info["usdPrice"])
+            except (TypeError, ValueError):
+                pass
+    return out
+
+
+def _serve_stale(mints: list[str], out: dict[str, float]) -> None:
+    """Expired cached prices for these mints, when there are any."""
+    stale = [m for m in mints if (_jupiter_price_cache.get(m) or (None,))[0] is not None]
+    for mint in stale:
+        out[mint] = _jupiter_price_cache[mint][0]
+    cache_hit("jupiter_price_stale", len(stale))
+
+
+async def fetch_jupiter_prices(
+    mints: list[str], client: httpx.AsyncClient | None = None, cached_only: bool = False
+) -> dict[str, float]:
+    """
+    Fetch USD prices for the given mints. Returns mint -> usd_price (mints without a price are omitted).
+    Cached mints are served from memory; the rest are split into batches fetched in one parallel round.
+    With cached_only (deadline close), expired cache entries are served instead of fetching.
+    """
+    unique = list(dict.fromkeys(m for m in mints if m))
+    if not unique:
+        return {}
+    loop = asyncio.get_running_loop()
+    now = loop.time()
+    out: dict[str, float] = {}
+    missing: list[str] = []
+    for mint in unique:
+        cached = _jupiter_price_cache.get(mint)
+        if cached and (now - cached[1]) < _JUPITER_PRICE_TTL:
+            if cached[0] is not None:
+                out[mint] = cached[0]
+        else:
+            missing.append(mint)
+    cache_hit("jupiter_price", len(unique) - len(missing))
+    if not missing:
+        return out
+    if cached_only:
+        cache_miss("jupiter_price", len(missing))
+        _serve_stale(missing, out)
+        return out
+
+    waiting = {m: f for m in missing if (f := _jupiter_inflight.get(m)) is not None and f.get_loop() is loop}
+    missing = [m for m in missing if m not in waiting]
+    cache_coalesced("jupiter_price", len(waiting))
+    cache_miss("jupiter_price", len(missing))
+    owned = {m: loop.create_future() for m in missing}
+    _jupiter_inflight.update(owned)
+    try:
+        await _fetch_missing(missing, client, out)
+    finally:
+        for mint, fut in owned.items():
+            if _jupiter_inflight.get(mint) is fut:
+                del _jupiter_inflight[mint]
+            if not fut.done():
+                fut.set_result(out.get(mint))
+    if waiting:
+        # Shielded so a caller timing out doesn't cancel the futures the fetching call resolves.
+        prices = await asyncio.gather(*(asyncio.shield(f) for f in waiting.values()))
+        out.update((m, p) for m, p in zip(waiting, prices) if p is not None)
+        _serve_stale([m for m, p in zip(waiting, prices) if p is None], out)
+    return out
+
+
+async def _fetch_missing(missing: list[str], client: httpx.AsyncClient | None, out: dict[str, float]) -> None:
+    """Fetch uncached mints into the cache and out; failed batches are served from expired entries."""
+    if not missing:
+        return
+    batches = [missing[i : i + _JUPITER_BATCH_SIZE] for i in range(0, len(missing), _JUPITER_BATCH_SIZE)]
+    if client is None:
+        async with upstream_client() as own_client:
+            results = await asyncio.gather(*(_fetch_batch(own_client, b) for b in batches))
+    else:
+        results = await asyncio.gather(*(_fetch_batch(client, b) for b in batches))
+
+    fetched_at = asyncio.get_running_loop().time()
+    for batch, prices in zip(batches, results):
+        if prices is None:
+            # Request failed (or over quota): don't cache, so the next refresh retries these mints, but serve
+            # expired prices meanwhile.
+            _serve_stale(batch, out)
+            continue
+        for mint in batch:
+            price = prices.get(mint)
+            _jupiter_price_cache.pop(mint, None)  # re-insert so the cache stays in fetch order
+            _jupiter_price_cache[mint] = (price, fetched_at)
+            if price is not None:
+                out[mint] = price
+    _sweep_price_cache(fetched_at)
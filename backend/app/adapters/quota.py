@@ -0,0 +1,232 @@
+"""
+Upstream quota accounting. Every upstream call is charged to its provider and API key (a short hash, never
+the key itself) with a weighted cost: Alchemy compute units per JSON-RPC method, one per request elsewhere.
+Budgets from UPSTREAM_BUDGETS ("coingecko=25/1m,alchemy=450/1s") are enforced over rolling windows: a call
+that would go over waits for headroom when that comes within UPSTREAM_BUDGET_MAX_WAIT, and otherwise fails
+fast with QuotaExceededError instead of spending the provider's limit (callers fall back to cached prices).
+
+Windows live in memory, so long windows (a monthly allowance) only count since the last start. Usage and
+headroom are exported in /metrics and served at /debug/quotas.
+"""
+import hashlib
+import logging
+import re
+import time
+from collections import deque
+from urllib.parse import parse_qsl
+
+import httpx
+
+from app.config import get_settings
+from app.executors import loads
+from app.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Approximate Alchemy compute units per method (from Alchemy's published CU table); unknown methods and
+# REST endpoints (Prices API) are charged _ALCHEMY_DEFAULT_CU.
+_ALCHEMY_CU = {
+    "eth_blockNumber": 10,
+    "eth_chainId": 0,
+    "eth_getBalance": 19,
+    "eth_call": 26,
+    "alchemy_getTokenBalances": 26,
+    "alchemy_getTokenMetadata": 16,
+}
+_ALCHEMY_DEFAULT_CU = 26
+
+# Query parameters and path segments that carry API keys (same shapes the cassette redacts).
+_KEY_PARAM = re.compile(r"key|token|secret|auth", re.I)
+_KEY_IN_PATH_HOSTS = ("alchemy.com", "infura.io", "quiknode.pro", "ankr.com", "helius-rpc.com")
+_KEY_LIKE_SEGMENT = re.compile(r"^[A-Za-z0-9_\-]{20,}$")
+NO_KEY = "-"
+
+_WINDOW_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+_BUDGET_SPEC = re.compile(r"^\s*([\w.\-]+)\s*=\s*(\d+(?:\.\d+)?)\s*/\s*(\d*)\s*([smhd])\s*$")
+
+upstream_quota_calls_total = registry.counter(
+    "mantracker_upstream_quota_calls_total",
+    "Upstream calls charged to a provider's quota, by API key hash.",
+    ("provider", "key"),
+)
+upstream_quota_cost_total = registry.counter(
+    "mantracker_upstream_quota_cost_total",
+    "Weighted upstream cost (Alchemy compute units, else requests), by API key hash.",
+    ("provider", "key"),
+)
+upstream_quota_rejected_total = registry.counter(
+    "mantracker_upstream_quota_rejected_total",
+    "Upstream calls refused because a budget had no headroom within the allowed wait.",
+    ("provider", "key"),
+)
+upstream_quota_wait_seconds_total = registry.counter(
+    "mantracker_upstream_quota_wait_seconds_total",
+    "Time upstream calls waited for budget headroom.",
+    ("provider", "key"),
+)
+
+
+class QuotaExceededError(httpx.TransportError):
+    """Raised instead of sending a request that would exceed an upstream budget."""
+
+
+def key_id(url: httpx.URL) -> str:
+    """Short, non-reversible id of the API key in a URL ("-" when there is none)."""
+    host = url.host
+    secret = ""
+    if any(host == h or host.endswith("." + h) for h in _KEY_IN_PATH_HOSTS):
+        secret = next((seg for seg in url.path.split("/") if _KEY_LIKE_SEGMENT.match(seg)), "")
+    if not secret:
+        secret = next((v for k, v in parse_qsl(url.query.decode()) if _KEY_PARAM.search(k) and v), "")
+    if not secret:
+        return NO_KEY
+    return hashlib.blake2b(secret.encode(), digest_size=4).hexdigest()
+
+
+def request_cost(provider: str, request: httpx.Request) -> float:
+    """Weighted cost of one request: Alchemy compute units by JSON-RPC method (batches summed), else 1."""
+    if provider != "alchemy":
+        return 1.0
+    try:
+        body = loads(request.content) if request.content else None
+    except Exception:
+        body = None
+    calls = body if isinstance(body, list) else [body]
+    methods = [c.get("method") for c in calls if isinstance(c, dict) and c.get("method")]
+    if not methods:
+        return float(_ALCHEMY_DEFAULT_CU)
+    return float(sum(_ALCHEMY_CU.get(m, _ALCHEMY_DEFAULT_CU) for m in methods))
+
+
+def parse_budgets(spec: str) -> dict[str, list[tuple[float, float]]]:
+    """ "coingecko=25/1m,alchemy=450/1s" -> provider -> [(limit, window seconds)]; bad entries are skipped."""
+    budgets: dict[str, list[tuple[float, float]]] = {}
+    for part in (spec or "").split(","):
+        if not part.strip():
+            continue
+        m = _BUDGET_SPEC.match(part)
+        if m is None:
+            logger.warning("Ignoring malformed upstream budget %r (expected provider=limit/window, e.g. coingecko=25/1m)", part)
+            continue
+        provider, limit, count, unit = m.groups()
+        budgets.setdefault(provider.lower(), []).append((float(limit), int(count or 1) * _WINDOW_UNITS[unit]))
+    return budgets
+
+
+def _window_label(seconds: float) -> str:
+    for unit, size in (("d", 86400), ("h", 3600), ("m", 60)):
+        if seconds >= size and seconds % size == 0:
+            return f"{int(seconds // size)}{unit}"
+    return f"{seconds:g}s"
+
+
+class RollingWindow:
+    """Cost charged within the last `seconds`, as (timestamp, cost) entries."""
+
+    def __init__(self, limit: float, seconds: float):
+        self.limit = limit
+        self.seconds = seconds
+        self.label = _window_label(seconds)
+        self._entries: deque[tuple[float, float]] = deque()
+        self.used = 0.0
+
+    def _prune(self, now: float) -> None:
+        cutoff = now - self.seconds
+        while self._entries and self._entries[0][0] <= cutoff:
+            self.used -= self._entries.popleft()[1]
+        if not self._entries:
+            self.used = 0.0  # no float drift once empty
+
+    def wait_for(self, cost: float, now: float) -> float:
+        """Seconds until `cost` fits in the window (0 when it fits now, inf when it never will)."""
+        self._prune(now)
+        if self.used + cost <= self.limit:
+            return 0.0
+        if cost > self.limit:
+            return float("inf")
+        freed = 0.0
+        for t, c in self._entries:
+            freed += c
+            if self.used - freed + cost <= self.limit:
+                return t + self.seconds - now
+        return self.seconds
+
+    def charge(self, cost: float, now: float) -> None:
+        self._entries.append((now, cost))
+        self.used += cost
+
+    def status(self, now: float) -> dict:
+        self._prune(now)
+        reset_in = self._entries[0][0] + self.seconds - now if self._entries else 0.0
+        return {
+            "window": self.label,
+            "limit": self.limit,
+            "used": round(self.used, 2),
+            "remaining": round(max(0.0, self.limit - self.used), 2),
+            "resets_in_s": round(max(0.0, reset_in), 1),
+        }
+
+
+class QuotaLedger:
+    """Per (provider, key) usage across that provider's budget windows."""
+
+    def __init__(self) -> None:
+        settings = get_settings()
+        self.budgets = parse_budgets(settings.upstream_budgets)
+        self.enforce = settings.upstream_budget_enforce
+        self.max_wait = max(0.0, settings.upstream_budget_max_wait)
+        self._windows: dict[tuple[str, str], list[RollingWindow]] = {}
+        self._calls: dict[tuple[str, str], int] = {}
+
+    def _windows_for(self, provider: str, key: str) -> list[RollingWindow]:
+        windows = self._windows.get((provider, key))
+        if windows is None:
+            windows = self._windows[(provider, key)] = [RollingWindow(l, s) for l, s in self.budgets.get(provider, ())]
+        return windows
+
+    def wait_for(self, provider: str, key: str, cost: float) -> float:
+        """Seconds until the call fits every budget of this provider and key (0 when unbudgeted or not enforced)."""
+        if not self.enforce:
+            return 0.0
+        now = time.monotonic()
+        return max((w.wait_for(cost, now) for w in self._windows_for(provider, key)), default=0.0)
+
+    def charge(self, provider: str, key: str, cost: float) -> None:
+        now = time.monotonic()
+        for w in self._windows_for(provider, key):
+            w.charge(cost, now)
+        self._calls[(provider, key)] = self._calls.get((provider, key), 0) + 1
+        upstream_quota_calls_total.inc(provider=provider, key=key)
+        upstream_quota_cost_total.inc(cost, provider=provider, key=key)
+
+    def remaining_samples(self) -> dict[tuple[str, ...], float]:
+        now = time.monotonic()
+        return {
+            (p, k, w.label): w.status(now)["remaining"]
+            for (p, k), windows in list(self._windows.items())
+            for w in windows
+        }
+
+    def status(self) -> dict:
+        now = time.monotonic()
+        providers = []
+        for (p, k), windows in sorted(self._windows.items()):
+            providers.append({
+                "provider": p,
+                "key": k,
+                "calls": self._calls.get((p, k), 0),
+                "headroom": None if not windows else round(min(1.0 - w.status(now)["used"] / w.limit if w.limit else 0.0 for w in windows), 3),
+                "windows": [w.status(now) for w in windows],
+            })
+        budgets = {p: [f"{l:g}/{_window_label(s)}" for l, s in v] for p, v in self.budgets.items()}
+        return {"enforce": self.enforce, "max_wait_s": self.max_wait, "budgets": budgets, "providers": providers}
+
+
+quotas = QuotaLedger()
+
+registry.gauge(
+    "mantracker_upstream_quota_remaining",
+    "Budget left in each rolling window, per provider and API key hash.",
+    ("provider", "key", "window"),
+    callback=quotas.remaining_samples,
+)
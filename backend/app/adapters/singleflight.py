@@ -0,0 +1,37 @@
+"""
+Single-flight for shared in-process caches: when several fetches miss the same key at once (a batch of
+accounts on a cold cache), the first one fills it and the rest await that fill instead of calling upstream too.
+"""
+import asyncio
+from typing import Awaitable, Callable, Hashable, TypeVar
+
+from app.metrics import cache_coalesced
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """In-flight cache fills for one cache, keyed like the cache. Waiters are counted as "coalesced" lookups."""
+
+    def __init__(self, cache: str):
+        self.cache = cache
+        self._inflight: dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, fill: Callable[[], Awaitable[T]]) -> T:
+        """Run fill() for key, or await the fill already running for it on this event loop."""
+        while True:
+            task = self._inflight.get(key)
+            if task is None or task.get_loop() is not asyncio.get_running_loop():
+                break
+            cache_coalesced(self.cache)
+            try:
+                # Shielded: a waiter timing out must not cancel the fill the others are waiting on.
+                return await asyncio.shield(task)
+            except asyncio.CancelledError:
+                if not task.cancelled() or asyncio.current_task().cancelling():
+                    raise
+                # The caller that started the fill was cancelled (and closed its client): take the fill over.
+        task = asyncio.ensure_future(fill())
+        self._inflight[key] = task
+        task.add_done_callback(lambda t: self._inflight.pop(key) if self._inflight.get(key) is t else None)
+        return await task
@@ -1,8 +1,18 @@
-"""Blockchain wallet adapter: Bitcoin, EVM chains, Solana. Uses address only (no private keys)."""
+"""Blockchain wallet adapter: Bitcoin (address or xpub/descriptor), EVM chains, Solana. Public data only (no private keys)."""
 import asyncio
+from typing import Any, Callable
+
 import httpx
 from app.adapters.base import AdapterResult, BalanceItem
+from app.adapters.http import instrumented_fetch, upstream_client
+from app.adapters.bitcoin_hd import HDWallet, is_hd_wallet_input, parse_hd_wallet
+from app.adapters.btc_backends import get_btc_backend
+from app.adapters.jupiter import fetch_jupiter_prices
+from app.adapters.singleflight import SingleFlight
 from app.config import get_settings
+from app.deadline import publish_partial, remaining, should_skip
+from app.executors import loads, reduce_json, run_cpu, run_crypto
+from app.metrics import cache_hit, cache_miss
 
 
 # Public RPC endpoints (no API key). Override via env if needed.
@@ -67,6 +77,16 @@ HYPERLIQUID_INFO_URL = "https://api.hyperliquid.xyz/info"
 
 _hype_price_cache: tuple[float, float] | None = None  # (price, fetched_at)
 _HYPE_PRICE_TTL = 60.0  # seconds
+# Concurrent misses (a batch of accounts on a cold cache) share one fill per cache instead of each calling upstream.
+_hype_price_fills = SingleFlight("hype_price")
+
+# HyperCore pricing: allMids covers every perp coin and spot pair in one call; spotMeta maps spot tokens to pairs.
+_hyperliquid_mids_cache: tuple[dict[str, float], float] | None = None  # (mids, fetched_at)
+_HYPERLIQUID_MIDS_TTL = 10.0
+_hyperliquid_spot_pairs_cache: tuple[dict[str, str], float] | None = None  # (token -> pair key, fetched_at)
+_HYPERLIQUID_SPOT_META_TTL = 3600.0  # spot listings change rarely
+_hyperliquid_mids_fills = SingleFlight("hyperliquid_mids")
+_hyperliquid_spot_pairs_fills = SingleFlight("hyperliquid_spot_meta")
 
 # Alchemy Prices API + DefiLlama + CoinGecko for ERC-20 USD pricing
 ALCHEMY_PRICES_NETWORK = {
@@ -149,6 +169,9 @@ EVM_NATIVE_COINGECKO_IDS: dict[str, str] = {
 COINGECKO_SIMPLE_PRICE_URL = "https://api.coingecko.com/api/v3/simple/price"
 _evm_native_price_cache: dict[str, tuple[float, float]] = {}  # cg_id -> (price, fetched_at)
 _EVM_NATIVE_PRICE_TTL = 60.0
+_evm_native_price_fills = SingleFlight("evm_native_price")
+# (chain, contract_lower) -> last USD price seen; served when every price source fails or is over quota.
+_erc20_last_prices: dict[tuple[str, str], float] = {}
 
 
 async def _fetch_evm_native_usd_price(chain: str, client: httpx.AsyncClient) -> float | None:
@@ -161,8 +184,17 @@ async def _fetch_evm_native_usd_price(chain: str, client: httpx.AsyncClient) ->
         return None
     now = asyncio.get_running_loop().time()
     cached = _evm_native_price_cache.get(cg_id)
-    if cached and (now - cached[1]) < _EVM_NATIVE_PRICE_TTL:
+    if cached and ((now - cached[1]) < _EVM_NATIVE_PRICE_TTL or should_skip("evm.native_price")):
+        cache_hit("evm_native_price")
         return cached[0]
+    return await _evm_native_price_fills.do(cg_id, lambda: _fill_evm_native_usd_price(cg_id, client))
+
+
+async def _fill_evm_native_usd_price(cg_id: str, client: httpx.AsyncClient) -> float | None:
+    """Cache miss for one CoinGecko id: fetch and cache, else serve the expired price."""
+    cache_miss("evm_native_price")
+    now = asyncio.get_running_loop().time()
+    cached = _evm_native_price_cache.get(cg_id)
     try:
         r = await client.get(f"{COINGECKO_SIMPLE_PRICE_URL}?ids={cg_id}&vs_currencies=usd", timeout=6.0)
         r.raise_for_status()
@@ -173,6 +205,9 @@ async def _fetch_evm_native_usd_price(chain: str, client: httpx.AsyncClient) ->
             return price
     except Exception:
         pass
+    if cached:  # expired, but better than no USD value (CoinGecko down or over quota)
+        cache_hit("evm_native_price_stale")
+        return cached[0]
     return None
 
 
@@ -187,9 +222,11 @@ async def _fetch_erc20_usd_prices_alchemy(chain: str, contracts: list[str]) -> d
     norm_contracts = sorted({(c or "").strip().lower() for c in contracts if c})
     if not norm_contracts:
         return {}
+    if should_skip("evm.prices"):
+        return {c: _erc20_last_prices[(chain_lower, c)] for c in norm_contracts if (chain_lower, c) in _erc20_last_prices}
     out: dict[str, float] = {}
     try:
-        async with httpx.AsyncClient() as client:
+        async with upstream_client() as client:
             # Primary: Alchemy Prices API (only when key and network available)
             key = (get_settings().alchemy_api_key or "").strip()
             network = ALCHEMY_PRICES_NETWORK.get(chain_lower)
@@ -265,6 +302,12 @@ async def _fetch_erc20_usd_prices_alchemy(chain: str, contracts: list[str]) -> d
                     pass
     except Exception:
         pass
+    for addr, price in out.items():
+        _erc20_last_prices[(chain_lower, addr)] = price
+    stale = {c: _erc20_last_prices[(chain_lower, c)] for c in norm_contracts if c not in out and (chain_lower, c) in _erc20_last_prices}
+    if stale:
+        cache_hit("erc20_price_stale", len(stale))
+        out.update(stale)
     return out
 
 
@@ -299,8 +342,10 @@ async def _fetch_evm_token_metadata(
         known = KNOWN_EVM_METADATA.get(addr)
         if known:
             out[addr] = {k: v for k, v in known.items() if v is not None}
+    if should_skip("evm.metadata"):
+        return out
 
-    async with httpx.AsyncClient() as client:
+    async with upstream_client() as client:
         # 2) Alchemy getTokenMetadata for ALL contracts (best source for name + symbol on this chain)
         key = (get_settings().alchemy_api_key or "").strip()
         network = ALCHEMY_NETWORK.get(chain_lower)
@@ -411,8 +456,9 @@ async def _solana_rpc_post(
     client: httpx.AsyncClient,
     payload: dict,
     timeout: float = 15.0,
-) -> dict:
-    """POST to Solana RPC with retry on 429."""
+    reduce: Callable[[bytes], Any] | None = None,
+) -> Any:
+    """POST to Solana RPC with retry on 429. With `reduce`, returns reduce(body), run in the CPU pool when large."""
     url = _get_solana_rpc_url()
     last_err: Exception | None = None
     for attempt in range(_SOLANA_429_RETRIES + 1):
@@ -438,7 +484,9 @@ async def _solana_rpc_post(
                     continue
                 raise last_err
             r.raise_for_status()
-            return r.json()
+            if reduce is not None:
+                return await reduce_json(reduce, r.content)  # token account lists of large wallets run to megabytes
+            return loads(r.content)
         except httpx.HTTPStatusError as e:
             last_err = e
             if e.response.status_code == 429 and attempt < _SOLANA_429_RETRIES:
@@ -449,148 +497,289 @@ async def _solana_rpc_post(
     assert last_err is not None
     raise last_err
 SOLANA_TOKEN_LIST_URL = "https://raw.githubusercontent.com/solana-labs/token-list/main/src/tokens/solana.tokenlist.json"
-JUPITER_LITE_PRICE_URL = "https://lite-api.jup.ag/price/v3"
 
 # In-memory cache for Solana token list (mint -> {symbol, name})
 _solana_token_list_cache: dict[str, dict[str, str]] | None = None
+_solana_token_list_fills = SingleFlight("solana_token_list")
 
 
 async def fetch_btc_balance(address: str) -> AdapterResult:
-    """Fetch Bitcoin balance via mempool.space (no API key)."""
+    """Fetch Bitcoin balance for one address via the configured backend (Esplora/mempool.space or Electrum)."""
     try:
-        async with httpx.AsyncClient() as client:
-            r = await client.get(
-                f"https://mempool.space/api/address/{address}",
-                timeout=15.0,
-            )
-            r.raise_for_status()
-            data = r.json()
+        stats = await get_btc_backend().address_stats([address])
+        satoshi, _ = stats[address]
     except Exception as e:
         return AdapterResult(balances=[], error=str(e))
 
-    chain = data.get("chain_stats", {})
-    funded = chain.get("funded_txo_sum", 0)
-    spent = chain.get("spent_txo_sum", 0)
-    satoshi = funded - spent
     btc = satoshi / 100_000_000.0
     return AdapterResult(
         balances=[BalanceItem(asset="BTC", amount=btc, currency="BTC", raw_name="Bitcoin")]
     )
 
 
-async def fetch_hypercore_balance(address: str) -> AdapterResult:
+# Bitcoin HD wallets (xpub/ypub/zpub/descriptor): scan receive + change chains to the gap limit.
+BTC_GAP_LIMIT = 20
+# Used addresses and the frontier are re-checked on every refresh; this short TTL only dedupes
+# refreshes that overlap. Unused addresses below the highest used index are trusted for longer.
+_BTC_USED_TTL = 30.0
+_BTC_UNUSED_TTL = 600.0
+# address -> (balance_sats, used, fetched_at)
+_btc_address_cache: dict[str, tuple[int, bool, float]] = {}
+# (wallet fingerprint, chain) -> highest used index seen so far (-1 when none)
+_btc_scan_state: dict[tuple[str, int], int] = {}
+# (wallet fingerprint, chain) -> derived addresses by index (derivation is deterministic, never expires)
+_btc_derived_addresses: dict[tuple[str, int], list[str]] = {}
+
+
+async def _btc_derive_addresses(wallet: HDWallet, chain: int, upto: int) -> list[str]:
+    """Addresses 0..upto for one chain. EC math runs in the crypto pool so it doesn't block the loop."""
+    key = (wallet.fingerprint, chain)
+    addrs = _btc_derived_addresses.setdefault(key, [])
+    while len(addrs) <= upto:
+        start = len(addrs)
+
+        def derive() -> list[str]:
+            node = wallet.chain_node(chain)
+            return [wallet.address_at(node, i) for i in range(start, upto + 1)]
+
+        new = await run_crypto(derive)
+        if len(addrs) == start:  # else an overlapping refresh already extended the list
+            addrs.extend(new)
+    return addrs
+
+
+async def _btc_lookup_many(addresses: list[str], max_age: float) -> dict[str, tuple[int, bool]]:
+    """Per-address (sats, used), from cache when younger than max_age, else one backend call for the rest."""
+    now = asyncio.get_running_loop().time()
+    out: dict[str, tuple[int, bool]] = {}
+    to_fetch: list[str] = []
+    for addr in addresses:
+        cached = _btc_address_cache.get(addr)
+        if cached and (now - cached[2]) < max_age:
+            out[addr] = (cached[0], cached[1])
+        else:
+            to_fetch.append(addr)
+    cache_hit("btc_address", len(out))
+    cache_miss("btc_address", len(to_fetch))
+    if to_fetch:
+        # The backend bounds parallelism itself (Esplora: limiter; Electrum: batched requests).
+        fetched = await get_btc_backend().address_stats(to_fetch)
+        fetched_at = asyncio.get_running_loop().time()
+        for addr, stats in fetched.items():
+            _btc_address_cache[addr] = (stats[0], stats[1], fetched_at)
+            out[addr] = stats
+    return out
+
+
+async def _btc_scan_chain(wallet: HDWallet, chain: int, report: Callable[[int, int], None]) -> tuple[int, bool]:
     """
-    Fetch balances on HyperCore (Hyperliquid mainnet exchange/L1), not HyperEVM.
-    Queries the main account via clearinghouseState and spotClearinghouseState (same address);
-    then adds any sub-account balances from subAccounts so all activity is visible.
+    Total sats on one chain, and whether the scan stopped at BTC_HD_MAX_ADDRESSES before reaching the gap
+    limit. Known-used addresses are re-checked, then the frontier is scanned to the gap limit. The running
+    total is passed to report(chain, sats) after each batch of lookups.
     """
-    total_withdrawable = 0.0
-    coin_totals: dict[str, float] = {}
+    state_key = (wallet.fingerprint, chain)
+    cap = max(BTC_GAP_LIMIT, get_settings().btc_hd_max_addresses)  # indices 0..cap-1
+    highest = min(_btc_scan_state.get(state_key, -1), cap - 1)
+    addrs = await _btc_derive_addresses(wallet, chain, min(highest + BTC_GAP_LIMIT, cap - 1))
+    balances: dict[int, int] = {}
+
+    # Below the frontier: used addresses get a fresh lookup, unused ones come from cache while it lasts.
+    known = addrs[: highest + 1]
+    used_known: list[str] = []
+    unused_known: list[str] = []
+    for addr in known:
+        cached = _btc_address_cache.get(addr)
+        (used_known if cached is None or cached[1] else unused_known).append(addr)
+    stats = await _btc_lookup_many(used_known, _BTC_USED_TTL)
+    stats.update(await _btc_lookup_many(unused_known, _BTC_UNUSED_TTL))
+    for i, addr in enumerate(known):
+        balances[i] = stats[addr][0]
+    report(chain, sum(balances.values()))
+
+    # Frontier: scan windows past the highest used index until GAP_LIMIT consecutive unused addresses.
+    start = highest + 1
+    while start <= highest + BTC_GAP_LIMIT and start < cap:
+        end = min(highest + BTC_GAP_LIMIT, cap - 1)
+        addrs = await _btc_derive_addresses(wallet, chain, end)
+        window = addrs[start : end + 1]
+        stats = await _btc_lookup_many(window, _BTC_USED_TTL)
+        for offset, addr in enumerate(window):
+            sats, used = stats[addr]
+            balances[start + offset] = sats
+            if used:
+                highest = max(highest, start + offset)
+        report(chain, sum(balances.values()))
+        start = end + 1
+
+    _btc_scan_state[state_key] = highest
+    return sum(balances.values()), highest + BTC_GAP_LIMIT >= cap
+
+
+async def fetch_btc_hd_balance(descriptor: str) -> AdapterResult:
+    """Fetch balance for an xpub/ypub/zpub or output descriptor by deriving and scanning addresses locally."""
     try:
-        async with httpx.AsyncClient() as client:
-            # Main account: clearinghouseState (withdrawable, margin) and spotClearinghouseState (spot balances)
-            for req_type in ("clearinghouseState", "spotClearinghouseState"):
-                try:
-                    r = await client.post(
-                        HYPERLIQUID_INFO_URL,
-                        json={"type": req_type, "user": address},
-                        timeout=12.0,
-                    )
-                    r.raise_for_status()
-                    data = r.json()
-                except Exception:
-                    continue
-                if req_type == "clearinghouseState" and isinstance(data, dict):
-                    w = data.get("withdrawable")
-                    if w is not None:
-                        try:
-                            total_withdrawable += float(w)
-                        except (TypeError, ValueError):
-                            pass
-                elif req_type == "spotClearinghouseState":
-                    # Response can be dict with "balances" or direct list of balances
-                    if isinstance(data, dict):
-                        bal_list = data.get("balances") or data.get("balance") or []
-                    elif isinstance(data, list):
-                        bal_list = data
-                    else:
-                        bal_list = []
-                    for b in bal_list:
-                        if not isinstance(b, dict):
-                            continue
-                        coin = (b.get("coin") or "").strip()
-                        if not coin:
-                            continue
-                        total = b.get("total")
-                        if total is None:
-                            continue
-                        try:
-                            coin_totals[coin] = coin_totals.get(coin, 0) + float(total)
-                        except (TypeError, ValueError):
-                            pass
+        wallet = parse_hd_wallet(descriptor)
+    except ValueError as e:
+        return AdapterResult(balances=[], error=f"Invalid xpub/descriptor: {e}")
+    progress: dict[int, int] = {}
 
-            # Sub-accounts: aggregate so we show full picture if user also uses sub-accounts
-            try:
-                r2 = await client.post(
-                    HYPERLIQUID_INFO_URL,
-                    json={"type": "subAccounts", "user": address},
-                    timeout=12.0,
-                )
-                r2.raise_for_status()
-                sub_data = r2.json()
-            except Exception:
-                sub_data = []
-            if isinstance(sub_data, list):
-                for item in sub_data:
-                    if not isinstance(item, dict):
-                        continue
-                    ch = item.get("clearinghouseState") or {}
-                    if isinstance(ch, dict):
-                        w = ch.get("withdrawable")
-                        if w is not None:
-                            try:
-                                total_withdrawable += float(w)
-                            except (TypeError, ValueError):
-                                pass
-                    spot = item.get("spotState") or {}
-                    for b in spot.get("balances") or []:
-                        if not isinstance(b, dict):
-                            continue
-                        coin = (b.get("coin") or "").strip()
-                        if not coin:
-                            continue
-                        total = b.get("total")
-                        if total is None:
-                            continue
-                        try:
-                            coin_totals[coin] = coin_totals.get(coin, 0) + float(total)
-                        except (TypeError, ValueError):
-                            pass
+    def partial_balances() -> list[BalanceItem]:
+        btc_so_far = sum(progress.values()) / 100_000_000.0
+        return [BalanceItem(asset="BTC", amount=btc_so_far, currency="BTC", raw_name="Bitcoin")]
+
+    def report(chain: int, sats: int) -> None:
+        # Running total across chains, returned if the account is cut off at its deadline.
+        progress[chain] = sats
+        publish_partial(AdapterResult(balances=partial_balances()))
+
+    try:
+        results = await asyncio.gather(*(_btc_scan_chain(wallet, chain, report) for chain in range(len(wallet.chains))))
     except Exception as e:
+        if progress:
+            return AdapterResult(balances=partial_balances(), error=f"{e}; balance may be incomplete")
         return AdapterResult(balances=[], error=str(e))
+    btc = sum(sats for sats, _ in results) / 100_000_000.0
+    error = None
+    if any(truncated for _, truncated in results):
+        limit = max(BTC_GAP_LIMIT, get_settings().btc_hd_max_addresses)
+        error = f"Scan stopped after {limit} addresses per chain; balance may be incomplete"
+    return AdapterResult(
+        balances=[BalanceItem(asset="BTC", amount=btc, currency="BTC", raw_name="Bitcoin")],
+        error=error,
+    )
 
-    balances: list[BalanceItem] = []
-    hype_price: float | None = None
+
+async def _hyperliquid_info(client: httpx.AsyncClient, body: dict) -> Any:
+    """POST one request to the Hyperliquid info API."""
+    r = await client.post(HYPERLIQUID_INFO_URL, json=body, timeout=12.0)
+    r.raise_for_status()
+    return r.json()
+
+
+async def _hyperliquid_sub_accounts(client: httpx.AsyncClient, address: str) -> Any:
+    """Sub-account states; skipped (None) when the deadline is close."""
+    if should_skip("hypercore.sub_accounts"):
+        return None
+    return await _hyperliquid_info(client, {"type": "subAccounts", "user": address})
+
+
+async def _fetch_hyperliquid_mids(client: httpx.AsyncClient) -> dict[str, float]:
+    """All mid prices from one allMids call (perp coins by name, spot pairs by pair name or "@index"). Cached."""
+    now = asyncio.get_running_loop().time()
+    if _hyperliquid_mids_cache is not None and (now - _hyperliquid_mids_cache[1]) < _HYPERLIQUID_MIDS_TTL:
+        cache_hit("hyperliquid_mids")
+        return _hyperliquid_mids_cache[0]
+    return await _hyperliquid_mids_fills.do("allMids", lambda: _fill_hyperliquid_mids(client))
+
+
+async def _fill_hyperliquid_mids(client: httpx.AsyncClient) -> dict[str, float]:
+    global _hyperliquid_mids_cache
+    cache_miss("hyperliquid_mids")
+    now = asyncio.get_running_loop().time()
+    data = await _hyperliquid_info(client, {"type": "allMids"})
+    mids: dict[str, float] = {}
+    for key, value in (data or {}).items():
+        try:
+            mids[key] = float(value)
+        except (TypeError, ValueError):
+            continue
+    _hyperliquid_mids_cache = (mids, now)
+    return mids
+
+
+async def _fetch_hyperliquid_spot_pairs(client: httpx.AsyncClient) -> dict[str, str]:
+    """Spot token name -> allMids key of its USDC pair (e.g. "PURR" -> "PURR/USDC", "UBTC" -> "@142"). Cached."""
+    now = asyncio.get_running_loop().time()
+    if (
+        _hyperliquid_spot_pairs_cache is not None
+        and (now - _hyperliquid_spot_pairs_cache[1]) < _HYPERLIQUID_SPOT_META_TTL
+    ):
+        cache_hit("hyperliquid_spot_meta")
+        return _hyperliquid_spot_pairs_cache[0]
+    return await _hyperliquid_spot_pairs_fills.do("spotMeta", lambda: _fill_hyperliquid_spot_pairs(client))
+
+
+async def _fill_hyperliquid_spot_pairs(client: httpx.AsyncClient) -> dict[str, str]:
+    global _hyperliquid_spot_pairs_cache
+    cache_miss("hyperliquid_spot_meta")
+    now = asyncio.get_running_loop().time()
+    data = await _hyperliquid_info(client, {"type": "spotMeta"})
+    token_names: dict[int, str] = {}
+    for t in (data or {}).get("tokens") or []:
+        if isinstance(t, dict) and t.get("name") and t.get("index") is not None:
+            token_names[t["index"]] = t["name"]
+    usdc_index = next((i for i, n in token_names.items() if n == "USDC"), 0)
+    pairs: dict[str, str] = {}
+    for pair in (data or {}).get("universe") or []:
+        if not isinstance(pair, dict):
+            continue
+        tokens = pair.get("tokens") or []
+        if len(tokens) == 2 and tokens[1] == usdc_index and tokens[0] in token_names and pair.get("name"):
+            pairs.setdefault(token_names[tokens[0]], pair["name"])
+    _hyperliquid_spot_pairs_cache = (pairs, now)
+    return pairs
+
+
+def _hypercore_usd_price(coin: str, mids: dict[str, float], spot_pairs: dict[str, str]) -> float | None:
+    """USD price for a HyperCore spot coin: USDC at par, then its USDC spot pair mid, then the perp mid."""
+    if coin == "USDC":
+        return 1.0
+    pair = spot_pairs.get(coin)
+    if pair and pair in mids:
+        return mids[pair]
+    return mids.get(coin)
+
+
+def _hypercore_withdrawable(clearinghouse: Any) -> float:
+    """Withdrawable USD from a clearinghouseState payload (0 when missing)."""
+    if not isinstance(clearinghouse, dict):
+        return 0.0
     try:
-        async with httpx.AsyncClient() as client:
-            hype_price = await _fetch_hype_usd_price(client)
-    except Exception:
-        pass
+        return float(clearinghouse.get("withdrawable") or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _hypercore_add_spot_balances(coin_totals: dict[str, float], spot_state: Any) -> None:
+    """Add spot balances to coin_totals. Payload can be a dict with "balances" or a direct list."""
+    if isinstance(spot_state, dict):
+        bal_list = spot_state.get("balances") or spot_state.get("balance") or []
+    elif isinstance(spot_state, list):
+        bal_list = spot_state
+    else:
+        bal_list = []
+    for b in bal_list:
+        if not isinstance(b, dict):
+            continue
+        coin = (b.get("coin") or "").strip()
+        if not coin:
+            continue
+        total = b.get("total")
+        if total is None:
+            continue
+        try:
+            coin_totals[coin] = coin_totals.get(coin, 0) + float(total)
+        except (TypeError, ValueError):
+            pass
+
 
+def _hypercore_balance_items(
+    coin_totals: dict[str, float],
+    total_withdrawable: float,
+    mids: dict[str, float],
+    spot_pairs: dict[str, str],
+) -> list[BalanceItem]:
+    balances: list[BalanceItem] = []
     for coin, amount in coin_totals.items():
         if amount <= 0:
             continue
-        usd_value = None
-        if coin == "USDC":
-            usd_value = amount
-        elif coin == "HYPE" and hype_price is not None:
-            usd_value = amount * hype_price
+        price = _hypercore_usd_price(coin, mids, spot_pairs)
         balances.append(
             BalanceItem(
                 asset=coin,
                 amount=amount,
                 currency=coin,
-                usd_value=usd_value,
+                usd_value=amount * price if price is not None else None,
                 raw_name=coin,
             )
         )
@@ -605,18 +794,70 @@ async def fetch_hypercore_balance(address: str) -> AdapterResult:
                 raw_name="USD",
             )
         )
+    return balances
 
-    return AdapterResult(balances=balances)
+
+async def fetch_hypercore_balance(address: str) -> AdapterResult:
+    """
+    Fetch balances on HyperCore (Hyperliquid mainnet exchange/L1), not HyperEVM.
+    The main account (clearinghouseState, spotClearinghouseState), sub-accounts (subAccounts) and pricing
+    (allMids + spotMeta, cached) are requested concurrently, so the account costs one round-trip of latency.
+    """
+    try:
+        async with upstream_client() as client:
+            results = await asyncio.gather(
+                _hyperliquid_info(client, {"type": "clearinghouseState", "user": address}),
+                _hyperliquid_info(client, {"type": "spotClearinghouseState", "user": address}),
+                _hyperliquid_sub_accounts(client, address),
+                _fetch_hyperliquid_mids(client),
+                _fetch_hyperliquid_spot_pairs(client),
+                return_exceptions=True,
+            )
+    except Exception as e:
+        return AdapterResult(balances=[], error=str(e))
+    # Each call is best-effort: a failed one just contributes nothing.
+    clearinghouse, spot_state, sub_data, mids, spot_pairs = (
+        None if isinstance(r, BaseException) else r for r in results
+    )
+    return hypercore_result_from_states(clearinghouse, spot_state, sub_data, mids or {}, spot_pairs or {})
+
+
+def hypercore_result_from_states(
+    clearinghouse: Any,
+    spot_state: Any,
+    sub_accounts: Any,
+    mids: dict[str, float],
+    spot_pairs: dict[str, str],
+) -> AdapterResult:
+    """Build HyperCore balances from info payloads (REST responses or webData2 stream snapshots)."""
+    coin_totals: dict[str, float] = {}
+    total_withdrawable = _hypercore_withdrawable(clearinghouse)
+    _hypercore_add_spot_balances(coin_totals, spot_state)
+    # Sub-accounts: aggregate so we show full picture if user also uses sub-accounts
+    if isinstance(sub_accounts, list):
+        for item in sub_accounts:
+            if not isinstance(item, dict):
+                continue
+            total_withdrawable += _hypercore_withdrawable(item.get("clearinghouseState"))
+            _hypercore_add_spot_balances(coin_totals, item.get("spotState") or {})
+    return AdapterResult(balances=_hypercore_balance_items(coin_totals, total_withdrawable, mids, spot_pairs))
 
 
 async def _fetch_hype_usd_price(client: httpx.AsyncClient) -> float | None:
     """Fetch HYPE/USD price, with small in-memory cache. Primary: CoinGecko; fallback: DIA."""
-    global _hype_price_cache
     now = asyncio.get_running_loop().time()
     if _hype_price_cache is not None:
         price, ts = _hype_price_cache
-        if now - ts < _HYPE_PRICE_TTL:
+        if now - ts < _HYPE_PRICE_TTL or should_skip("hype.price"):
+            cache_hit("hype_price")
             return price
+    return await _hype_price_fills.do("hype", lambda: _fill_hype_usd_price(client))
+
+
+async def _fill_hype_usd_price(client: httpx.AsyncClient) -> float | None:
+    global _hype_price_cache
+    cache_miss("hype_price")
+    now = asyncio.get_running_loop().time()
 
     # Primary: CoinGecko
     try:
@@ -643,6 +884,9 @@ async def _fetch_hype_usd_price(client: httpx.AsyncClient) -> float | None:
     except Exception:
         pass
 
+    if _hype_price_cache is not None:
+        cache_hit("hype_price_stale")
+        return _hype_price_cache[0]
     return None
 
 
@@ -666,7 +910,7 @@ async def _fetch_evm_known_token_balances(
     data_hex = _erc20_balance_of_calldata(address)
     out: list[tuple[str, BalanceItem]] = []
     try:
-        async with httpx.AsyncClient() as client:
+        async with upstream_client() as client:
             for contract, symbol, decimals in tokens:
                 try:
                     r = await client.post(
@@ -726,6 +970,29 @@ def _evm_native_symbol(chain: str) -> str:
     return "ETH"
 
 
+def _alchemy_token_items(content: bytes) -> list[tuple[str, int]]:
+    """alchemy_getTokenBalances body -> non-zero (contract_lower, raw_balance_int); decimals come from metadata."""
+    items: list[tuple[str, int]] = []
+    for t in (loads(content).get("result") or {}).get("tokenBalances") or []:
+        try:
+            raw = t.get("tokenBalance")
+            if not raw:
+                continue
+            if isinstance(raw, str) and raw.startswith("0x"):
+                value = int(raw, 16)
+            else:
+                value = int(raw)
+            if value <= 0:
+                continue
+            contract = (t.get("contractAddress") or "").lower()
+            if not contract:
+                continue
+            items.append((contract, value))
+        except (ValueError, TypeError):
+            continue
+    return items
+
+
 async def fetch_evm_balances_alchemy(chain: str, address: str) -> AdapterResult:
     """Fetch ERC-20 token balances via Alchemy's Token API, and enrich with USD prices via Alchemy Prices API when available."""
     settings = get_settings()
@@ -743,36 +1010,13 @@ async def fetch_evm_balances_alchemy(chain: str, address: str) -> AdapterResult:
         "params": [address, "erc20"],
     }
     try:
-        async with httpx.AsyncClient() as client:
+        async with upstream_client() as client:
             r = await client.post(url, json=payload, timeout=20.0)
             r.raise_for_status()
-            data = r.json()
+            items = await reduce_json(_alchemy_token_items, r.content)
     except Exception as e:
         return AdapterResult(balances=[], error=str(e))
 
-    result = data.get("result") or {}
-    tokens = result.get("tokenBalances") or []
-
-    # Collect non-zero balances: (contract_lower, raw_balance_int) so we can apply decimals from metadata.
-    items: list[tuple[str, int]] = []
-    for t in tokens:
-        try:
-            raw = t.get("tokenBalance")
-            if not raw:
-                continue
-            if isinstance(raw, str) and raw.startswith("0x"):
-                value = int(raw, 16)
-            else:
-                value = int(raw)
-            if value <= 0:
-                continue
-            contract = (t.get("contractAddress") or "").lower()
-            if not contract:
-                continue
-            items.append((contract, value))
-        except (ValueError, TypeError):
-            continue
-
     if not items:
         return AdapterResult(balances=[])
 
@@ -810,7 +1054,7 @@ async def _fetch_evm_native_balance(chain: str, address: str, rpc_url: str | Non
     chain_lower = chain.lower()
     url = rpc_url or DEFAULT_RPC.get(chain_lower, DEFAULT_RPC["ethereum"])
     try:
-        async with httpx.AsyncClient() as client:
+        async with upstream_client() as client:
             r = await client.post(
                 url,
                 json={"jsonrpc": "2.0", "method": "eth_getBalance", "params": [address, "latest"], "id": 1},
@@ -829,7 +1073,7 @@ async def _fetch_evm_native_balance(chain: str, address: str, rpc_url: str | Non
     usd_value = None
     if amount > 0:
         try:
-            async with httpx.AsyncClient() as client:
+            async with upstream_client() as client:
                 price = await _fetch_evm_native_usd_price(chain, client)
             if price is not None:
                 usd_value = amount * price
@@ -893,10 +1137,18 @@ async def fetch_evm_all_chains(address: str) -> AdapterResult:
         result = await fetch_evm_balance(chain, address, rpc_url=None)
         return result
 
-    results = await asyncio.gather(
-        *[fetch_one(chain) for chain in EVM_CHAINS],
-        return_exceptions=True,
-    )
+    # Chains still running at the deadline are cancelled and reported; the others are returned.
+    tasks = [asyncio.ensure_future(fetch_one(chain)) for chain in EVM_CHAINS]
+    left = remaining()
+    try:
+        _, pending = await asyncio.wait(tasks, timeout=None if left is None else max(0.0, left) + 0.5)
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+    results = [
+        TimeoutError("timed out") if task in pending else (task.exception() or task.result()) for task in tasks
+    ]
     merged: list[BalanceItem] = []
     errors: list[str] = []
     for i, chain in enumerate(EVM_CHAINS):
@@ -924,9 +1176,13 @@ async def fetch_evm_all_chains(address: str) -> AdapterResult:
                 )
             )
 
+    publish_partial(AdapterResult(balances=list(merged)))
     # Also include HyperCore balances for all EVM addresses (Hyperliquid mainnet / exchange)
     try:
-        hypercore_result = await fetch_hypercore_balance(address)
+        if should_skip("evm.hypercore"):
+            hypercore_result = AdapterResult(balances=[])
+        else:
+            hypercore_result = await fetch_hypercore_balance(address)
         if hypercore_result.balances:
             for b in hypercore_result.balances:
                 merged.append(
@@ -951,58 +1207,74 @@ async def fetch_evm_all_chains(address: str) -> AdapterResult:
 
 async def _fetch_solana_token_list(client: httpx.AsyncClient) -> dict[str, dict[str, str]]:
     """Return mint -> {symbol, name}. Uses in-memory cache."""
-    global _solana_token_list_cache
     if _solana_token_list_cache is not None:
         return _solana_token_list_cache
+    return await _solana_token_list_fills.do(SOLANA_TOKEN_LIST_URL, lambda: _fill_solana_token_list(client))
+
+
+async def _fill_solana_token_list(client: httpx.AsyncClient) -> dict[str, dict[str, str]]:
+    global _solana_token_list_cache
     try:
         # This file is large and can be slow to download; keep it best-effort so we don't
         # time out individual account balance fetches.
         r = await client.get(SOLANA_TOKEN_LIST_URL, timeout=8.0)
         r.raise_for_status()
-        data = r.json()
+        # Parsed and reduced in the CPU pool: only the mint map comes back, not the full list.
+        out = await run_cpu(_solana_token_map, r.content)
     except Exception:
         _solana_token_list_cache = {}
         return _solana_token_list_cache
+    _solana_token_list_cache = out
+    return out
+
+
+def _solana_token_map(content: bytes) -> dict[str, dict[str, str]]:
+    """Token list JSON -> mint -> {symbol, name} (runs in a worker process)."""
     out: dict[str, dict[str, str]] = {}
-    for t in data.get("tokens", []):
+    for t in loads(content).get("tokens", []):
         addr = t.get("address")
         if addr:
             out[addr] = {"symbol": t.get("symbol") or "?", "name": t.get("name") or "?"}
-    _solana_token_list_cache = out
     return out
 
 
-async def _fetch_solana_prices(client: httpx.AsyncClient, mints: list[str]) -> dict[str, float]:
-    """Fetch USD prices for given mints from Jupiter Lite. Returns mint -> usd_price."""
-    if not mints:
-        return {}
-    out: dict[str, float] = {}
-    # Keep requests small enough for URL length, but large enough to avoid many round-trips.
-    batch_size = 75
-    for i in range(0, len(mints), batch_size):
-        batch = mints[i : i + batch_size]
-        ids = ",".join(batch)
+def _solana_spl_items(content: bytes) -> list[tuple[str, float, int]]:
+    """getTokenAccountsByOwner body -> non-zero (mint, amount, decimals) (runs in a worker process when large)."""
+    out: list[tuple[str, float, int]] = []
+    for item in (loads(content).get("result") or {}).get("value") or []:
         try:
-            # Best-effort: prices are optional. Fail fast so balances still return.
-            r = await client.get(f"{JUPITER_LITE_PRICE_URL}?ids={ids}", timeout=6.0)
-            r.raise_for_status()
-            data = r.json()
-        except Exception:
+            parsed = (item.get("account") or {}).get("data") or {}
+            if not isinstance(parsed, dict):
+                continue
+            info = parsed.get("parsed", {}).get("info", {})
+            token_amount = info.get("tokenAmount", {})
+            raw_amount = token_amount.get("amount") or "0"
+            decimals = token_amount.get("decimals", 0)
+            ui_amount_str = token_amount.get("uiAmountString")
+            if ui_amount_str is not None:
+                amount = float(ui_amount_str)
+            else:
+                amount = int(raw_amount) / (10**decimals) if decimals else int(raw_amount)
+            if amount <= 0:
+                continue
+            mint = info.get("mint")
+            if mint:
+                out.append((mint, amount, decimals))
+        except (ValueError, TypeError, KeyError, AttributeError):
             continue
-        for mint, info in (data or {}).items():
-            if isinstance(info, dict) and "usdPrice" in info:
-                try:
-                    out[mint] = float(info["usdPrice"])
-                except (TypeError, ValueError):
-                    pass
     return out
 
 
+async def _fetch_solana_prices(client: httpx.AsyncClient, mints: list[str], cached_only: bool = False) -> dict[str, float]:
+    """Fetch USD prices for given mints from Jupiter Lite (cached, batches in parallel). Returns mint -> usd_price."""
+    return await fetch_jupiter_prices(mints, client, cached_only=cached_only)
+
+
 async def fetch_solana_balance(address: str) -> AdapterResult:
     """Fetch SOL + all SPL tokens by name with USD values (token list + Jupiter Lite prices)."""
     balances: list[BalanceItem] = []
     try:
-        async with httpx.AsyncClient() as client:
+        async with upstream_client() as client:
             # Native SOL balance
             data = await _solana_rpc_post(
                 client,
@@ -1015,12 +1287,13 @@ async def fetch_solana_balance(address: str) -> AdapterResult:
             )
             lamports = data.get("result", {}).get("value", 0)
             sol_amount = lamports / 1_000_000_000.0
+            publish_partial(AdapterResult(balances=[BalanceItem(asset="SOL", amount=sol_amount, currency="SOL")]))
 
             # SPL token accounts (best effort: return SOL even if this fails)
             spl_items: list[tuple[str, float, int]] = []  # (mint, amount, decimals)
             spl_error: str | None = None
             try:
-                data2 = await _solana_rpc_post(
+                spl_items = await _solana_rpc_post(
                     client,
                     {
                         "jsonrpc": "2.0",
@@ -1032,38 +1305,19 @@ async def fetch_solana_balance(address: str) -> AdapterResult:
                             {"encoding": "jsonParsed"},
                         ],
                     },
+                    reduce=_solana_spl_items,
                 )
             except Exception as e:
-                data2 = {"result": {"value": []}}
                 spl_error = str(e)
-            for item in data2.get("result", {}).get("value", []):
-                try:
-                    parsed = (item.get("account") or {}).get("data") or {}
-                    if not isinstance(parsed, dict):
-                        continue
-                    info = parsed.get("parsed", {}).get("info", {})
-                    token_amount = info.get("tokenAmount", {})
-                    raw_amount = token_amount.get("amount") or "0"
-                    decimals = token_amount.get("decimals", 0)
-                    ui_amount_str = token_amount.get("uiAmountString")
-                    if ui_amount_str is not None:
-                        amount = float(ui_amount_str)
-                    else:
-                        amount = int(raw_amount) / (10**decimals) if decimals else int(raw_amount)
-                    if amount <= 0:
-                        continue
-                    mint = info.get("mint")
-                    if mint:
-                        spl_items.append((mint, amount, decimals))
-                except (ValueError, TypeError, KeyError):
-                    continue
 
             # Resolve names and prices
             all_mints = [SOLANA_SOL_MINT] + [m for m, _, _ in spl_items]
-            token_list = await _fetch_solana_token_list(client)
-            # Prices are optional; also cap how many mints we price to avoid long loops for very token-heavy wallets.
-            mints_for_prices = all_mints[:120]
-            prices = await _fetch_solana_prices(client, mints_for_prices)
+            if _solana_token_list_cache is None and should_skip("solana.token_list"):
+                token_list = {}
+            else:
+                token_list = await _fetch_solana_token_list(client)
+            # Prices are optional. All mints are priced; batches run concurrently and hit the shared cache.
+            prices = await _fetch_solana_prices(client, all_mints, cached_only=should_skip("solana.prices"))
 
             # SOL
             meta = token_list.get(SOLANA_SOL_MINT) or {"symbol": "SOL", "name": "Wrapped SOL"}
@@ -1112,13 +1366,20 @@ async def fetch_solana_balance(address: str) -> AdapterResult:
 
 
 async def fetch_wallet_balances(provider: str, credential_payload: dict) -> AdapterResult:
-    """Dispatch to Bitcoin, EVM (single or all chains), or Solana by provider."""
-    address = (credential_payload.get("address") or "").strip()
+    """Dispatch to Bitcoin (address or xpub/descriptor), EVM (single or all chains), or Solana by provider."""
+    address = (
+        credential_payload.get("address")
+        or credential_payload.get("descriptor")
+        or credential_payload.get("xpub")
+        or ""
+    ).strip()
     if not address:
         return AdapterResult(balances=[], error="Missing wallet address")
 
     provider_lower = (provider or "").lower()
     if provider_lower == "bitcoin" or provider_lower == "btc":
+        if is_hd_wallet_input(address):
+            return await fetch_btc_hd_balance(address)
         return await fetch_btc_balance(address)
     if provider_lower == "solana" or provider_lower == "sol":
         return await fetch_solana_balance(address)
@@ -1136,4 +1397,4 @@ async def fetch_wallet_balances(provider: str, credential_payload: dict) -> Adap
 class WalletAdapter:
     @staticmethod
     async def fetch_balances(provider: str, credential_payload: dict) -> AdapterResult:
-        return await fetch_wallet_balances(provider, credential_payload)
+        return await instrumented_fetch("wallet", provider, fetch_wallet_balances(provider, credential_payload))
@@ -11,6 +11,14 @@ class Settings(BaseSettings):
 
     # Database
     database_url: str = "sqlite+aiosqlite:///./portfolio.db"
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_statement_cache_size: int = 1200
+    # SQLite tuning (applied per connection)
+    sqlite_mmap_size: int = 256 * 1024 * 1024
+    sqlite_cache_size_kib: int = 64 * 1024
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_cached_statements: int = 256
 
     # Encryption for API keys and wallet addresses (required in production)
     # Generate with: python -c "from cryptography.fernet import Fernet; print(Fernet.generate_key().decode())"
@@ -18,6 +26,8 @@ class Settings(BaseSettings):
     # When True (default), app must be unlocked with passphrase on startup; ENCRYPTION_KEY still bypasses.
     # Set to 0 to use SECRET_KEY for credentials (no passphrase prompt).
     require_app_passphrase: bool = True
+    # Decrypted credential payloads are kept in memory this long (seconds); cleared on lock or account change.
+    credential_cache_ttl: float = 120.0
 
     # JWT for API auth
     secret_key: str = "change-me-in-production-use-openssl-rand-hex-32"
@@ -30,6 +40,86 @@ class Settings(BaseSettings):
     # Optional: Solana RPC URL (public RPC is rate-limited; set e.g. Helius/QuickNode for higher limits)
     solana_rpc_url: str | None = None
 
+    # Bitcoin balance backend: "esplora" (HTTP, default mempool.space) or "electrum" (persistent TCP).
+    # Point these at a self-hosted Esplora/electrs/Fulcrum to avoid WAN latency and public rate limits.
+    btc_backend: str = "esplora"
+    btc_esplora_url: str = "https://mempool.space/api"
+    btc_electrum_host: str | None = None
+    btc_electrum_port: int = 50002
+    btc_electrum_ssl: bool = True
+    # Self-hosted Electrum servers often use self-signed certificates.
+    btc_electrum_ssl_verify: bool = True
+    # xpub/descriptor scans stop after this many addresses per chain (receive, change) even if the gap limit
+    # is not reached yet, so a very busy wallet returns a (flagged) partial total instead of scanning forever.
+    btc_hd_max_addresses: int = 5000
+
+    # Push-based live balances: keep websocket subscriptions (Hyperliquid webData2, ccxt.pro watch_balance)
+    # and serve balances from in-memory state instead of polling upstream on every request.
+    live_balances_enabled: bool = False
+    hyperliquid_ws_url: str = "wss://api.hyperliquid.xyz/ws"
+
+    # Request tracing: spans per request kept in memory and served at /debug/traces.
+    tracing_enabled: bool = True
+    trace_buffer_size: int = 50
+    trace_max_spans: int = 5000
+
+    # Worker pools for work kept off the event loop (app/executors.py). Each pool is sized separately.
+    executor_cpu_processes: int = 2  # big JSON parses; 0 = run them in threads instead of processes
+    executor_crypto_threads: int = 2  # key derivation, credential decryption, BIP32 address derivation
+    executor_exchange_threads: int = 4  # per exchange, for the sync CCXT client
+    cpu_offload_min_bytes: int = 256 * 1024  # smaller JSON responses are parsed inline (a process hop costs more)
+
+    # Event loop monitor: lag is sampled every interval; a loop blocked longer than the threshold gets its
+    # stack and running task captured (metrics, /debug/loop).
+    loop_monitor_enabled: bool = True
+    loop_lag_interval_ms: float = 50.0
+    loop_block_threshold_ms: float = 100.0
+    loop_block_buffer_size: int = 50
+
+    # Request profiling (opt-in): requests with "X-Debug-Profile: 1" or ?debug_profile=1 are profiled and the
+    # result kept for download at /debug/profiles. pyinstrument is used when installed, else a built-in sampler.
+    profiling_enabled: bool = False
+    profile_sample_interval_ms: float = 2.0
+    profile_buffer_size: int = 20
+
+    # Upstream quota budgets per provider and API key over rolling windows: "provider=limit/window", comma-separated,
+    # window units s/m/h/d (e.g. "alchemy=30000000/30d"). Alchemy is counted in compute units, others in requests.
+    # Over budget, a call waits up to max_wait seconds for headroom, else fails fast and cached prices are served.
+    upstream_budgets: str = "coingecko=25/1m,solana-rpc=90/10s,alchemy=450/1s"
+    upstream_budget_max_wait: float = 2.0
+    upstream_budget_enforce: bool = True  # False: count usage only
+
+    # Deadlines: each account fetch gets account_fetch_timeout; upstream requests are cut off at the deadline and
+    # optional enrichment (token metadata, prices, sub-accounts) is served from cache once less than the reserve
+    # is left, so balances fetched so far are still returned.
+    account_fetch_timeout: float = 45.0
+    enrichment_reserve_seconds: float = 5.0
+    # Adaptive upstream timeouts: percentile of recent latency per provider x multiplier, floored at the minimum
+    # and capped by each adapter's own timeout. Applied once a provider has min_samples responses.
+    adaptive_timeouts: bool = True
+    adaptive_timeout_percentile: float = 0.99
+    adaptive_timeout_multiplier: float = 3.0
+    adaptive_timeout_min: float = 2.0
+    adaptive_timeout_min_samples: int = 20
+
+    # Circuit breakers per upstream endpoint: open after this many consecutive failures (timeouts, connect errors,
+    # 5xx), fail fast while open, then let one trial request through; each failed trial doubles the open time.
+    circuit_breaker_enabled: bool = True
+    circuit_failure_threshold: int = 5
+    circuit_open_seconds: float = 30.0
+    circuit_max_open_seconds: float = 300.0
+
+    # Upstream cassettes: "record" captures all upstream HTTP traffic to the file (secrets redacted), "replay"
+    # serves it back without network access; timing "original" replays recorded latencies, "none" skips them.
+    upstream_cassette_mode: str = "off"
+    upstream_cassette_path: str = "./cassettes/upstream.jsonl.gz"
+    upstream_cassette_timing: str = "original"
+
+    # Startup: time from app import to ready is logged against this budget (warning when over it).
+    startup_budget_ms: float = 1000.0
+    # Import adapters and ccxt in a background thread after startup instead of on the first balance request.
+    startup_warmup: bool = True
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
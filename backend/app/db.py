@@ -1,19 +1,95 @@
 """Async SQLAlchemy setup. No raw secrets in logs."""
-from sqlalchemy import text
+import time
+
+from sqlalchemy import event, text
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from app.config import get_settings
+from app.metrics import db_query_seconds
+from app.tracing import start_span
 
 
 class Base(DeclarativeBase):
     pass
 
 
-def get_engine():
-    return create_async_engine(
-        get_settings().database_url,
-        echo=get_settings().debug,
+def _is_sqlite_file(url: str) -> bool:
+    return url.startswith("sqlite") and ":memory:" not in url
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Per-connection SQLite tuning. WAL lets readers run while a writer commits (aggregator + background jobs);
+    synchronous=NORMAL is durable under WAL except on power loss; mmap/cache keep hot pages in memory.
+    """
+    settings = get_settings()
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}")
+    cursor.execute(f"PRAGMA cache_size=-{int(settings.sqlite_cache_size_kib)}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+    cursor.close()
+
+
+def _statement_operation(statement: str) -> str:
+    return statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Statement text only (bound parameters may hold ciphertext); the span is None outside traced requests.
+    span = start_span(
+        "db.query",
+        "CLIENT",
+        **{"db.system": engine.dialect.name, "db.operation": _statement_operation(statement), "db.statement": statement[:500]},
     )
+    conn.info.setdefault("query_started", []).append((time.perf_counter(), span))
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started, span = conn.info["query_started"].pop()
+    db_query_seconds.observe(time.perf_counter() - started, operation=_statement_operation(statement))
+    if span is not None:
+        span.end()
+
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute; close out its timing here.
+    started = exception_context.connection.info.get("query_started") if exception_context.connection else None
+    if started:
+        _, span = started.pop()
+        if span is not None:
+            span.set_error(exception_context.original_exception)
+            span.end()
+
+
+def get_engine():
+    settings = get_settings()
+    url = settings.database_url
+    kwargs: dict = {
+        "echo": settings.debug,
+        # SQLAlchemy compiled-statement cache (per engine)
+        "query_cache_size": settings.db_statement_cache_size,
+    }
+    if _is_sqlite_file(url):
+        # aiosqlite defaults to NullPool (a new connection + pragmas per session); keep a sized pool instead.
+        kwargs.update(
+            poolclass=AsyncAdaptedQueuePool,
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=30,
+            # sqlite3's prepared-statement cache per connection
+            connect_args={"cached_statements": settings.sqlite_cached_statements},
+        )
+    engine = create_async_engine(url, **kwargs)
+    if url.startswith("sqlite"):
+        event.listen(engine.sync_engine, "connect", _set_sqlite_pragmas)
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine.sync_engine, "handle_error", _handle_error)
+    return engine
 
 
 engine = get_engine()
@@ -87,7 +163,46 @@ def _migrate_accounts_to_profile_id(sync_conn):
         sync_conn.execute(text("ALTER TABLE accounts ADD COLUMN profile_id INTEGER"))
 
 
+def _migrate_key_rotations(sync_conn):
+    """Add the failed-row columns to key_rotations tables created before they existed."""
+    columns = [row[1] for row in sync_conn.execute(text("PRAGMA table_info(key_rotations)")).fetchall()]
+    for column in ("failed_credential_ids", "failed_setting_keys"):
+        if columns and column not in columns:
+            sync_conn.execute(text(f"ALTER TABLE key_rotations ADD COLUMN {column} JSON"))
+
+
+def _ensure_indexes(sync_conn):
+    """create_all skips indexes on tables that already exist (and the migration above recreates accounts)."""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
+
+
+# Stored in SQLite's PRAGMA user_version once create_all/migrations/indexes have run. Bump it whenever models,
+# indexes or migrations change so existing databases go through the full check once more.
+SCHEMA_VERSION = 2
+
+
 async def init_db():
+    sqlite = get_settings().database_url.startswith("sqlite")
     async with engine.begin() as conn:
+        if sqlite and (await conn.execute(text("PRAGMA user_version"))).scalar() == SCHEMA_VERSION:
+            return  # schema already current: skip per-table reflection on every boot
         await conn.run_sync(Base.metadata.create_all)
         await conn.run_sync(_migrate_accounts_to_profile_id)
+        if sqlite:
+            await conn.run_sync(_migrate_key_rotations)
+        await conn.run_sync(_ensure_indexes)
+        if sqlite:
+            await conn.execute(text(f"PRAGMA user_version = {SCHEMA_VERSION}"))
+
+
+async def close_db():
+    """Let SQLite refresh query-planner stats for the new indexes, then close pooled connections."""
+    if get_settings().database_url.startswith("sqlite"):
+        try:
+            async with engine.connect() as conn:
+                await conn.execute(text("PRAGMA optimize"))
+        except Exception:
+            pass
+    await engine.dispose()
@@ -0,0 +1,145 @@
+"""
+Request deadlines and adaptive upstream timeouts.
+
+A deadline set with deadline_after() applies to everything awaited inside it (it travels in a context
+variable, so tasks started there inherit it). Upstream requests never wait past it: the transport chain caps
+each request's timeout at the time left. Adapters call should_skip() before optional enrichment (token
+metadata, prices, sub-accounts) and serve what they have cached instead when the deadline is close, and
+publish_partial() what they already have, so an account cut off at its deadline still returns the balances
+fetched so far.
+
+Per-provider timeouts adapt to observed latency: once a provider has enough samples, a request's timeout
+is the chosen latency percentile times ADAPTIVE_TIMEOUT_MULTIPLIER (at least ADAPTIVE_TIMEOUT_MIN, never more
+than the adapter's own timeout), so a provider that normally answers in 300 ms fails in seconds, not 20 s.
+"""
+import math
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+
+from app.adapters.base import AdapterResult
+from app.config import get_settings
+from app.metrics import registry
+
+_LATENCY_SAMPLES = 200
+
+# time.monotonic() by which the current work must be done; None = no deadline.
+_deadline: ContextVar[float | None] = ContextVar("deadline", default=None)
+
+enrichment_skipped_total = registry.counter(
+    "mantracker_enrichment_skipped_total",
+    "Optional enrichment steps skipped (served from cache) because the request deadline was close.",
+    ("step",),
+)
+
+
+@contextmanager
+def deadline_after(seconds: float) -> Iterator[float]:
+    """Deadline `seconds` from now for the block; an earlier enclosing deadline still wins."""
+    deadline = time.monotonic() + seconds
+    outer = _deadline.get()
+    if outer is not None:
+        deadline = min(deadline, outer)
+    token = _deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> float | None:
+    """Seconds left before the current deadline (may be negative); None without a deadline."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def should_skip(step: str) -> bool:
+    """True when less than ENRICHMENT_RESERVE_SECONDS is left: skip the optional step and use cached data."""
+    left = remaining()
+    if left is None or left >= get_settings().enrichment_reserve_seconds:
+        return False
+    enrichment_skipped_total.inc(step=step)
+    return True
+
+
+class PartialResult:
+    """Latest balances an adapter has published for the account being fetched."""
+
+    def __init__(self) -> None:
+        self.result: AdapterResult | None = None
+
+
+_partial: ContextVar[PartialResult | None] = ContextVar("partial_result", default=None)
+
+
+@contextmanager
+def collect_partial() -> Iterator[PartialResult]:
+    """Collect publish_partial() calls made inside the block (including in tasks it starts)."""
+    holder = PartialResult()
+    token = _partial.set(holder)
+    try:
+        yield holder
+    finally:
+        _partial.reset(token)
+
+
+def publish_partial(result: AdapterResult) -> None:
+    """Record balances fetched so far, returned if the account is cut off before it finishes."""
+    holder = _partial.get()
+    if holder is not None and result.balances:
+        holder.result = result
+
+
+class LatencyTracker:
+    """Recent response latencies per provider (timeouts count at their timeout), for adaptive timeouts."""
+
+    def __init__(self) -> None:
+        self._samples: dict[str, deque[float]] = {}
+
+    def observe(self, provider: str, seconds: float) -> None:
+        samples = self._samples.get(provider)
+        if samples is None:
+            samples = self._samples[provider] = deque(maxlen=_LATENCY_SAMPLES)
+        samples.append(seconds)
+
+    def percentile(self, provider: str, q: float) -> float | None:
+        samples = self._samples.get(provider)
+        if not samples or len(samples) < get_settings().adaptive_timeout_min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, math.ceil(q * len(ordered)) - 1)]
+
+    def timeout_for(self, provider: str, default: float) -> float:
+        """Adaptive timeout for this provider, never above `default` (the adapter's own timeout)."""
+        settings = get_settings()
+        if not settings.adaptive_timeouts:
+            return default
+        observed = self.percentile(provider, settings.adaptive_timeout_percentile)
+        if observed is None:
+            return default
+        return min(default, max(settings.adaptive_timeout_min, observed * settings.adaptive_timeout_multiplier))
+
+    def timeout_samples(self) -> dict[tuple[str, ...], float]:
+        return {(p,): t for p in list(self._samples) if (t := self.timeout_for(p, math.inf)) != math.inf}
+
+
+latencies = LatencyTracker()
+
+
+registry.gauge(
+    "mantracker_upstream_adaptive_timeout_seconds",
+    "Adaptive request timeout per provider (latency percentile x multiplier; adapter timeouts still cap it).",
+    ("provider",),
+    callback=latencies.timeout_samples,
+)
+
+
+def upstream_timeout(provider: str, default: float) -> float:
+    """Timeout for one upstream request: adaptive per provider, capped by the current deadline."""
+    timeout = latencies.timeout_for(provider, default)
+    left = remaining()
+    if left is not None:
+        timeout = min(timeout, max(0.0, left))
+    return timeout
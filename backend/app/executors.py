@@ -0,0 +1,190 @@
+"""
+Managed executors for work that must stay off the event loop, in separately sized pools so one kind of work
+cannot starve another (a large wallet's token-list parse does not queue behind, or in front of, an unlock):
+
+- "cpu": process pool for big CPU-bound parses (token lists, large RPC results). Work submitted here must
+  be a module-level function with picklable arguments and result. With EXECUTOR_CPU_PROCESSES=0, or where
+  processes cannot be started, it runs in a thread instead.
+- "crypto": threads for key derivation, Fernet batches and BIP32 math (OpenSSL releases the GIL).
+- "exchange:<id>": one thread pool per exchange for the sync CCXT client, so a slow exchange only queues
+  its own calls.
+
+Queue depth, busy workers, queue wait and run time are exported per pool in /metrics.
+"""
+import asyncio
+import contextvars
+import functools
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, TypeVar
+
+from app.config import get_settings
+from app.metrics import registry
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+T = TypeVar("T")
+
+CPU_POOL = "cpu"
+CRYPTO_POOL = "crypto"
+
+
+class _Pool:
+    def __init__(self, name: str, executor: Executor, workers: int, in_process: bool):
+        self.name = name
+        self.executor = executor
+        self.workers = workers
+        self.in_process = in_process  # thread pool: context and tracing spans carry over
+        self.inflight = 0
+
+
+_pools: dict[str, _Pool] = {}
+_pools_lock = threading.Lock()
+
+
+def _depth_by_pool() -> dict[tuple[str, ...], float]:
+    return {(p.name,): max(0, p.inflight - p.workers) for p in list(_pools.values())}
+
+
+def _busy_by_pool() -> dict[tuple[str, ...], float]:
+    return {(p.name,): min(p.inflight, p.workers) for p in list(_pools.values())}
+
+
+registry.gauge(
+    "mantracker_executor_queue_depth",
+    "Work items waiting for a free worker, per executor pool.",
+    ("pool",),
+    callback=_depth_by_pool,
+)
+registry.gauge(
+    "mantracker_executor_busy_workers",
+    "Workers running an item, per executor pool.",
+    ("pool",),
+    callback=_busy_by_pool,
+)
+executor_wait_seconds = registry.histogram(
+    "mantracker_executor_wait_seconds",
+    "Time a work item waited in the queue before a worker picked it up.",
+    ("pool",),
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+executor_run_seconds = registry.histogram(
+    "mantracker_executor_run_seconds",
+    "Time a worker spent on a work item.",
+    ("pool",),
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+
+
+def _new_pool(name: str, allow_processes: bool = True) -> _Pool:
+    settings = get_settings()
+    if name == CPU_POOL:
+        processes = max(0, settings.executor_cpu_processes)
+        if processes and allow_processes:
+            try:
+                # spawn: forking a process that runs an event loop and worker threads is not safe.
+                executor = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn"))
+                return _Pool(name, executor, processes, in_process=False)
+            except Exception:
+                pass
+        workers = max(1, min(4, os.cpu_count() or 1))
+    elif name == CRYPTO_POOL:
+        workers = max(1, settings.executor_crypto_threads)
+    else:
+        workers = max(1, settings.executor_exchange_threads)
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"ThreadPoolExecutor-{name}")
+    return _Pool(name, executor, workers, in_process=True)
+
+
+def _get_pool(name: str) -> _Pool:
+    pool = _pools.get(name)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(name)
+            if pool is None:
+                pool = _pools[name] = _new_pool(name)
+    return pool
+
+
+def _timed_call(fn: Callable[..., T], args: tuple) -> tuple[float, float, T]:
+    """Runs in the worker (thread or process): returns wall-clock start and end with the result."""
+    started = time.time()
+    result = fn(*args)
+    return started, time.time(), result
+
+
+async def run_in_pool(pool_name: str, fn: Callable[..., T], *args: Any) -> T:
+    """Run fn(*args) in the named pool and await the result."""
+    pool = _get_pool(pool_name)
+    loop = asyncio.get_running_loop()
+    pool.inflight += 1
+    submitted = time.time()
+    try:
+        if pool.in_process:
+            ctx = contextvars.copy_context()
+            call = functools.partial(ctx.run, _timed_call, fn, args)
+        else:
+            call = functools.partial(_timed_call, fn, args)
+        started, finished, result = await loop.run_in_executor(pool.executor, call)
+    finally:
+        pool.inflight -= 1
+    executor_wait_seconds.observe(max(0.0, started - submitted), pool=pool_name)
+    executor_run_seconds.observe(max(0.0, finished - started), pool=pool_name)
+    return result
+
+
+async def run_cpu(fn: Callable[..., T], *args: Any) -> T:
+    """CPU-bound work in the process pool. fn must be importable by name; args and result must pickle."""
+    try:
+        return await run_in_pool(CPU_POOL, fn, *args)
+    except BrokenProcessPool:
+        # Worker processes could not start or died (frozen build, killed by the OS): use threads from now on.
+        with _pools_lock:
+            broken = _pools.get(CPU_POOL)
+            if broken is not None and not broken.in_process:
+                _pools[CPU_POOL] = _new_pool(CPU_POOL, allow_processes=False)
+        return await run_in_pool(CPU_POOL, fn, *args)
+
+
+async def run_crypto(fn: Callable[..., T], *args: Any) -> T:
+    return await run_in_pool(CRYPTO_POOL, fn, *args)
+
+
+async def run_exchange(exchange_id: str, fn: Callable[..., T], *args: Any) -> T:
+    """Blocking call of a sync exchange client, in that exchange's own thread pool."""
+    return await run_in_pool(f"exchange:{exchange_id or 'unknown'}", fn, *args)
+
+
+def loads(content: bytes | str) -> Any:
+    return orjson.loads(content) if orjson is not None else json.loads(content)
+
+
+async def reduce_json(fn: Callable[[bytes], T], content: bytes) -> T:
+    """
+    fn(content) for a response body: inline when small, in the CPU pool above CPU_OFFLOAD_MIN_BYTES. fn should
+    parse and reduce the document to what the caller needs: the result is unpickled on the loop's side while
+    holding the GIL, so returning the whole parsed document would stall the loop about as long as parsing it.
+    """
+    if len(content) < get_settings().cpu_offload_min_bytes:
+        return fn(content)
+    return await run_cpu(fn, content)
+
+
+def shutdown_executors() -> None:
+    """Stop all pools (on shutdown). Queued items are cancelled; running ones finish in the background."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        try:
+            pool.executor.shutdown(wait=False, cancel_futures=True)
+        except Exception:
+            pass
@@ -0,0 +1,165 @@
+"""
+Event loop lag monitor. A background task sleeps a fixed interval and records how late it wakes up (loop lag);
+a watchdog thread notices when that task has not run for longer than the block threshold and captures the
+loop thread's stack and current task at that moment, so the blocking call (PBKDF2, a big JSON parse, a sync
+library call) is attributed to the coroutine that made it. Blocks are counted in /metrics and the most
+recent ones, with stacks, are served at /debug/loop.
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+
+from app.config import get_settings
+from app.metrics import registry
+
+loop_lag_seconds = registry.histogram(
+    "mantracker_event_loop_lag_seconds",
+    "How late the loop monitor's periodic wake-up ran (event loop lag).",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+loop_blocks_total = registry.counter(
+    "mantracker_event_loop_blocks_total",
+    "Times the event loop was blocked longer than the threshold, by the task that was running.",
+    ("task",),
+)
+loop_blocked_seconds_total = registry.counter(
+    "mantracker_event_loop_blocked_seconds_total",
+    "Total time the event loop was blocked beyond the threshold, by the task that was running.",
+    ("task",),
+)
+
+_MAX_STACK_FRAMES = 40
+
+
+@dataclass
+class LoopBlock:
+    started_at: float  # unix time the block was detected
+    task: str  # coroutine qualname of the running task, or "(callback)"
+    task_name: str | None
+    stack: list[str]
+    duration_ms: float | None = None  # set once the loop runs again
+    ongoing: bool = True
+
+    def to_dict(self) -> dict:
+        return {
+            "started_at": self.started_at,
+            "task": self.task,
+            "task_name": self.task_name,
+            "duration_ms": self.duration_ms,
+            "ongoing": self.ongoing,
+            "stack": self.stack,
+        }
+
+
+def _stack_lines(frame) -> list[str]:
+    lines = []
+    while frame is not None and len(lines) < _MAX_STACK_FRAMES:
+        code = frame.f_code
+        filename = code.co_filename.replace(os.sep, "/")
+        for marker in ("/site-packages/", "/backend/", "/lib/python"):
+            if marker in filename:
+                filename = filename.split(marker, 1)[1]
+                break
+        lines.append(f"{getattr(code, 'co_qualname', code.co_name)} ({filename}:{frame.f_lineno})")
+        frame = frame.f_back
+    lines.reverse()  # outermost first, like a traceback
+    return lines
+
+
+def _task_label(task: asyncio.Task | None) -> tuple[str, str | None]:
+    if task is None:
+        return "(callback)", None
+    coro = task.get_coro()
+    return getattr(coro, "__qualname__", type(coro).__name__), task.get_name()
+
+
+class LoopMonitor:
+    def __init__(self) -> None:
+        settings = get_settings()
+        self.interval = max(0.005, settings.loop_lag_interval_ms / 1000)
+        self.threshold = max(0.005, settings.loop_block_threshold_ms / 1000)
+        self.blocks: deque[LoopBlock] = deque(maxlen=max(1, settings.loop_block_buffer_size))
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread_id: int | None = None
+        self._last_beat = time.monotonic()
+        self._open: LoopBlock | None = None
+        self._task: asyncio.Task | None = None
+        self._stop = threading.Event()
+        self._watchdog: threading.Thread | None = None
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._beat(), name="loop-monitor")
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog is not None:
+            await asyncio.to_thread(self._watchdog.join)
+            self._watchdog = None
+
+    async def _beat(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            loop_lag_seconds.observe(lag)
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            self._last_beat = time.monotonic()
+            block = self._open
+            if block is not None:
+                self._open = None
+                block.duration_ms = round(lag * 1000, 1)
+                block.ongoing = False
+                loop_blocked_seconds_total.inc(lag, task=block.task)
+
+    def _watch(self) -> None:
+        """Watchdog thread: capture the loop thread's stack once per block, while it is still blocked."""
+        while not self._stop.wait(min(self.interval, self.threshold) / 2):
+            last_beat = self._last_beat
+            overdue = time.monotonic() - last_beat - self.interval
+            if overdue < self.threshold or self._open is not None:
+                continue
+            try:
+                frame = sys._current_frames().get(self._loop_thread_id)
+                task, task_name = _task_label(asyncio.current_task(self._loop))
+            except Exception:
+                continue
+            if self._last_beat != last_beat:
+                continue  # the loop got going again while we looked; the stack may be unrelated
+            block = LoopBlock(started_at=time.time() - overdue, task=task, task_name=task_name, stack=_stack_lines(frame))
+            self._open = block
+            self.blocks.append(block)
+            loop_blocks_total.inc(task=task)
+
+    def status(self) -> dict:
+        return {
+            "running": self._task is not None,
+            "interval_ms": self.interval * 1000,
+            "threshold_ms": self.threshold * 1000,
+            "last_lag_ms": round(self.last_lag * 1000, 2),
+            "max_lag_ms": round(self.max_lag * 1000, 2),
+            "blocks": [b.to_dict() for b in reversed(self.blocks)],
+        }
+
+
+loop_monitor = LoopMonitor()
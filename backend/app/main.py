@@ -1,19 +1,98 @@
+import time
+
+_STARTED = time.perf_counter()  # before the heavy imports below, so the startup report includes them
+
+import asyncio
+import importlib
+import logging
+import sys
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 
 from app.config import get_settings
-from app.db import init_db
-from app.routers import profiles, accounts, portfolio, unlock, settings
-from app.security.crypto import AppLockedError, CredentialDecryptError
+from app.db import close_db, init_db
+from app.executors import shutdown_executors
+from app.loop_monitor import loop_monitor
+from app.metrics import registry
+from app.profiling import ProfilingMiddleware
+from app.tracing import TracingMiddleware
+from app.services.key_rotation import stop_rotation
+from app.services.live_balances import live_balances
+from app.routers import profiles, accounts, portfolio, unlock, settings, debug
+from app.security.crypto import AppLockedError, CredentialDecryptError, clear_app_passphrase, ensure_keyring_ready
+
+
+async def _warm_keyring() -> None:
+    """Derive the ENCRYPTION_KEY/SECRET_KEY Fernet key in a worker thread before the first request needs it."""
+    try:
+        await ensure_keyring_ready()
+    except AppLockedError:
+        pass  # passphrase mode: derived on unlock
+
+
+# Loaded in a worker thread once the server is up, so the first balance fetch doesn't pay for them.
+_WARM_MODULES = ("app.adapters.wallet_adapter", "app.adapters.exchange_adapter", "ccxt.async_support")
+
+logger = logging.getLogger("uvicorn.error")
+# Startup phases in ms (imports, init_db, ready) plus background warm-up times per module.
+startup_report: dict = {"warmup": {}}
+
+
+async def _warm_imports() -> None:
+    for name in _WARM_MODULES:
+        started = time.perf_counter()
+        try:
+            await asyncio.to_thread(importlib.import_module, name)
+        except Exception:
+            continue
+        startup_report["warmup"][name] = round((time.perf_counter() - started) * 1000, 1)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    app_settings = get_settings()
+    lifespan_started = time.perf_counter()
+    startup_report["imports_ms"] = round((lifespan_started - _STARTED) * 1000, 1)
+    if app_settings.upstream_cassette_mode.lower() != "off":
+        from app.adapters.cassette import configure_cassette
+
+        configure_cassette()
     await init_db()
+    startup_report["init_db_ms"] = round((time.perf_counter() - lifespan_started) * 1000, 1)
+    if app_settings.loop_monitor_enabled:
+        loop_monitor.start()
+    background = [asyncio.create_task(_warm_keyring())]
+    if app_settings.startup_warmup:
+        background.append(asyncio.create_task(_warm_imports()))
+    ready_ms = round((time.perf_counter() - _STARTED) * 1000, 1)
+    startup_report.update(ready_ms=ready_ms, budget_ms=app_settings.startup_budget_ms)
+    log = logger.warning if ready_ms > app_settings.startup_budget_ms else logger.info
+    log(
+        "Startup: ready in %.0f ms (imports %.0f ms, init_db %.0f ms; budget %.0f ms)",
+        ready_ms,
+        startup_report["imports_ms"],
+        startup_report["init_db_ms"],
+        app_settings.startup_budget_ms,
+    )
     yield
-    # shutdown if needed
+    for task in background:
+        task.cancel()
+    await loop_monitor.stop()
+    shutdown_executors()
+    await live_balances.stop_all()
+    await stop_rotation()
+    if "app.adapters.btc_backends" in sys.modules:
+        from app.adapters.btc_backends import close_btc_backend
+
+        await close_btc_backend()
+    if "app.adapters.cassette" in sys.modules:
+        from app.adapters.cassette import close_cassette
+
+        close_cassette()
+    clear_app_passphrase()
+    await close_db()
 
 
 app = FastAPI(
@@ -28,13 +107,17 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Balances-Version", "X-Removed-Accounts", "X-Debug-Profile-Id"],
 )
+app.add_middleware(TracingMiddleware)
+app.add_middleware(ProfilingMiddleware)
 
 app.include_router(profiles.router)
 app.include_router(accounts.router)
 app.include_router(portfolio.router)
 app.include_router(unlock.router)
 app.include_router(settings.router)
+app.include_router(debug.router)
 
 
 @app.exception_handler(AppLockedError)
@@ -56,3 +139,15 @@ def credential_decrypt_handler(request, exc: CredentialDecryptError):
 @app.get("/health")
 def health():
     return {"status": "ok"}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus text format: upstream/adapter latency, 429s, timeouts, DB queries, cache hit ratios."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/health/startup")
+def health_startup():
+    """Startup timing (ms) against STARTUP_BUDGET_MS, and background warm-up progress."""
+    return startup_report
@@ -0,0 +1,225 @@
+"""
+In-process metrics in Prometheus text format (served at /metrics). Counters, gauges and histograms with
+labels; no client library or external collector needed. Label values must not contain secrets.
+"""
+import bisect
+import math
+import threading
+from typing import Callable, Iterable
+
+# Upstream calls range from a few ms (local Electrum) to tens of seconds (rate-limited public RPCs).
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def samples(self) -> list[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", *self.samples()]
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> list[str]:
+        return [f"{self.name}{_labels(self.labelnames, k)} {_number(v)}" for k, v in sorted(self._values.items())]
+
+
+class Gauge(_Metric):
+    """Set directly, or computed at scrape time from a callback returning {label values: value}."""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Iterable[str] = (),
+        callback: Callable[[], dict[tuple[str, ...], float]] | None = None,
+    ):
+        super().__init__(name, help, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+        self._callback = callback
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def samples(self) -> list[str]:
+        values = dict(self._values)
+        if self._callback is not None:
+            try:
+                values.update(self._callback())
+            except Exception:
+                pass
+        return [f"{self.name}{_labels(self.labelnames, k)} {_number(v)}" for k, v in sorted(values.items())]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (), buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> (per-bucket counts incl. +Inf, sum, count)
+        self._values: dict[tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][bisect.bisect_left(self.buckets, value)] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self) -> list[str]:
+        out: list[str] = []
+        for key, (counts, total, count) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, n in zip((*self.buckets, math.inf), counts):
+                cumulative += n
+                le = 'le="' + _number(bound) + '"'
+                out.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            out.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+            out.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+        return out
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))  # type: ignore[return-value]
+
+    def gauge(self, name: str, help: str, labelnames: Iterable[str] = (), callback=None) -> Gauge:
+        return self.register(Gauge(name, help, labelnames, callback))  # type: ignore[return-value]
+
+    def histogram(self, name: str, help: str, labelnames: Iterable[str] = (), buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))  # type: ignore[return-value]
+
+    def render(self) -> str:
+        return "\n".join(m.render() for m in self._metrics.values()) + "\n"
+
+
+registry = Registry()
+
+# --- Metrics shared across modules ---
+
+upstream_request_seconds = registry.histogram(
+    "mantracker_upstream_request_duration_seconds",
+    "Upstream HTTP request latency.",
+    ("provider", "host", "chain", "method", "status"),
+)
+upstream_errors_total = registry.counter(
+    "mantracker_upstream_errors_total",
+    "Upstream HTTP requests that failed without a response (timeout, connect, other).",
+    ("provider", "host", "chain", "kind"),
+)
+upstream_rate_limited_total = registry.counter(
+    "mantracker_upstream_rate_limited_total",
+    "Upstream HTTP 429 responses.",
+    ("provider", "host", "chain"),
+)
+adapter_fetch_seconds = registry.histogram(
+    "mantracker_adapter_fetch_duration_seconds",
+    "Balance fetch latency per adapter call.",
+    ("adapter", "provider"),
+)
+adapter_errors_total = registry.counter(
+    "mantracker_adapter_errors_total",
+    "Balance fetches that returned an error (partial or total).",
+    ("adapter", "provider"),
+)
+adapter_timeouts_total = registry.counter(
+    "mantracker_adapter_timeouts_total",
+    "Account balance fetches cut off by the per-account timeout.",
+    ("adapter", "provider"),
+)
+db_query_seconds = registry.histogram(
+    "mantracker_db_query_duration_seconds",
+    "Database statement latency.",
+    ("operation",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+cache_requests_total = registry.counter(
+    "mantracker_cache_requests_total",
+    "Lookups in in-process caches by result (hit/miss, or coalesced when a fill was already in flight).",
+    ("cache", "result"),
+)
+
+
+def cache_hit(cache: str, n: int = 1) -> None:
+    if n:
+        cache_requests_total.inc(n, cache=cache, result="hit")
+
+
+def cache_miss(cache: str, n: int = 1) -> None:
+    if n:
+        cache_requests_total.inc(n, cache=cache, result="miss")
+
+
+def cache_coalesced(cache: str, n: int = 1) -> None:
+    if n:
+        cache_requests_total.inc(n, cache=cache, result="coalesced")
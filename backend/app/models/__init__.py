@@ -1,5 +1,6 @@
 from .profile import Profile
 from .account import Account, AccountType, AccountCredential
 from .app_setting import AppSetting
+from .key_rotation import KeyRotation
 
-__all__ = ["Profile", "Account", "AccountType", "AccountCredential", "AppSetting"]
+__all__ = ["Profile", "Account", "AccountType", "AccountCredential", "AppSetting", "KeyRotation"]
@@ -1,7 +1,7 @@
 """Account and encrypted credentials. Credentials never exposed in API responses."""
 import enum
 from datetime import datetime
-from sqlalchemy import String, Text, DateTime, ForeignKey, Enum
+from sqlalchemy import String, Text, DateTime, ForeignKey, Enum, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.db import Base
 
@@ -15,6 +15,11 @@ class AccountType(str, enum.Enum):
 
 class Account(Base):
     __tablename__ = "accounts"
+    __table_args__ = (
+        # Active accounts of a profile (aggregator, batch fetches) and the newest-first account list.
+        Index("ix_accounts_profile_active", "profile_id", "is_active"),
+        Index("ix_accounts_profile_created", "profile_id", "created_at"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     profile_id: Mapped[int] = mapped_column(ForeignKey("profiles.id", ondelete="CASCADE"), nullable=False)
@@ -0,0 +1,27 @@
+"""Progress of a credential re-encryption (key rotation) job. Holds checkpoints only, never key material."""
+from datetime import datetime
+from sqlalchemy import JSON, String, Text, DateTime
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db import Base
+
+
+class KeyRotation(Base):
+    __tablename__ = "key_rotations"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    # running | interrupted | completed | failed
+    status: Mapped[str] = mapped_column(String(16), nullable=False, default="running")
+    total: Mapped[int] = mapped_column(default=0)
+    rotated: Mapped[int] = mapped_column(default=0)
+    failed: Mapped[int] = mapped_column(default=0)
+    # Keyset checkpoints: everything at or before these has been committed with the new key.
+    last_credential_id: Mapped[int] = mapped_column(default=0)
+    last_setting_key: Mapped[str] = mapped_column(String(64), default="")
+    # Rows behind the checkpoints that no key could decrypt; retried when the job is resumed.
+    failed_credential_ids: Mapped[list | None] = mapped_column(JSON, nullable=True)
+    failed_setting_keys: Mapped[list | None] = mapped_column(JSON, nullable=True)
+    error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    started_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
@@ -0,0 +1,244 @@
+"""
+On-demand request profiling. With PROFILING_ENABLED set, a request carrying the X-Debug-Profile: 1 header
+(or ?debug_profile=1) runs under a sampling profiler and the result is kept in memory for download from
+/debug/profiles; the response carries X-Debug-Profile-Id. Off by default; nothing is sampled otherwise.
+
+pyinstrument (optional dependency) is used when installed: its async mode attributes time spent awaiting
+to the awaiting coroutine, and profiles are stored as an HTML flame view plus speedscope JSON. Without it a
+built-in sampler walks the event loop thread (and busy worker threads) every few ms and stores collapsed
+stacks ("a;b;c 12", for flamegraph.pl or speedscope), with loop machinery trimmed off and idle time in the
+selector counted as "(idle: awaiting I/O)". The built-in sampler sees the whole process, so requests
+running concurrently with the profiled one show up too.
+"""
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from dataclasses import dataclass, field
+
+from app.config import get_settings
+
+PROFILE_HEADER = b"x-debug-profile"
+PROFILE_QUERY_FLAG = "debug_profile=1"
+_UNPROFILED_PREFIXES = ("/health", "/metrics", "/debug")
+
+# Frames from these stdlib files above the running callback are event loop machinery.
+_LOOP_FILES = ("asyncio/events.py", "asyncio/base_events.py", "asyncio/runners.py", "uvloop")
+_IDLE_FUNCTIONS = {"select", "poll", "epoll", "kqueue"}
+# Innermost frame of a pool thread with no work item (the queue get itself is C code).
+_THREAD_IDLE_FUNCTIONS = {"_worker", "wait", "get", "_wait_for_tstate_lock"}
+_WORKER_THREAD_PREFIXES = ("asyncio_", "ThreadPoolExecutor")
+IDLE_FRAME = "(idle: awaiting I/O)"
+
+
+@dataclass
+class StoredProfile:
+    id: str
+    method: str
+    path: str
+    engine: str  # pyinstrument | sampler
+    started_at: float = field(default_factory=time.time)
+    duration_ms: float = 0.0
+    status_code: int | None = None
+    samples: int | None = None
+    # format -> (media type, file extension, content)
+    outputs: dict[str, tuple[str, str, bytes]] = field(default_factory=dict)
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "engine": self.engine,
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms,
+            "status_code": self.status_code,
+            "samples": self.samples,
+            "formats": list(self.outputs),
+        }
+
+
+class ProfileStore:
+    """Last N request profiles."""
+
+    def __init__(self) -> None:
+        self._profiles: deque[StoredProfile] = deque(maxlen=max(1, get_settings().profile_buffer_size))
+
+    def add(self, profile: StoredProfile) -> None:
+        self._profiles.append(profile)
+
+    def list(self) -> list[StoredProfile]:
+        return list(reversed(self._profiles))
+
+    def get(self, profile_id: str) -> StoredProfile | None:
+        return next((p for p in self._profiles if p.id == profile_id), None)
+
+    def clear(self) -> None:
+        self._profiles.clear()
+
+
+profiles = ProfileStore()
+
+
+def _frame_label(code) -> str:
+    filename = code.co_filename.replace(os.sep, "/")
+    for marker in ("/site-packages/", "/backend/", "/lib/python"):
+        if marker in filename:
+            filename = filename.split(marker, 1)[1]
+            break
+    return f"{code.co_qualname if hasattr(code, 'co_qualname') else code.co_name} ({filename})"
+
+
+def _is_loop_frame(code) -> bool:
+    filename = code.co_filename.replace(os.sep, "/")
+    return any(f in filename for f in _LOOP_FILES)
+
+
+class StackSampler:
+    """Samples thread stacks from a background thread into collapsed-stack counts."""
+
+    def __init__(self, loop_thread_id: int, interval: float):
+        self.loop_thread_id = loop_thread_id
+        self.interval = interval
+        self.counts: Counter[str] = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _stack(self, frame) -> list:
+        codes = []
+        while frame is not None:
+            codes.append(frame.f_code)
+            frame = frame.f_back
+        codes.reverse()
+        return codes
+
+    def _sample(self) -> None:
+        frames = sys._current_frames()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for thread_id, frame in frames.items():
+            if thread_id == self._thread.ident:
+                continue
+            codes = self._stack(frame)
+            if not codes:
+                continue
+            if thread_id == self.loop_thread_id:
+                # Blocked in the selector, called straight from the loop: nothing is running.
+                if len(codes) > 1 and codes[-1].co_name in _IDLE_FUNCTIONS and _is_loop_frame(codes[-2]):
+                    self.counts[IDLE_FRAME] += 1
+                    continue
+                # Drop run_forever/_run_once/Handle._run so stacks start at the running task or callback.
+                last_loop = max((i for i, c in enumerate(codes) if _is_loop_frame(c)), default=-1)
+                codes = codes[last_loop + 1 :]
+                root = "[event loop]"
+            else:
+                name = names.get(thread_id, "")
+                if not name.startswith(_WORKER_THREAD_PREFIXES) or codes[-1].co_name in _THREAD_IDLE_FUNCTIONS:
+                    continue
+                root = f"[thread {name}]"
+            if codes:
+                self.counts[";".join([root, *(_frame_label(c) for c in codes)])] += 1
+        self.samples += 1
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self._sample()
+            except Exception:
+                pass
+
+    def collapsed(self) -> bytes:
+        return "".join(f"{stack} {n}\n" for stack, n in self.counts.most_common()).encode()
+
+
+def _pyinstrument_profiler(interval: float):
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        return None
+    return Profiler(interval=interval, async_mode="enabled")
+
+
+def _wants_profile(scope) -> bool:
+    if any(k == PROFILE_HEADER and v in (b"1", b"true") for k, v in scope.get("headers") or []):
+        return True
+    return PROFILE_QUERY_FLAG in (scope.get("query_string") or b"").decode("latin-1")
+
+
+# One profile at a time: both engines observe the whole process.
+_active = threading.Lock()
+
+
+class ProfilingMiddleware:
+    """ASGI middleware: profile flagged requests when PROFILING_ENABLED is set."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        settings = get_settings()
+        path = scope.get("path", "")
+        if (
+            scope["type"] != "http"
+            or not settings.profiling_enabled
+            or path.startswith(_UNPROFILED_PREFIXES)
+            or not _wants_profile(scope)
+            or not _active.acquire(blocking=False)
+        ):
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self._profile(scope, receive, send, settings.profile_sample_interval_ms / 1000)
+        finally:
+            _active.release()
+
+    async def _profile(self, scope, receive, send, interval: float) -> None:
+        profiler = _pyinstrument_profiler(interval)
+        stored = StoredProfile(
+            id=uuid.uuid4().hex[:12],
+            method=scope["method"],
+            path=scope.get("path", ""),
+            engine="pyinstrument" if profiler is not None else "sampler",
+        )
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                stored.status_code = message["status"]
+                message = {**message, "headers": [*message.get("headers", []), (b"x-debug-profile-id", stored.id.encode())]}
+            await send(message)
+
+        sampler = None
+        started = time.perf_counter()
+        if profiler is not None:
+            profiler.start()
+        else:
+            sampler = StackSampler(threading.get_ident(), interval)
+            sampler.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            stored.duration_ms = round((time.perf_counter() - started) * 1000, 1)
+            try:
+                if profiler is not None:
+                    from pyinstrument.renderers import SpeedscopeRenderer
+
+                    session = profiler.stop()
+                    stored.samples = session.sample_count
+                    stored.outputs["html"] = ("text/html", "html", profiler.output_html().encode())
+                    stored.outputs["speedscope"] = ("application/json", "speedscope.json", profiler.output(SpeedscopeRenderer()).encode())
+                else:
+                    sampler.stop()
+                    stored.samples = sampler.samples
+                    stored.outputs["collapsed"] = ("text/plain", "folded.txt", sampler.collapsed())
+                profiles.add(stored)
+            except Exception:
+                pass  # a failed profile never fails the request
@@ -0,0 +1,47 @@
+"""
+Fast JSON path for balance payloads: BalanceItem lists are turned into plain dicts in one pass and encoded
+with orjson when installed (stdlib json otherwise), skipping response_model validation. Same JSON shape as
+the Pydantic models they replace.
+"""
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+from app.adapters.base import AdapterResult
+
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def account_balances_dict(account_id: int, result: AdapterResult) -> dict:
+    """Body of /accounts/{id}/balances (AccountBalancesResponse shape): positive amounts, all keys present."""
+    return {
+        "id": account_id,
+        "balances": [
+            {
+                "asset": b.asset,
+                "amount": float(b.amount),
+                "currency": b.currency,
+                "usd_value": float(b.usd_value) if b.usd_value is not None else None,
+                "chain": b.chain,
+                "name": b.raw_name,
+            }
+            for b in (result.balances or [])
+            if b.amount and float(b.amount) > 0
+        ],
+        "error": result.error,
+    }
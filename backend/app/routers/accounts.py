@@ -1,6 +1,6 @@
 """CRUD for accounts. Credentials stored encrypted; never returned in API."""
 import asyncio
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from pydantic import BaseModel
 from sqlalchemy import select
 from sqlalchemy.orm import selectinload
@@ -8,13 +8,22 @@ from sqlalchemy.orm import selectinload
 from app.db import AsyncSession, get_db
 from app.models import Account, AccountType, AccountCredential
 from app.security import get_current_profile
+from app.security.crypto import AppLockedError, ensure_keyring_ready
 from app.services.credential_store import encrypt_credential_payload
 from app.models import Profile
-from app.services.portfolio_aggregator import fetch_account_balances, FETCH_ACCOUNT_TIMEOUT
-from app.adapters.base import AdapterResult
+from app.services.portfolio_aggregator import fetch_account_snapshot
+from app.services.live_balances import live_balances
+from app.services.credential_vault import credential_vault
+from app.services.balance_snapshots import balance_snapshots, etag, etag_matches
+from app.services.portfolio_summary import portfolio_rollups
+from app.responses import FastJSONResponse, account_balances_dict
 
 router = APIRouter(prefix="/accounts", tags=["accounts"])
 
+# Batch balances: most accounts per request, and how many of them are fetched from upstream at once.
+MAX_BATCH_ACCOUNTS = 500
+BATCH_FETCH_CONCURRENCY = 8
+
 
 class AccountCreate(BaseModel):
     name: str
@@ -50,6 +59,10 @@ class AccountBalancesResponse(BaseModel):
     error: str | None = None
 
 
+class BatchBalancesRequest(BaseModel):
+    account_ids: list[int]
+
+
 class AccountUpdate(BaseModel):
     name: str | None = None
 
@@ -74,12 +87,13 @@ async def list_accounts(
 @router.get("/{account_id}/balances", response_model=AccountBalancesResponse)
 async def get_account_balances(
     account_id: int,
+    request: Request,
     db: AsyncSession = Depends(get_db),
     profile: Profile = Depends(get_current_profile),
 ):
     """
     Fetch balances for a single account. This is used by the UI to render account cards first,
-    then populate balances incrementally with retries on failures.
+    then populate balances incrementally with retries on failures. Strong ETag; 304 when unchanged.
     """
     q = (
         select(Account)
@@ -90,25 +104,56 @@ async def get_account_balances(
     account = r.scalar_one_or_none()
     if not account:
         raise HTTPException(status_code=404, detail="Account not found")
-
-    try:
-        result = await asyncio.wait_for(fetch_account_balances(db, account), timeout=FETCH_ACCOUNT_TIMEOUT)
-    except asyncio.TimeoutError:
-        result = AdapterResult(balances=[], error="Request timed out")
-
-    balances = [
-        BalanceItemResponse(
-            asset=b.asset,
-            amount=b.amount,
-            currency=b.currency,
-            usd_value=b.usd_value,
-            chain=b.chain,
-            name=b.raw_name,
-        )
-        for b in (result.balances or [])
-        if b.amount and float(b.amount) > 0
-    ]
-    return AccountBalancesResponse(id=account.id, balances=balances, error=result.error)
+    if account.credential and not credential_vault.is_cached(account.credential):
+        # The UI fetches accounts one by one; decrypt the whole profile once instead of per request.
+        await credential_vault.warm_profile(db, profile.id)
+
+    snapshot = await fetch_account_snapshot(db, account)
+    tag = etag(account.id, snapshot.digest)
+    headers = {"ETag": tag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), tag):
+        return Response(status_code=304, headers=headers)
+    # Built and encoded directly (orjson); response_model is kept for the API schema only.
+    return FastJSONResponse(account_balances_dict(account.id, snapshot.result), headers=headers)
+
+
+@router.post("/balances", response_model=list[AccountBalancesResponse])
+async def get_balances_batch(
+    body: BatchBalancesRequest,
+    db: AsyncSession = Depends(get_db),
+    profile: Profile = Depends(get_current_profile),
+):
+    """
+    Balances for many accounts in one request: one query, one credential decrypt batch and concurrent
+    upstream fetches. Results follow the requested order; failures are reported per account in `error`.
+    """
+    account_ids = list(dict.fromkeys(body.account_ids))
+    if len(account_ids) > MAX_BATCH_ACCOUNTS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_ACCOUNTS} accounts per request")
+    q = (
+        select(Account)
+        .where(Account.id.in_(account_ids), Account.profile_id == profile.id, Account.is_active == True)
+        .options(selectinload(Account.credential))
+    )
+    r = await db.execute(q)
+    accounts = {a.id: a for a in r.scalars().all()}
+    await credential_vault.load_many([a.credential for a in accounts.values() if a.credential])
+    limiter = asyncio.Semaphore(BATCH_FETCH_CONCURRENCY)
+
+    async def one(account_id: int) -> dict:
+        account = accounts.get(account_id)
+        if account is None:
+            return {"id": account_id, "balances": [], "error": "Account not found"}
+        try:
+            async with limiter:
+                snapshot = await fetch_account_snapshot(db, account)
+        except AppLockedError:
+            raise
+        except Exception as e:
+            return {"id": account_id, "balances": [], "error": str(e)}
+        return account_balances_dict(account_id, snapshot.result)
+
+    return FastJSONResponse(await asyncio.gather(*(one(account_id) for account_id in account_ids)))
 
 
 @router.post("", response_model=AccountResponse)
@@ -133,6 +178,7 @@ async def create_account(
         type=atype,
         provider=provider,
     )
+    await ensure_keyring_ready()
     db.add(account)
     await db.flush()
     cred = AccountCredential(
@@ -168,6 +214,7 @@ async def update_account(
         if not name:
             raise HTTPException(status_code=400, detail="Account name cannot be empty")
         account.name = name
+    credential_vault.invalidate(account.id)
 
     return AccountResponse(
         id=account.id,
@@ -190,4 +237,8 @@ async def delete_account(
     if not account:
         raise HTTPException(status_code=404, detail="Account not found")
     await db.delete(account)
+    credential_vault.invalidate(account_id)
+    balance_snapshots.discard(account_id)
+    portfolio_rollups.remove_account(account_id)
+    await live_balances.stop(account_id)
     return {"ok": True}
@@ -0,0 +1,103 @@
+"""
+Debug views: recent request traces as waterfall JSON (or OTLP/JSON), request profiles for download, event
+loop blocks, upstream quota headroom, circuit breaker state and the upstream cassette state. Local-only app; no credentials in spans, profiles or cassettes.
+"""
+from fastapi import APIRouter, HTTPException, Response
+
+from app.loop_monitor import loop_monitor
+from app.profiling import profiles
+from app.tracing import traces
+
+router = APIRouter(prefix="/debug", tags=["debug"])
+
+
+@router.get("/traces")
+def list_traces(limit: int = 50) -> list[dict]:
+    """Most recent traces first, one summary line each."""
+    return [t.summary() for t in traces.list()[: max(0, limit)]]
+
+
+@router.get("/traces/{trace_id}")
+def get_trace(trace_id: str, format: str = "waterfall") -> dict:
+    """One trace: `waterfall` (spans with offsets and depth) or `otlp` (OTLP/JSON resourceSpans)."""
+    trace = traces.get(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Trace not found (only the most recent traces are kept)")
+    if format == "otlp":
+        return trace.to_otlp()
+    return trace.waterfall()
+
+
+@router.delete("/traces")
+def clear_traces() -> dict:
+    traces.clear()
+    return {"ok": True}
+
+
+@router.get("/profiles")
+def list_profiles() -> list[dict]:
+    """Stored request profiles, most recent first (enable with PROFILING_ENABLED)."""
+    return [p.summary() for p in profiles.list()]
+
+
+@router.get("/profiles/{profile_id}")
+def download_profile(profile_id: str, format: str | None = None) -> Response:
+    """Profile as a file: html/speedscope (pyinstrument) or collapsed stacks (built-in sampler)."""
+    profile = profiles.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found (only the most recent profiles are kept)")
+    fmt = format or next(iter(profile.outputs), None)
+    if fmt not in profile.outputs:
+        raise HTTPException(status_code=404, detail=f"Format not available; have: {', '.join(profile.outputs)}")
+    media_type, extension, content = profile.outputs[fmt]
+    filename = f"profile-{profile.id}.{extension}"
+    return Response(content, media_type=media_type, headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+
+@router.delete("/profiles")
+def clear_profiles() -> dict:
+    profiles.clear()
+    return {"ok": True}
+
+
+@router.get("/loop")
+def loop_status() -> dict:
+    """Event loop lag and recent blocks (longer than LOOP_BLOCK_THRESHOLD_MS) with the blocking stack and task."""
+    return loop_monitor.status()
+
+
+@router.get("/quotas")
+def quota_status() -> dict:
+    """Upstream usage and remaining headroom per provider, API key hash and budget window."""
+    from app.adapters.quota import quotas
+
+    return quotas.status()
+
+
+@router.get("/circuits")
+def circuit_status() -> dict:
+    """Circuit breaker state per upstream endpoint."""
+    from app.adapters.breaker import breakers
+
+    return breakers.status()
+
+
+@router.get("/cassette")
+def cassette_status() -> dict:
+    """Record/replay state: mode, entries, and replay hits/repeats/misses."""
+    from app.adapters import cassette as upstream_cassette
+
+    if upstream_cassette.cassette is None:
+        return {"mode": "off"}
+    return upstream_cassette.cassette.status()
+
+
+@router.post("/cassette/save")
+def save_cassette() -> dict:
+    """Write the recording so far (it is also written on shutdown)."""
+    from app.adapters import cassette as upstream_cassette
+
+    active = upstream_cassette.cassette
+    if active is None or active.mode != "record":
+        raise HTTPException(status_code=409, detail="Not recording (set UPSTREAM_CASSETTE_MODE=record)")
+    return {"path": active.path, "entries": active.save()}
@@ -1,30 +1,97 @@
 """Portfolio aggregation. No credentials in response."""
 import asyncio
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import Response
 from app.db import AsyncSession, get_db
+from app.deadline import deadline_after
+from app.responses import FastJSONResponse
 from app.security import get_current_profile
-from app.services.portfolio_aggregator import aggregate_portfolio
+from app.services.balance_snapshots import balance_snapshots, etag, etag_matches
+from app.services.portfolio_aggregator import active_accounts, collect_portfolio, portfolio_entry
+from app.services.portfolio_summary import portfolio_rollups
 from app.models import Profile
 
 router = APIRouter(prefix="/portfolio", tags=["portfolio"])
 
-# Overall timeout so the endpoint never hangs indefinitely
+# Overall deadline accounts are fetched under, so accounts late in the run skip optional enrichment and a
+# cut-off account keeps its partial balances.
 PORTFOLIO_TIMEOUT = 120.0
+# Backstop past the deadline so the endpoint never hangs indefinitely. Account fetches return (partial)
+# results within FETCH_ACCOUNT_GRACE of the deadline, well before this fires.
+PORTFOLIO_GRACE = 5.0
 
 
 @router.get("")
 async def get_portfolio(
+    request: Request,
+    since: str | None = None,
     db: AsyncSession = Depends(get_db),
     profile: Profile = Depends(get_current_profile),
 ):
-    """Aggregated balances per account. Credentials never included."""
+    """
+    Aggregated balances per account. Credentials never included.
+    Carries a strong ETag (304 on a matching If-None-Match) and an X-Balances-Version token; pass the token
+    back as ?since= to receive only the accounts whose balances changed after it. Accounts deleted after it
+    are listed in X-Removed-Accounts (comma-separated ids).
+    """
     try:
-        return await asyncio.wait_for(
-            aggregate_portfolio(db, profile.id),
-            timeout=PORTFOLIO_TIMEOUT,
-        )
+        with deadline_after(PORTFOLIO_TIMEOUT):
+            entries = await asyncio.wait_for(
+                collect_portfolio(db, profile.id),
+                timeout=PORTFOLIO_TIMEOUT + PORTFOLIO_GRACE,
+            )
     except asyncio.TimeoutError:
         raise HTTPException(
             status_code=504,
             detail="Portfolio aggregation timed out. Try again.",
         )
+    since_version = balance_snapshots.since(since)
+    removed = balance_snapshots.removed_since(since_version) if since_version else {}
+    tag = etag(since_version, *((acc.id, acc.name, acc.type.value, acc.provider, snap.digest) for acc, snap in entries))
+    headers = {
+        "ETag": tag,
+        "Cache-Control": "no-cache",
+        "X-Balances-Version": balance_snapshots.token(
+            max([since_version, *(snap.version for _, snap in entries), *removed.values()])
+        ),
+    }
+    if removed:
+        headers["X-Removed-Accounts"] = ",".join(str(a) for a in sorted(removed))
+    if etag_matches(request.headers.get("if-none-match"), tag):
+        return Response(status_code=304, headers=headers)
+    body = [portfolio_entry(acc, snap.result) for acc, snap in entries if snap.version > since_version]
+    return FastJSONResponse(body, headers=headers)
+
+
+@router.get("/summary")
+async def get_portfolio_summary(
+    request: Request,
+    refresh: bool = False,
+    db: AsyncSession = Depends(get_db),
+    profile: Profile = Depends(get_current_profile),
+):
+    """
+    Totals by asset, chain, account type and provider. Served from the running rollup that every balance
+    fetch updates; only accounts not fetched yet are fetched here (all of them with refresh=true).
+    """
+    accounts = await active_accounts(db, profile.id)
+    rollup = portfolio_rollups.get(profile.id)
+    active_ids = {acc.id for acc in accounts}
+    for account_id in [a for a in rollup.contributions if a not in active_ids]:
+        portfolio_rollups.remove_account(account_id)
+    pending = accounts if refresh else [acc for acc in accounts if acc.id not in rollup.contributions]
+    if pending:
+        try:
+            with deadline_after(PORTFOLIO_TIMEOUT):
+                await asyncio.wait_for(collect_portfolio(db, profile.id, pending), timeout=PORTFOLIO_TIMEOUT + PORTFOLIO_GRACE)
+        except asyncio.TimeoutError:
+            raise HTTPException(
+                status_code=504,
+                detail="Portfolio aggregation timed out. Try again.",
+            )
+    body = rollup.to_dict()
+    tag = etag(body)
+    headers = {"ETag": tag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), tag):
+        return Response(status_code=304, headers=headers)
+    return FastJSONResponse(body, headers=headers)
@@ -1,14 +1,17 @@
 """Local profiles: CRUD and import/export via file. No cloud, no email."""
 import json
 from fastapi import APIRouter, Depends, HTTPException, UploadFile
-from fastapi.responses import Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload
+from sqlalchemy import delete, insert, select
 
-from app.db import AsyncSession, get_db
+from app.db import AsyncSession, async_session, get_db
 from app.models import Profile, Account, AccountType, AccountCredential
 from app.security import get_current_profile
+from app.services.balance_snapshots import balance_snapshots
+from app.services.credential_vault import credential_vault
+from app.services.live_balances import live_balances
+from app.services.portfolio_summary import portfolio_rollups
 
 router = APIRouter(prefix="/profiles", tags=["profiles"])
 
@@ -72,12 +75,48 @@ async def delete_profile(profile_id: int, db: AsyncSession = Depends(get_db)):
     profile = await db.get(Profile, profile_id)
     if not profile:
         raise HTTPException(status_code=404, detail="Profile not found")
+    account_ids = (await db.execute(select(Account.id).where(Account.profile_id == profile_id))).scalars().all()
     await db.delete(profile)
+    credential_vault.clear()
+    portfolio_rollups.remove_profile(profile_id)
+    for account_id in account_ids:
+        balance_snapshots.discard(account_id)
+        await live_balances.stop(account_id)
     return {"ok": True}
 
 
-# --- Export: profile + accounts + encrypted credentials as JSON file ---
-EXPORT_VERSION = 1
+# --- Export/import: profile + accounts + encrypted credentials ---
+# v2 is NDJSON: a header line {"version", "profile"} followed by one account object per line, so both sides
+# can stream. v1 (single JSON document with an "accounts" list) is still accepted on import.
+EXPORT_VERSION = 2
+LEGACY_EXPORT_VERSION = 1
+_EXPORT_BATCH_SIZE = 500  # rows fetched per DB round trip and written per response chunk
+_IMPORT_CHUNK_SIZE = 64 * 1024  # bytes read from the upload at a time
+_IMPORT_BATCH_SIZE = 500  # accounts inserted (and committed) per transaction
+
+
+async def _export_lines(profile_id: int, profile_name: str):
+    """Yield the NDJSON export in chunks. Uses its own session: the request's session is closed once streaming starts."""
+    yield json.dumps({"version": EXPORT_VERSION, "profile": {"name": profile_name}}) + "\n"
+    q = (
+        select(Account.name, Account.type, Account.provider, AccountCredential.encrypted_payload)
+        .outerjoin(AccountCredential, AccountCredential.account_id == Account.id)
+        .where(Account.profile_id == profile_id)
+        .order_by(Account.id)
+        .execution_options(yield_per=_EXPORT_BATCH_SIZE)
+    )
+    async with async_session() as session:
+        result = await session.stream(q)
+        async for rows in result.partitions():
+            yield "".join(
+                json.dumps({
+                    "name": name,
+                    "type": atype.value,
+                    "provider": provider,
+                    "encrypted_payload": encrypted_payload or "",
+                }) + "\n"
+                for name, atype, provider, encrypted_payload in rows
+            )
 
 
 @router.get("/{profile_id}/export")
@@ -85,76 +124,145 @@ async def export_profile(
     profile_id: int,
     db: AsyncSession = Depends(get_db),
 ):
-    """Export profile and all its accounts (with encrypted credentials) as JSON. Import on another machine requires the same ENCRYPTION_KEY in .env."""
+    """Export profile and all its accounts (with encrypted credentials) as NDJSON. Import on another machine requires the same ENCRYPTION_KEY in .env."""
     profile = await db.get(Profile, profile_id)
     if not profile:
         raise HTTPException(status_code=404, detail="Profile not found")
-    q = (
-        select(Account)
-        .where(Account.profile_id == profile_id)
-        .options(selectinload(Account.credential))
-    )
-    r = await db.execute(q)
-    accounts = r.scalars().all()
-    account_data = []
-    for acc in accounts:
-        account_data.append({
-            "name": acc.name,
-            "type": acc.type.value,
-            "provider": acc.provider,
-            "encrypted_payload": acc.credential.encrypted_payload if acc.credential else "",
-        })
-    payload = {
-        "version": EXPORT_VERSION,
-        "profile": {"name": profile.name},
-        "accounts": account_data,
-    }
-    return Response(
-        content=json.dumps(payload, indent=2),
-        media_type="application/json",
+    return StreamingResponse(
+        _export_lines(profile.id, profile.name),
+        media_type="application/x-ndjson",
         headers={
-            "Content-Disposition": f'attachment; filename="profile-{profile.name.replace(" ", "-")}.json"'
+            "Content-Disposition": f'attachment; filename="profile-{profile.name.replace(" ", "-")}.ndjson"'
         },
     )
 
 
+async def _upload_lines(file: UploadFile):
+    """Yield the upload line by line, reading it in fixed-size chunks."""
+    buf = b""
+    while chunk := await file.read(_IMPORT_CHUNK_SIZE):
+        buf += chunk
+        *lines, buf = buf.split(b"\n")
+        for line in lines:
+            yield line
+    if buf:
+        yield buf
+
+
+async def _import_records(file: UploadFile):
+    """
+    Yield the header dict, then each account dict. NDJSON (v2) is parsed line by line; anything else is
+    read whole and parsed as a legacy v1 document. Raises HTTPException on malformed input.
+    """
+    lines = _upload_lines(file)
+    first = b""
+    async for line in lines:
+        if line.strip():
+            first = line
+            break
+    try:
+        header = json.loads(first)
+    except json.JSONDecodeError:
+        header = None
+    if isinstance(header, dict) and header.get("version") == EXPORT_VERSION:
+        yield header
+        line_no = 1
+        async for line in lines:
+            line_no += 1
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                raise HTTPException(status_code=400, detail=f"Invalid JSON on line {line_no}: {e}")
+        return
+    parts = [first]
+    async for line in lines:
+        parts.append(line)
+    try:
+        body = json.loads(b"\n".join(parts))
+    except json.JSONDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON: {e}")
+    if not isinstance(body, dict) or body.get("version") != LEGACY_EXPORT_VERSION:
+        raise HTTPException(status_code=400, detail="Unsupported export version")
+    yield body
+    for a in body.get("accounts") or []:
+        yield a
+
+
+def _account_row(a, profile_id: int) -> tuple[dict, str] | None:
+    """Insert values + encrypted payload for one exported account; None when it should be skipped."""
+    if not isinstance(a, dict):
+        return None
+    try:
+        atype = AccountType(a.get("type", "wallet"))
+    except ValueError:
+        return None
+    row = {
+        "profile_id": profile_id,
+        "name": (a.get("name") or "Account").strip() or "Account",
+        "type": atype,
+        "provider": (a.get("provider") or "").strip() or None,
+    }
+    return row, (a.get("encrypted_payload") or "").strip()
+
+
+async def _insert_accounts(db: AsyncSession, batch: list[tuple[dict, str]]) -> None:
+    """Bulk-insert one batch of accounts and their credentials (executemany) and commit it."""
+    result = await db.execute(
+        insert(Account).returning(Account.id, sort_by_parameter_order=True),
+        [row for row, _ in batch],
+    )
+    credentials = [
+        {"account_id": account_id, "encrypted_payload": enc}
+        for account_id, (_, enc) in zip(result.scalars().all(), batch)
+        if enc
+    ]
+    if credentials:
+        await db.execute(insert(AccountCredential), credentials)
+    await db.commit()
+
+
+async def _discard_import(db: AsyncSession, profile_id: int) -> None:
+    """Remove a partially imported profile (earlier batches are already committed)."""
+    await db.rollback()
+    account_ids = select(Account.id).where(Account.profile_id == profile_id)
+    await db.execute(delete(AccountCredential).where(AccountCredential.account_id.in_(account_ids)))
+    await db.execute(delete(Account).where(Account.profile_id == profile_id))
+    await db.execute(delete(Profile).where(Profile.id == profile_id))
+    await db.commit()
+
+
 @router.post("/import", response_model=ProfileResponse)
 async def import_profile(
     file: UploadFile,
     db: AsyncSession = Depends(get_db),
 ):
-    """Import a profile from an exported JSON file. Creates a new profile with the same name and accounts. Requires same ENCRYPTION_KEY as when exported."""
-    if not file.filename or not file.filename.lower().endswith(".json"):
-        raise HTTPException(status_code=400, detail="Upload a .json file")
-    try:
-        body = json.loads(await file.read())
-    except json.JSONDecodeError as e:
-        raise HTTPException(status_code=400, detail=f"Invalid JSON: {e}")
-    if body.get("version") != EXPORT_VERSION:
-        raise HTTPException(status_code=400, detail="Unsupported export version")
-    profile_data = body.get("profile") or {}
+    """Import a profile from an exported .ndjson (or legacy .json) file. Creates a new profile with the same name and accounts. Requires same ENCRYPTION_KEY as when exported."""
+    if not file.filename or not file.filename.lower().endswith((".ndjson", ".json")):
+        raise HTTPException(status_code=400, detail="Upload a .ndjson or .json export file")
+    records = _import_records(file)
+    header = await anext(records, None)
+    if header is None:
+        raise HTTPException(status_code=400, detail="Empty file")
+    profile_data = header.get("profile") or {}
     name = (profile_data.get("name") or "Imported").strip() or "Imported"
-    accounts_data = body.get("accounts") or []
     profile = Profile(name=name)
     db.add(profile)
-    await db.flush()
-    for a in accounts_data:
-        try:
-            atype = AccountType(a.get("type", "wallet"))
-        except ValueError:
-            continue
-        acc = Account(
-            profile_id=profile.id,
-            name=(a.get("name") or "Account").strip() or "Account",
-            type=atype,
-            provider=(a.get("provider") or "").strip() or None,
-        )
-        db.add(acc)
-        await db.flush()
-        enc = (a.get("encrypted_payload") or "").strip()
-        if enc:
-            cred = AccountCredential(account_id=acc.id, encrypted_payload=enc)
-            db.add(cred)
-    await db.flush()
-    await db.refresh(profile)
+    await db.commit()
+    try:
+        batch: list[tuple[dict, str]] = []
+        async for a in records:
+            item = _account_row(a, profile.id)
+            if item is None:
+                continue
+            batch.append(item)
+            if len(batch) >= _IMPORT_BATCH_SIZE:
+                await _insert_accounts(db, batch)
+                batch = []
+        if batch:
+            await _insert_accounts(db, batch)
+    except Exception:
+        await _discard_import(db, profile.id)
+        raise
     return ProfileResponse(id=profile.id, name=profile.name)
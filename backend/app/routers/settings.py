@@ -5,7 +5,7 @@ from sqlalchemy import select
 
 from app.db import AsyncSession, get_db
 from app.models import AppSetting
-from app.security.crypto import encrypt_secret
+from app.security.crypto import encrypt_secret, ensure_keyring_ready
 
 
 router = APIRouter(prefix="/settings", tags=["settings"])
@@ -43,6 +43,7 @@ async def update_api_keys(
 ):
     if body.alchemy_api_key is not None and body.alchemy_api_key.strip():
         key = "alchemy_api_key"
+        await ensure_keyring_ready()
         value = encrypt_secret(body.alchemy_api_key.strip())
         existing = await db.get(AppSetting, key)
         if existing:
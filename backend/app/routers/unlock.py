@@ -2,7 +2,18 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 
-from app.security.crypto import set_app_passphrase, is_unlocked, AppLockedError
+from app.executors import run_crypto
+from app.security.crypto import (
+    set_app_passphrase,
+    clear_app_passphrase,
+    is_unlocked,
+    fernet_for_encryption_key,
+    fernet_for_passphrase,
+    keyring,
+    AppLockedError,
+)
+from app.services.key_rotation import RotationInProgressError, rotation_running, rotation_status, start_rotation
+from app.services.live_balances import live_balances
 
 router = APIRouter(prefix="/unlock", tags=["unlock"])
 
@@ -19,9 +30,64 @@ def unlock_status() -> dict:
 
 @router.post("")
 def unlock(body: UnlockBody) -> dict:
-    """Set the in-memory key from the user's passphrase. Required if ENCRYPTION_KEY is not set."""
+    """
+    Set the in-memory key from the user's passphrase. Required if ENCRYPTION_KEY is not set.
+    Sync route: FastAPI runs it in a worker thread, so the PBKDF2 derivation never blocks the event loop.
+    """
     try:
         set_app_passphrase(body.passphrase)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     return {"ok": True}
+
+
+@router.post("/lock")
+async def lock() -> dict:
+    """Drop all in-memory keys and decrypted state; streams holding credentials are stopped."""
+    clear_app_passphrase()
+    await live_balances.stop_all()
+    return {"ok": True, "unlocked": is_unlocked()}
+
+
+class RotateBody(BaseModel):
+    # Old key: the previous passphrase or ENCRYPTION_KEY. Omit both to rotate away from the current key.
+    old_passphrase: str | None = None
+    old_encryption_key: str | None = None
+    # New passphrase to switch to; omit when the new key is already active (e.g. ENCRYPTION_KEY changed in .env).
+    new_passphrase: str | None = None
+
+
+@router.post("/rotate")
+async def rotate_keys(body: RotateBody) -> dict:
+    """
+    Re-encrypt all stored credentials and settings from the old key to the new one in the background.
+    Calling it again after an interruption (restart, lock) resumes the unfinished job. Poll GET /unlock/rotate.
+    """
+    old_passphrase = (body.old_passphrase or "").strip()
+    old_encryption_key = (body.old_encryption_key or "").strip()
+    new_passphrase = (body.new_passphrase or "").strip()
+    if old_passphrase and old_encryption_key:
+        raise HTTPException(status_code=400, detail="Provide either the old passphrase or the old ENCRYPTION_KEY")
+    if not (old_passphrase or old_encryption_key or new_passphrase):
+        raise HTTPException(status_code=400, detail="Provide the old key or a new passphrase")
+    if rotation_running():
+        raise HTTPException(status_code=409, detail="A key rotation is already running")
+    # PBKDF2 derivations run in the crypto pool.
+    if old_passphrase:
+        old = await run_crypto(fernet_for_passphrase, old_passphrase)
+    elif old_encryption_key:
+        old = await run_crypto(fernet_for_encryption_key, old_encryption_key)
+    else:
+        await keyring.ready()
+        old = keyring.primary()
+    new = await run_crypto(fernet_for_passphrase, new_passphrase) if new_passphrase else None
+    try:
+        return await start_rotation(old, new)
+    except RotationInProgressError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.get("/rotate")
+async def rotate_status() -> dict:
+    """Progress of the latest key rotation job."""
+    return await rotation_status()
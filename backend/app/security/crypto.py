@@ -1,16 +1,20 @@
 """Encrypt/decrypt API keys and wallet addresses at rest. Never log plaintext."""
 import base64
-from cryptography.fernet import Fernet, InvalidToken
+import hashlib
+import threading
+from typing import Callable
+
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 
 from app.config import get_settings
-
-# In-memory key set by app passphrase (unlock). Never persisted.
-_unlock_key: bytes | None = None
+from app.executors import run_crypto
 
 # Fixed salt for deriving Fernet key from app passphrase (same passphrase -> same key).
 APP_PASSPHRASE_SALT = b"mantracker_app_passphrase_v1"
+ENCRYPTION_KEY_SALT = b"mantracker_portfolio"
+SECRET_KEY_SALT = b"mantracker_fernet_salt"
 
 
 class AppLockedError(Exception):
@@ -31,23 +35,149 @@ def _derive_key(password: str, salt: bytes) -> bytes:
     return base64.urlsafe_b64encode(kdf.derive(password.encode()))
 
 
+def _fernet_from_encryption_key(encryption_key: str) -> Fernet:
+    key = encryption_key.encode()
+    if len(key) != 44:  # Fernet key is 44 bytes base64; anything else is treated as a password
+        key = _derive_key(encryption_key, ENCRYPTION_KEY_SALT)
+    return Fernet(key)
+
+
+def fernet_for_passphrase(passphrase: str) -> Fernet:
+    """Key an app passphrase derives to (CPU-heavy; call from a worker thread)."""
+    return Fernet(_derive_key(passphrase.strip(), APP_PASSPHRASE_SALT))
+
+
+def fernet_for_encryption_key(encryption_key: str) -> Fernet:
+    """Key an ENCRYPTION_KEY value derives to (CPU-heavy unless it is already a Fernet key)."""
+    return _fernet_from_encryption_key(encryption_key.strip())
+
+
+class FernetKeyring:
+    """
+    Ready-to-use Fernet keys. Each key source (passphrase, ENCRYPTION_KEY, SECRET_KEY) is derived once with
+    PBKDF2 and then reused, so decrypts cost only the AES/HMAC work. Retired keys stay accepted for
+    decryption while a rotation is in progress (MultiFernet). Everything is dropped on lock.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        # In-memory key set by app passphrase (unlock). Never persisted.
+        self._unlock: Fernet | None = None
+        # (source fingerprint, fernet) for the key derived from settings
+        self._settings_key: tuple[str, Fernet] | None = None
+        self._retired: list[Fernet] = []
+        self._lock_listeners: list[Callable[[], None]] = []
+
+    @property
+    def has_unlock_key(self) -> bool:
+        return self._unlock is not None
+
+    def unlock(self, passphrase: str) -> None:
+        """Derive and hold the key for the app passphrase (CPU-heavy; call from a worker thread)."""
+        fernet = fernet_for_passphrase(passphrase)
+        with self._lock:
+            self._unlock = fernet
+
+    def set_unlock_fernet(self, fernet: Fernet) -> None:
+        """Install an already-derived key as the unlock key (used after rotating to a new passphrase)."""
+        with self._lock:
+            self._unlock = fernet
+
+    def retire(self, fernet: Fernet) -> None:
+        """Keep accepting an old key for decryption (during key rotation)."""
+        with self._lock:
+            self._retired.append(fernet)
+
+    def clear_retired(self) -> None:
+        with self._lock:
+            self._retired = []
+
+    def add_lock_listener(self, callback: Callable[[], None]) -> None:
+        """Call back on lock so holders of decrypted data (caches) can drop it."""
+        self._lock_listeners.append(callback)
+
+    def clear(self) -> None:
+        """Drop all derived keys (lock or shutdown)."""
+        with self._lock:
+            self._unlock = None
+            self._settings_key = None
+            self._retired = []
+        for callback in self._lock_listeners:
+            callback()
+
+    def _settings_source(self, require_passphrase: bool) -> tuple[str, Callable[[], Fernet]]:
+        """Fingerprint + factory for the settings-derived key. Raises AppLockedError when none is allowed."""
+        settings = get_settings()
+        if settings.encryption_key and settings.encryption_key.strip():
+            material = settings.encryption_key
+            fingerprint = "encryption_key:" + hashlib.sha256(material.encode()).hexdigest()
+            return fingerprint, lambda: _fernet_from_encryption_key(material)
+        if require_passphrase and getattr(settings, "require_app_passphrase", False):
+            raise AppLockedError("App locked. Enter passphrase to unlock.")
+        if settings.secret_key:
+            # Fallback: derive from secret_key (backward compat)
+            material = settings.secret_key
+            fingerprint = "secret_key:" + hashlib.sha256(material.encode()).hexdigest()
+            return fingerprint, lambda: Fernet(_derive_key(material, SECRET_KEY_SALT))
+        raise AppLockedError("App locked. Enter passphrase to unlock.")
+
+    def primary(self, require_passphrase: bool = True) -> Fernet:
+        """Key used for encryption. Prefers unlock key, then ENCRYPTION_KEY, then SECRET_KEY."""
+        unlock = self._unlock
+        if unlock is not None:
+            return unlock
+        fingerprint, factory = self._settings_source(require_passphrase)
+        cached = self._settings_key
+        if cached is not None and cached[0] == fingerprint:
+            return cached[1]
+        fernet = factory()
+        with self._lock:
+            self._settings_key = (fingerprint, fernet)
+        return fernet
+
+    def fernet(self, require_passphrase: bool = True) -> Fernet | MultiFernet:
+        """Primary key, plus retired keys for decryption while a rotation is in progress."""
+        primary = self.primary(require_passphrase)
+        retired = self._retired
+        if retired:
+            return MultiFernet([primary, *retired])
+        return primary
+
+    def is_ready(self) -> bool:
+        """True when the primary key is available without running key derivation."""
+        if self._unlock is not None:
+            return True
+        try:
+            fingerprint, _ = self._settings_source(require_passphrase=True)
+        except AppLockedError:
+            return False
+        cached = self._settings_key
+        return cached is not None and cached[0] == fingerprint
+
+    async def ready(self) -> None:
+        """Make sure the primary key is derived, running PBKDF2 in the crypto pool so the loop never blocks."""
+        if not self.is_ready():
+            await run_crypto(self.primary)
+
+
+keyring = FernetKeyring()
+
+
 def set_app_passphrase(passphrase: str) -> None:
-    """Set the in-memory encryption key from the user's app passphrase. Call on unlock."""
-    global _unlock_key
+    """Set the in-memory encryption key from the user's app passphrase. Call on unlock (from a worker thread)."""
     if not passphrase or not passphrase.strip():
         raise ValueError("Passphrase cannot be empty")
-    _unlock_key = _derive_key(passphrase.strip(), APP_PASSPHRASE_SALT)
+    keyring.unlock(passphrase.strip())
 
 
 def clear_app_passphrase() -> None:
-    """Clear the in-memory key (e.g. on lock or shutdown)."""
-    global _unlock_key
-    _unlock_key = None
+    """Clear the in-memory keys (e.g. on lock or shutdown)."""
+    keyring.clear()
 
 
 def is_unlocked() -> bool:
     """True if we can decrypt credentials (unlock key, ENCRYPTION_KEY, or secret_key when not requiring passphrase)."""
-    if _unlock_key is not None:
+    if keyring.has_unlock_key:
         return True
     settings = get_settings()
     if settings.encryption_key and settings.encryption_key.strip():
@@ -59,53 +189,19 @@ def is_unlocked() -> bool:
     return False
 
 
-def ensure_fernet() -> Fernet:
+async def ensure_keyring_ready() -> None:
+    """Derive the active key off the event loop if needed. Raises AppLockedError when locked."""
+    await keyring.ready()
+
+
+def ensure_fernet() -> Fernet | MultiFernet:
     """Return a Fernet instance. Prefers in-memory unlock key, then ENCRYPTION_KEY, then SECRET_KEY."""
-    global _unlock_key
-    if _unlock_key is not None:
-        return Fernet(_unlock_key)
-    settings = get_settings()
-    if settings.encryption_key:
-        key = settings.encryption_key.encode()
-        if len(key) != 44:  # Fernet key is 44 bytes base64
-            key = base64.urlsafe_b64encode(
-                PBKDF2HMAC(
-                    algorithm=hashes.SHA256(),
-                    length=32,
-                    salt=b"mantracker_portfolio",
-                    iterations=480000,
-                ).derive(settings.encryption_key.encode())
-            )
-        return Fernet(key)
-    # Fallback: derive from secret_key (backward compat)
-    salt = b"mantracker_fernet_salt"
-    derived = _derive_key(settings.secret_key, salt)
-    return Fernet(derived)
-
-
-def ensure_fernet_or_raise() -> Fernet:
+    return keyring.fernet(require_passphrase=False)
+
+
+def ensure_fernet_or_raise() -> Fernet | MultiFernet:
     """Return Fernet for encrypt/decrypt. Raises AppLockedError when require_app_passphrase and not unlocked."""
-    if _unlock_key is not None:
-        return Fernet(_unlock_key)
-    settings = get_settings()
-    if settings.encryption_key and settings.encryption_key.strip():
-        key = settings.encryption_key.encode()
-        if len(key) != 44:
-            key = base64.urlsafe_b64encode(
-                PBKDF2HMAC(
-                    algorithm=hashes.SHA256(),
-                    length=32,
-                    salt=b"mantracker_portfolio",
-                    iterations=480000,
-                ).derive(settings.encryption_key.encode())
-            )
-        return Fernet(key)
-    if getattr(settings, "require_app_passphrase", False):
-        raise AppLockedError("App locked. Enter passphrase to unlock.")
-    if settings.secret_key:
-        salt = b"mantracker_fernet_salt"
-        return Fernet(_derive_key(settings.secret_key, salt))
-    raise AppLockedError("App locked. Enter passphrase to unlock.")
+    return keyring.fernet(require_passphrase=True)
 
 
 def encrypt_secret(plaintext: str) -> str:
@@ -126,5 +222,6 @@ def decrypt_secret(ciphertext: str) -> str:
     except InvalidToken:
         raise CredentialDecryptError(
             "Cannot decrypt stored credentials (wrong key or corrupted). "
-            "If you changed your passphrase or ENCRYPTION_KEY, re-add the account credentials."
+            "If you changed your passphrase or ENCRYPTION_KEY, rotate keys with the old one (POST /unlock/rotate) "
+            "or re-add the account credentials."
         )
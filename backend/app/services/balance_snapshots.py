@@ -0,0 +1,101 @@
+"""
+Latest balance snapshot per account, with a content digest (strong ETag) and a change version. Versions come
+from one process-wide counter that only advances when an account's balances actually change, so a client
+holding a since-version token can be sent just the accounts that changed after it. Removing an account
+advances the counter too and leaves a tombstone, so deltas can also tell the client which accounts went away.
+"""
+import hashlib
+import os
+from dataclasses import dataclass
+
+from app.adapters.base import AdapterResult
+
+# Tokens from another process (e.g. before a restart) don't refer to this counter; they mean "send everything".
+_EPOCH = os.urandom(4).hex()
+
+
+@dataclass
+class BalanceSnapshot:
+    account_id: int
+    version: int
+    digest: str
+    result: AdapterResult
+
+
+def result_digest(result: AdapterResult) -> str:
+    """Digest of everything a balance response is built from (balances in order, plus the error)."""
+    h = hashlib.blake2b(digest_size=16)
+    for b in result.balances:
+        h.update(repr((b.asset, b.amount, b.currency, b.usd_value, b.chain, b.raw_name)).encode())
+    h.update(repr(result.error).encode())
+    return h.hexdigest()
+
+
+class BalanceSnapshotStore:
+    def __init__(self) -> None:
+        self._snapshots: dict[int, BalanceSnapshot] = {}
+        self._removed: dict[int, int] = {}  # account_id -> version at which its snapshot was discarded
+        self._clock = 0
+
+    @property
+    def version(self) -> int:
+        return self._clock
+
+    def record(self, account_id: int, result: AdapterResult) -> BalanceSnapshot:
+        """Store a fetched result; the account's version only moves when the content changed."""
+        digest = result_digest(result)
+        current = self._snapshots.get(account_id)
+        if current is not None and current.digest == digest:
+            current.result = result
+            return current
+        self._clock += 1
+        snapshot = BalanceSnapshot(account_id=account_id, version=self._clock, digest=digest, result=result)
+        self._snapshots[account_id] = snapshot
+        return snapshot
+
+    def get(self, account_id: int) -> BalanceSnapshot | None:
+        return self._snapshots.get(account_id)
+
+    def discard(self, account_id: int) -> None:
+        """Drop an account's snapshot (account deleted), leaving a tombstone for removed_since()."""
+        if self._snapshots.pop(account_id, None) is not None:
+            self._clock += 1
+            self._removed[account_id] = self._clock
+
+    def removed_since(self, version: int) -> dict[int, int]:
+        """Accounts discarded after `version` -> version of the removal."""
+        return {a: v for a, v in self._removed.items() if v > version}
+
+    def token(self, version: int | None = None) -> str:
+        """Since-version token for `version` (default: the current state)."""
+        return f"{_EPOCH}-{self._clock if version is None else version}"
+
+    def since(self, token: str | None) -> int:
+        """Version a client token refers to; 0 (everything) when missing, malformed or from another process."""
+        epoch, _, version = (token or "").partition("-")
+        if epoch != _EPOCH or not version.isdigit():
+            return 0
+        return int(version)
+
+
+balance_snapshots = BalanceSnapshotStore()
+
+
+def etag(*parts: object) -> str:
+    """Strong ETag over already-computed digests and identifying fields (the body is never serialized for it)."""
+    h = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        h.update(repr(part).encode())
+        h.update(b"\0")
+    return f'"{h.hexdigest()}"'
+
+
+def etag_matches(if_none_match: str | None, current: str) -> bool:
+    """If-None-Match comparison (weak comparison, as RFC 9110 specifies for this header)."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == current:
+            return True
+    return False
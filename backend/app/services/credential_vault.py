@@ -0,0 +1,113 @@
+"""
+Short-lived in-memory cache of decrypted credential payloads. A profile's credentials are decrypted in one
+batch off the event loop; entries are keyed by account id and only valid for the ciphertext version they
+came from. Cleared on lock; invalidated on account mutation. Plaintext is never persisted or logged.
+"""
+import hashlib
+import json
+import time
+
+from sqlalchemy import select
+
+from app.config import get_settings
+from app.db import AsyncSession
+from app.executors import run_crypto
+from app.metrics import cache_hit, cache_miss
+from app.models import Account, AccountCredential
+from app.security.crypto import AppLockedError, decrypt_secret, ensure_keyring_ready, is_unlocked, keyring
+
+
+def payload_version(encrypted_payload: str) -> str:
+    """Version token for a stored ciphertext; any re-encryption or credential change yields a new one."""
+    return hashlib.blake2b((encrypted_payload or "").encode(), digest_size=16).hexdigest()
+
+
+def _decrypt_batch(items: list[tuple[int, str]]) -> dict[int, dict | Exception]:
+    """Decrypt + JSON-parse many payloads (runs in the crypto pool). Errors are returned per account."""
+    out: dict[int, dict | Exception] = {}
+    for account_id, encrypted in items:
+        try:
+            out[account_id] = json.loads(decrypt_secret(encrypted)) if encrypted else {}
+        except Exception as e:
+            out[account_id] = e
+    return out
+
+
+class CredentialVault:
+    def __init__(self) -> None:
+        # account_id -> (payload version, decrypted payload, expires_at monotonic)
+        self._entries: dict[int, tuple[str, dict, float]] = {}
+        self._generation = 0  # bumped by clear(), so a batch that was decrypting meanwhile is not cached
+
+    def get(self, account_id: int, version: str) -> dict | None:
+        entry = self._entries.get(account_id)
+        if entry is None:
+            return None
+        if entry[0] != version or entry[2] <= time.monotonic():
+            self._entries.pop(account_id, None)
+            return None
+        return entry[1]
+
+    async def load_many(self, credentials: list[AccountCredential]) -> dict[int, dict | Exception]:
+        """Payloads for these credentials; cache misses are decrypted together in one crypto-pool batch."""
+        out: dict[int, dict | Exception] = {}
+        misses: list[tuple[int, str, str]] = []
+        for cred in credentials:
+            version = payload_version(cred.encrypted_payload)
+            cached = self.get(cred.account_id, version)
+            if cached is not None:
+                out[cred.account_id] = cached
+            else:
+                misses.append((cred.account_id, cred.encrypted_payload, version))
+        cache_hit("credential", len(out))
+        cache_miss("credential", len(misses))
+        if not misses:
+            return out
+        await ensure_keyring_ready()
+        generation = self._generation
+        decrypted = await run_crypto(_decrypt_batch, [(a, enc) for a, enc, _ in misses])
+        if generation != self._generation:
+            # Cleared (locked, profile deleted) while decrypting: don't repopulate, and don't hand out
+            # plaintext once the app is locked.
+            locked = not is_unlocked()
+            for account_id, _, _ in misses:
+                out[account_id] = AppLockedError("App locked. Enter passphrase to unlock.") if locked else decrypted[account_id]
+            return out
+        expires_at = time.monotonic() + get_settings().credential_cache_ttl
+        for account_id, _, version in misses:
+            result = decrypted[account_id]
+            if not isinstance(result, Exception):
+                self._entries[account_id] = (version, result, expires_at)
+            out[account_id] = result
+        return out
+
+    async def get_payload(self, credential: AccountCredential) -> dict:
+        """Decrypted payload for one credential. Raises AppLockedError / CredentialDecryptError like decrypt_secret."""
+        result = (await self.load_many([credential]))[credential.account_id]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    async def warm_profile(self, db: AsyncSession, profile_id: int) -> None:
+        """Decrypt every active credential of a profile in one batch (first balance fetch after unlock/expiry)."""
+        q = (
+            select(AccountCredential)
+            .join(Account, Account.id == AccountCredential.account_id)
+            .where(Account.profile_id == profile_id, Account.is_active == True)
+        )
+        r = await db.execute(q)
+        await self.load_many(list(r.scalars().all()))
+
+    def is_cached(self, credential: AccountCredential) -> bool:
+        return self.get(credential.account_id, payload_version(credential.encrypted_payload)) is not None
+
+    def invalidate(self, account_id: int) -> None:
+        self._entries.pop(account_id, None)
+
+    def clear(self) -> None:
+        self._generation += 1
+        self._entries.clear()
+
+
+credential_vault = CredentialVault()
+keyring.add_lock_listener(credential_vault.clear)
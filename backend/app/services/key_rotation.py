@@ -0,0 +1,232 @@
+"""
+Key rotation: re-encrypt every stored AccountCredential and AppSetting from an old key to the current one.
+Rows are walked in keyset-paginated batches; the Fernet work for a batch is spread over the crypto pool and the
+batch commits together with its checkpoint, so an interrupted job resumes where it stopped. Rows no key could
+decrypt are recorded and retried on resume. While the job runs the old key stays retired in the keyring, so
+reads keep working for both old and new ciphertexts.
+"""
+import asyncio
+from datetime import datetime
+
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
+from sqlalchemy import func, select, update
+
+from app.config import get_settings
+from app.db import async_session
+from app.executors import run_crypto
+from app.models import AccountCredential, AppSetting, KeyRotation
+from app.security.crypto import keyring
+
+ROTATION_BATCH_SIZE = 1000  # rows re-encrypted and committed per transaction
+
+_rotation_task: asyncio.Task | None = None
+
+
+class RotationInProgressError(Exception):
+    """Raised when a rotation is started while another one is running."""
+
+
+def _rotate_chunk(fernet: MultiFernet, tokens: list[str]) -> list[str | None]:
+    """Re-encrypt tokens with the primary key (runs in the crypto pool). None for tokens no key can decrypt."""
+    out: list[str | None] = []
+    for token in tokens:
+        if not token:
+            out.append(token)
+            continue
+        try:
+            out.append(fernet.rotate(token.encode()).decode())
+        except InvalidToken:
+            out.append(None)
+    return out
+
+
+async def _rotate_tokens(fernet: MultiFernet, tokens: list[str]) -> list[str | None]:
+    """One chunk per crypto-pool worker (Fernet releases the GIL in OpenSSL)."""
+    size = max(1, -(-len(tokens) // max(1, get_settings().executor_crypto_threads)))
+    parts = await asyncio.gather(*(run_crypto(_rotate_chunk, fernet, tokens[i : i + size]) for i in range(0, len(tokens), size)))
+    return [token for part in parts for token in part]
+
+
+def _job_dict(job: KeyRotation | None) -> dict:
+    if job is None:
+        return {"status": "none", "active": False}
+    processed = job.rotated + job.failed
+    return {
+        "id": job.id,
+        "status": job.status,
+        "active": rotation_running(),
+        "total": job.total,
+        "rotated": job.rotated,
+        "failed": job.failed,
+        "progress": round(processed / job.total, 4) if job.total else 1.0,
+        "error": job.error,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+def rotation_running() -> bool:
+    return _rotation_task is not None and not _rotation_task.done()
+
+
+async def rotation_status() -> dict:
+    """Latest rotation job with its progress."""
+    async with async_session() as db:
+        r = await db.execute(select(KeyRotation).order_by(KeyRotation.id.desc()).limit(1))
+        return _job_dict(r.scalar_one_or_none())
+
+
+async def _set_status(job_id: int, status: str, error: str | None = None) -> None:
+    async with async_session() as db:
+        job = await db.get(KeyRotation, job_id)
+        if job is not None:
+            job.status = status
+            job.error = error
+            if status in ("completed", "failed"):
+                job.finished_at = datetime.utcnow()
+            await db.commit()
+
+
+async def _retry_failed(db, job: KeyRotation, fernet: MultiFernet) -> None:
+    """Retry rows an earlier attempt of this job could not decrypt (e.g. the wrong old key was given)."""
+    credential_ids = list(job.failed_credential_ids or [])
+    if credential_ids:
+        q = select(AccountCredential.id, AccountCredential.encrypted_payload).where(AccountCredential.id.in_(credential_ids))
+        rows = (await db.execute(q)).all()
+        rotated = await _rotate_tokens(fernet, [enc for _, enc in rows])
+        updates = [{"id": row_id, "encrypted_payload": new} for (row_id, _), new in zip(rows, rotated) if new]
+        if updates:
+            await db.execute(update(AccountCredential), updates)
+        # Rows deleted since then no longer count as failed.
+        job.failed_credential_ids = [row_id for (row_id, _), new in zip(rows, rotated) if new is None]
+        job.rotated += len(updates)
+    setting_keys = list(job.failed_setting_keys or [])
+    if setting_keys:
+        q = select(AppSetting.key, AppSetting.encrypted_value).where(AppSetting.key.in_(setting_keys))
+        rows = (await db.execute(q)).all()
+        rotated = await _rotate_tokens(fernet, [enc for _, enc in rows])
+        updates = [{"key": key, "encrypted_value": new} for (key, _), new in zip(rows, rotated) if new]
+        if updates:
+            await db.execute(update(AppSetting), updates)
+        job.failed_setting_keys = [key for (key, _), new in zip(rows, rotated) if new is None]
+        job.rotated += len(updates)
+    if credential_ids or setting_keys:
+        job.failed = len(job.failed_credential_ids or []) + len(job.failed_setting_keys or [])
+        await db.commit()
+
+
+async def _run_rotation(job_id: int, fernet: MultiFernet) -> None:
+    try:
+        async with async_session() as db:
+            job = await db.get(KeyRotation, job_id)
+            await _retry_failed(db, job, fernet)
+            while True:
+                q = (
+                    select(AccountCredential.id, AccountCredential.encrypted_payload)
+                    .where(AccountCredential.id > job.last_credential_id)
+                    .order_by(AccountCredential.id)
+                    .limit(ROTATION_BATCH_SIZE)
+                )
+                rows = (await db.execute(q)).all()
+                if not rows:
+                    break
+                rotated = await _rotate_tokens(fernet, [enc for _, enc in rows])
+                updates = [{"id": row_id, "encrypted_payload": new} for (row_id, _), new in zip(rows, rotated) if new]
+                if updates:
+                    await db.execute(update(AccountCredential), updates)
+                failed = [row_id for (row_id, _), new in zip(rows, rotated) if new is None]
+                if failed:
+                    job.failed_credential_ids = list(job.failed_credential_ids or []) + failed
+                job.rotated += sum(1 for new in rotated if new is not None)
+                job.failed += len(failed)
+                job.last_credential_id = rows[-1][0]
+                await db.commit()
+            while True:
+                q = (
+                    select(AppSetting.key, AppSetting.encrypted_value)
+                    .where(AppSetting.key > job.last_setting_key)
+                    .order_by(AppSetting.key)
+                    .limit(ROTATION_BATCH_SIZE)
+                )
+                rows = (await db.execute(q)).all()
+                if not rows:
+                    break
+                rotated = await _rotate_tokens(fernet, [enc for _, enc in rows])
+                updates = [{"key": key, "encrypted_value": new} for (key, _), new in zip(rows, rotated) if new]
+                if updates:
+                    await db.execute(update(AppSetting), updates)
+                failed = [key for (key, _), new in zip(rows, rotated) if new is None]
+                if failed:
+                    job.failed_setting_keys = list(job.failed_setting_keys or []) + failed
+                job.rotated += sum(1 for new in rotated if new is not None)
+                job.failed += len(failed)
+                job.last_setting_key = rows[-1][0]
+                await db.commit()
+        await _set_status(job_id, "completed")
+        keyring.clear_retired()
+    except asyncio.CancelledError:
+        await _set_status(job_id, "interrupted")
+        raise
+    except Exception as e:
+        # Keep the old key retired: rows not yet rotated must stay readable until the job is resumed.
+        await _set_status(job_id, "failed", str(e))
+
+
+async def start_rotation(old: Fernet, new: Fernet | None = None) -> dict:
+    """
+    Re-encrypt everything from `old` to `new` (installed as the unlock key once the job is recorded), or to the
+    keyring's current primary key, in the background. Resumes the last unfinished job (interrupted, failed or
+    cut off by a restart) from its checkpoint. Raises AppLockedError when no primary key is available.
+    """
+    global _rotation_task
+    if rotation_running():
+        raise RotationInProgressError("A key rotation is already running")
+    if new is None:
+        await keyring.ready()
+    fernet = MultiFernet([new or keyring.primary(), old])
+    async with async_session() as db:
+        r = await db.execute(
+            select(KeyRotation)
+            .where(KeyRotation.status.in_(("running", "interrupted", "failed")))
+            .order_by(KeyRotation.id.desc())
+            .limit(1)
+        )
+        job = r.scalar_one_or_none()
+        if job is None:
+            credentials = (await db.execute(select(func.count()).select_from(AccountCredential))).scalar_one()
+            settings = (await db.execute(select(func.count()).select_from(AppSetting))).scalar_one()
+            job = KeyRotation(total=credentials + settings)
+            db.add(job)
+        job.status = "running"
+        job.error = None
+        await db.commit()
+        job_id = job.id
+    if rotation_running():
+        raise RotationInProgressError("A key rotation is already running")
+    # Keys are switched only now: if anything above failed, the current key is still in place.
+    if new is not None:
+        keyring.set_unlock_fernet(new)
+    keyring.retire(old)
+    _rotation_task = asyncio.create_task(_run_rotation(job_id, fernet))
+    return await rotation_status()
+
+
+async def stop_rotation() -> None:
+    """Cancel a running job (shutdown); it is marked interrupted and can be resumed later."""
+    global _rotation_task
+    task, _rotation_task = _rotation_task, None
+    if task is not None and not task.done():
+        task.cancel()
+        try:
+            await task
+        except (asyncio.CancelledError, Exception):
+            pass
+
+
+def _cancel_on_lock() -> None:
+    # The job holds both keys; locking the app must not leave it running.
+    if _rotation_task is not None and not _rotation_task.done():
+        _rotation_task.cancel()
+
+
+keyring.add_lock_listener(_cancel_on_lock)
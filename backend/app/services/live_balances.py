@@ -0,0 +1,250 @@
+"""
+Push-based live balances (optional, LIVE_BALANCES_ENABLED). Long-lived websocket subscriptions keep an
+in-memory balance state per account: Hyperliquid webData2 for HyperCore wallets, ccxt.pro watch_balance for
+exchanges that support it. While a stream is connected, balance reads are served from that state with no
+upstream calls. Credentials live only inside the running stream task, never in the state.
+"""
+import asyncio
+import json
+import time
+from dataclasses import dataclass
+
+from app.adapters.base import AdapterResult
+from app.config import get_settings
+from app.models import Account, AccountType
+
+_RECONNECT_BACKOFF_MAX = 60.0  # seconds
+# Exchange prices are re-resolved at most this often; balance pushes in between reuse them.
+_EXCHANGE_PRICE_REFRESH = 60.0
+# HyperCore sub-account states are not in webData2; they are re-fetched over REST at most this often.
+_SUB_ACCOUNT_REFRESH = 30.0
+
+
+# exchange id -> whether ccxt.pro supports watchBalance (checked once per exchange)
+_ccxt_watch_support: dict[str, bool] = {}
+
+
+def live_balances_enabled() -> bool:
+    return bool(get_settings().live_balances_enabled)
+
+
+def stream_kind(account: Account) -> str | None:
+    """Which stream can serve this account, or None when it must be polled."""
+    provider = (account.provider or "").lower()
+    if account.type == AccountType.WALLET and provider == "hypercore":
+        return "hyperliquid"
+    if account.type == AccountType.EXCHANGE:
+        exchange_id = provider or "binance"
+        if exchange_id not in _ccxt_watch_support:
+            try:
+                import ccxt.pro as ccxtpro  # type: ignore[import]
+
+                exchange_class = getattr(ccxtpro, exchange_id, None) if exchange_id in ccxtpro.exchanges else None
+                _ccxt_watch_support[exchange_id] = bool(exchange_class and exchange_class().has.get("watchBalance"))
+            except Exception:
+                _ccxt_watch_support[exchange_id] = False
+        if _ccxt_watch_support[exchange_id]:
+            return "ccxt"
+    return None
+
+
+@dataclass
+class _Stream:
+    account_id: int
+    kind: str
+    task: asyncio.Task | None = None
+    result: AdapterResult | None = None
+    connected: bool = False
+    updated_at: float | None = None  # wall clock of last applied update
+    updates: int = 0
+
+    def apply(self, result: AdapterResult) -> None:
+        self.result = result
+        self.updated_at = time.time()
+        self.updates += 1
+
+
+class LiveBalances:
+    """Registry of running streams and their latest balance state, keyed by account id."""
+
+    def __init__(self) -> None:
+        self._streams: dict[int, _Stream] = {}
+
+    def current(self, account_id: int) -> AdapterResult | None:
+        """Latest streamed balances, only while the stream is connected and has delivered a snapshot."""
+        stream = self._streams.get(account_id)
+        if stream is None or not stream.connected or stream.result is None:
+            return None
+        return stream.result
+
+    def seed(self, account_id: int, result: AdapterResult) -> None:
+        """Use a polled result as the initial state for a connected stream that hasn't pushed yet."""
+        stream = self._streams.get(account_id)
+        if stream is not None and stream.connected and stream.result is None and not result.error:
+            stream.apply(result)
+
+    def ensure(self, account: Account, payload: dict) -> None:
+        """Start a stream for this account if it supports one and none is running. Non-blocking."""
+        existing = self._streams.get(account.id)
+        if existing is not None and existing.task is not None and not existing.task.done():
+            return
+        kind = stream_kind(account)
+        if kind is None:
+            return
+        stream = _Stream(account_id=account.id, kind=kind)
+        if kind == "hyperliquid":
+            address = (payload.get("address") or "").strip()
+            if not address:
+                return
+            stream.task = asyncio.create_task(_run_hyperliquid(stream, address))
+        else:
+            stream.task = asyncio.create_task(_run_ccxt(stream, account.provider or "binance", payload))
+        self._streams[account.id] = stream
+
+    async def stop(self, account_id: int) -> None:
+        stream = self._streams.pop(account_id, None)
+        if stream is not None and stream.task is not None:
+            stream.task.cancel()
+            try:
+                await stream.task
+            except (asyncio.CancelledError, Exception):
+                pass
+
+    async def stop_all(self) -> None:
+        for account_id in list(self._streams):
+            await self.stop(account_id)
+
+    def status(self) -> list[dict]:
+        return [
+            {
+                "account_id": s.account_id,
+                "kind": s.kind,
+                "connected": s.connected,
+                "updated_at": s.updated_at,
+                "updates": s.updates,
+            }
+            for s in self._streams.values()
+        ]
+
+
+live_balances = LiveBalances()
+
+
+async def _reconnect_delay(backoff: float) -> float:
+    await asyncio.sleep(backoff)
+    return min(backoff * 2, _RECONNECT_BACKOFF_MAX)
+
+
+async def _run_hyperliquid(stream: _Stream, address: str) -> None:
+    """webData2 (account state) + allMids (prices) subscriptions; each webData2 push replaces the state."""
+    import websockets
+
+    from app.adapters.http import upstream_client
+    from app.adapters.wallet_adapter import (
+        _fetch_hyperliquid_mids,
+        _fetch_hyperliquid_spot_pairs,
+        _hyperliquid_info,
+        hypercore_result_from_states,
+    )
+
+    url = get_settings().hyperliquid_ws_url
+    backoff = 1.0
+    while True:
+        try:
+            # webData2 covers the main account only. Pair metadata is seeded over REST per connect; sub-accounts
+            # are seeded too and refreshed every _SUB_ACCOUNT_REFRESH while pushes arrive.
+            async with upstream_client() as client:
+                sub_accounts, spot_pairs, mids = await asyncio.gather(
+                    _hyperliquid_info(client, {"type": "subAccounts", "user": address}),
+                    _fetch_hyperliquid_spot_pairs(client),
+                    _fetch_hyperliquid_mids(client),
+                    return_exceptions=True,
+                )
+            sub_accounts = None if isinstance(sub_accounts, BaseException) else sub_accounts
+            sub_accounts_at = asyncio.get_running_loop().time()
+            spot_pairs = {} if isinstance(spot_pairs, BaseException) else spot_pairs
+            mids = {} if isinstance(mids, BaseException) else dict(mids)
+
+            async with websockets.connect(url, ping_interval=20, max_size=2**24) as ws:
+                await ws.send(json.dumps({"method": "subscribe", "subscription": {"type": "webData2", "user": address}}))
+                await ws.send(json.dumps({"method": "subscribe", "subscription": {"type": "allMids"}}))
+                async for raw in ws:
+                    msg = json.loads(raw)
+                    channel = msg.get("channel")
+                    data = msg.get("data") or {}
+                    if channel == "allMids":
+                        for coin, px in (data.get("mids") or {}).items():
+                            try:
+                                mids[coin] = float(px)
+                            except (TypeError, ValueError):
+                                continue
+                    elif channel == "webData2":
+                        now = asyncio.get_running_loop().time()
+                        if now - sub_accounts_at > _SUB_ACCOUNT_REFRESH:
+                            sub_accounts_at = now
+                            try:
+                                async with upstream_client() as client:
+                                    sub_accounts = await _hyperliquid_info(client, {"type": "subAccounts", "user": address})
+                            except Exception:
+                                sub_accounts = None  # unknown now; don't serve the old states as current
+                        stream.apply(
+                            hypercore_result_from_states(
+                                data.get("clearinghouseState"),
+                                data.get("spotState"),
+                                sub_accounts,
+                                mids,
+                                spot_pairs,
+                            )
+                        )
+                        stream.connected = True
+                        backoff = 1.0
+        except asyncio.CancelledError:
+            stream.connected = False
+            raise
+        except Exception:
+            pass
+        stream.connected = False
+        backoff = await _reconnect_delay(backoff)
+
+
+async def _run_ccxt(stream: _Stream, exchange_id: str, payload: dict) -> None:
+    """ccxt.pro watch_balance loop. CCXT merges websocket deltas into its balance; each push replaces the state."""
+    import ccxt.pro as ccxtpro  # type: ignore[import]
+
+    from app.adapters.exchange_adapter import (
+        _balances_from_ccxt,
+        _exchange_config,
+        _resolve_usd_prices,
+        _with_usd_values,
+    )
+
+    config = _exchange_config(payload)
+    if config is None:
+        return
+    exchange = getattr(ccxtpro, exchange_id.lower())(config)
+    prices: dict[str, float] = {}
+    priced_assets: set[str] = set()
+    prices_at = 0.0
+    backoff = 1.0
+    try:
+        while True:
+            try:
+                balance = await exchange.watch_balance()
+                balances = _balances_from_ccxt(balance)
+                assets = [b.asset for b in balances]
+                now = asyncio.get_running_loop().time()
+                if now - prices_at > _EXCHANGE_PRICE_REFRESH or not set(assets) <= priced_assets:
+                    prices = await _resolve_usd_prices(exchange, assets, True)
+                    priced_assets = set(assets)
+                    prices_at = now
+                stream.apply(AdapterResult(balances=_with_usd_values(balances, prices)))
+                stream.connected = True
+                backoff = 1.0
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                stream.connected = False
+                backoff = await _reconnect_delay(backoff)
+    finally:
+        stream.connected = False
+        await exchange.close()
@@ -3,14 +3,20 @@ import asyncio
 from sqlalchemy import select
 from sqlalchemy.orm import selectinload
 
+from app.config import get_settings
 from app.db import AsyncSession
+from app.deadline import collect_partial, deadline_after, remaining
+from app.metrics import adapter_timeouts_total
+from app.tracing import span
 from app.models import Account, AccountType
-from app.services.credential_store import decrypt_credential_payload
-from app.adapters import ExchangeAdapter, WalletAdapter
+from app.services.credential_vault import credential_vault
 from app.adapters.base import AdapterResult, BalanceItem
+from app.services.balance_snapshots import BalanceSnapshot, balance_snapshots
+from app.services.live_balances import live_balances, live_balances_enabled
+from app.services.portfolio_summary import portfolio_rollups
 
-# Per-account timeout so one stuck adapter doesn't block the whole portfolio
-FETCH_ACCOUNT_TIMEOUT = 45.0
+# Past the account deadline, adapters get this long to return what they have before the fetch is cancelled.
+FETCH_ACCOUNT_GRACE = 1.0
 
 
 async def fetch_account_balances(db: AsyncSession, account: Account) -> AdapterResult:
@@ -18,54 +24,123 @@ async def fetch_account_balances(db: AsyncSession, account: Account) -> AdapterR
     cred = account.credential
     if not cred:
         return AdapterResult(balances=[], error="No credentials stored")
-    payload = decrypt_credential_payload(cred.encrypted_payload)
+    payload = await credential_vault.get_payload(cred)
     if not payload:
         return AdapterResult(balances=[], error="Invalid credentials")
 
     if account.type == AccountType.BANK or account.type == AccountType.BROKERAGE:
         return AdapterResult(balances=[], error="Bank/brokerage integration has been removed")
+
+    # Streaming accounts: serve the live state (no upstream calls) once the stream is up; poll until then.
+    streaming = live_balances_enabled()
+    if streaming:
+        live = live_balances.current(account.id)
+        if live is not None:
+            return live
+        live_balances.ensure(account, payload)
+
+    # Adapters load lazily so app startup doesn't pay for them (see app.adapters).
+    from app.adapters import ExchangeAdapter, WalletAdapter
+
     if account.type == AccountType.EXCHANGE:
-        return await ExchangeAdapter.fetch_balances(account.provider or "binance", payload)
-    if account.type == AccountType.WALLET:
-        return await WalletAdapter.fetch_balances(account.provider or "ethereum", payload)
-    return AdapterResult(balances=[], error=f"Unknown account type: {account.type}")
+        result = await ExchangeAdapter.fetch_balances(account.provider or "binance", payload)
+    elif account.type == AccountType.WALLET:
+        result = await WalletAdapter.fetch_balances(account.provider or "ethereum", payload)
+    else:
+        return AdapterResult(balances=[], error=f"Unknown account type: {account.type}")
+    if streaming:
+        live_balances.seed(account.id, result)
+    return result
 
 
-async def aggregate_portfolio(db: AsyncSession, profile_id: int) -> list[dict]:
-    """Return list of account summaries with balances. No raw credentials in output."""
+async def fetch_account_snapshot(db: AsyncSession, account: Account) -> BalanceSnapshot:
+    """
+    Fetch under the account deadline (ACCOUNT_FETCH_TIMEOUT, or less when the request's own deadline is closer),
+    record the result as the account's latest snapshot and fold it into the profile rollup. A fetch cut off at
+    the deadline keeps the balances its adapter had published so far; an account whose turn comes after the
+    request's deadline is not fetched and keeps its last snapshot.
+    """
+    timeout = get_settings().account_fetch_timeout
+    left = remaining()
+    if left is not None:
+        if left <= 0:
+            adapter_timeouts_total.inc(adapter=account.type.value, provider=(account.provider or "").lower())
+            previous = balance_snapshots.get(account.id)
+            if previous is not None:
+                return previous
+            snapshot = balance_snapshots.record(account.id, AdapterResult(balances=[], error="Request timed out"))
+            portfolio_rollups.update(account, snapshot)
+            return snapshot
+        timeout = min(timeout, left)
+    with (
+        span("account.fetch", account_id=account.id, account_type=account.type.value, provider=account.provider or "") as s,
+        deadline_after(timeout),
+        collect_partial() as partial,
+    ):
+        try:
+            result = await asyncio.wait_for(fetch_account_balances(db, account), timeout=timeout + FETCH_ACCOUNT_GRACE)
+        except asyncio.TimeoutError:
+            adapter_timeouts_total.inc(adapter=account.type.value, provider=(account.provider or "").lower())
+            if partial.result is not None:
+                result = AdapterResult(balances=partial.result.balances, error="Request timed out; balances may be incomplete")
+            else:
+                result = AdapterResult(balances=[], error="Request timed out")
+        if s is not None and result.error:
+            s.set_error(result.error)
+    snapshot = balance_snapshots.record(account.id, result)
+    portfolio_rollups.update(account, snapshot)
+    return snapshot
+
+
+async def active_accounts(db: AsyncSession, profile_id: int) -> list[Account]:
     q = (
         select(Account)
         .where(Account.profile_id == profile_id, Account.is_active == True)
         .options(selectinload(Account.credential))
     )
     result = await db.execute(q)
-    accounts = result.scalars().all()
+    return list(result.scalars().all())
+
+
+async def collect_portfolio(
+    db: AsyncSession,
+    profile_id: int,
+    accounts: list[Account] | None = None,
+) -> list[tuple[Account, BalanceSnapshot]]:
+    """Fresh balance snapshot for every active account of the profile (or for the given accounts)."""
+    if accounts is None:
+        accounts = await active_accounts(db, profile_id)
+    # Decrypt the whole profile in one batch up front; per-account fetches then hit the vault.
+    await credential_vault.load_many([acc.credential for acc in accounts if acc.credential])
     out = []
     for acc in accounts:
-        try:
-            balances_result = await asyncio.wait_for(
-                fetch_account_balances(db, acc),
-                timeout=FETCH_ACCOUNT_TIMEOUT,
-            )
-        except asyncio.TimeoutError:
-            balances_result = AdapterResult(balances=[], error="Request timed out")
-        balances_dict = [
-            {
-                "asset": b.asset,
-                "amount": b.amount,
-                "currency": b.currency,
-                "usd_value": b.usd_value,
-                **({"chain": b.chain} if b.chain is not None else {}),
-                **({"name": b.raw_name} if b.raw_name is not None else {}),
-            }
-            for b in balances_result.balances
-        ]
-        out.append({
-            "id": acc.id,
-            "name": acc.name,
-            "type": acc.type.value,
-            "provider": acc.provider,
-            "balances": balances_dict,
-            "error": balances_result.error,
-        })
+        out.append((acc, await fetch_account_snapshot(db, acc)))
     return out
+
+
+def portfolio_entry(acc: Account, balances_result: AdapterResult) -> dict:
+    """Account summary with balances, as returned by /portfolio. No raw credentials in output."""
+    balances_dict = [
+        {
+            "asset": b.asset,
+            "amount": b.amount,
+            "currency": b.currency,
+            "usd_value": b.usd_value,
+            **({"chain": b.chain} if b.chain is not None else {}),
+            **({"name": b.raw_name} if b.raw_name is not None else {}),
+        }
+        for b in balances_result.balances
+    ]
+    return {
+        "id": acc.id,
+        "name": acc.name,
+        "type": acc.type.value,
+        "provider": acc.provider,
+        "balances": balances_dict,
+        "error": balances_result.error,
+    }
+
+
+async def aggregate_portfolio(db: AsyncSession, profile_id: int) -> list[dict]:
+    """Return list of account summaries with balances. No raw credentials in output."""
+    return [portfolio_entry(acc, snapshot.result) for acc, snapshot in await collect_portfolio(db, profile_id)]
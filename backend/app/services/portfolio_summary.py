@@ -0,0 +1,149 @@
+"""
+Server-side portfolio totals by asset, chain, account type and provider. Each profile keeps a running rollup
+plus every account's contribution to it; when an account's balance snapshot changes only that contribution is
+swapped out, so totals are never recomputed from all balances.
+"""
+from dataclasses import dataclass, field
+
+from app.models import Account, AccountType
+from app.services.balance_snapshots import BalanceSnapshot
+
+DIMENSIONS = ("asset", "chain", "type", "provider")
+
+
+@dataclass
+class _Contribution:
+    version: int
+    usd: float
+    error: bool
+    unpriced: int
+    # dimension -> key -> (usd_value, amount)
+    parts: dict[str, dict[str, tuple[float, float]]]
+
+
+def _contribution(account: Account, snapshot: BalanceSnapshot) -> _Contribution:
+    parts: dict[str, dict[str, tuple[float, float]]] = {d: {} for d in DIMENSIONS}
+    account_type = account.type.value
+    provider = account.provider or "unknown"
+    usd_total = 0.0
+    unpriced = 0
+
+    def add(dimension: str, key: str, usd: float, amount: float) -> None:
+        prev_usd, prev_amount = parts[dimension].get(key, (0.0, 0.0))
+        parts[dimension][key] = (prev_usd + usd, prev_amount + amount)
+
+    for b in snapshot.result.balances or []:
+        amount = float(b.amount or 0)
+        if amount <= 0:
+            continue
+        if b.usd_value is None:
+            unpriced += 1
+        usd = float(b.usd_value or 0)
+        usd_total += usd
+        add("asset", b.asset, usd, amount)
+        if account.type == AccountType.WALLET:
+            # Multi-chain wallets tag each line; single-chain wallets are identified by their provider.
+            add("chain", b.chain or provider, usd, 0.0)
+        add("type", account_type, usd, 0.0)
+        add("provider", provider, usd, 0.0)
+    return _Contribution(
+        version=snapshot.version,
+        usd=usd_total,
+        error=bool(snapshot.result.error),
+        unpriced=unpriced,
+        parts=parts,
+    )
+
+
+@dataclass
+class PortfolioRollup:
+    """Running totals for one profile."""
+
+    revision: int = 0
+    total_usd: float = 0.0
+    errors: int = 0
+    unpriced: int = 0
+    # dimension -> key -> [usd_value, amount, contributing accounts]
+    totals: dict[str, dict[str, list]] = field(default_factory=lambda: {d: {} for d in DIMENSIONS})
+    contributions: dict[int, _Contribution] = field(default_factory=dict)
+
+    def _apply(self, contribution: _Contribution, sign: int) -> None:
+        self.total_usd += sign * contribution.usd
+        self.errors += sign * int(contribution.error)
+        self.unpriced += sign * contribution.unpriced
+        for dimension, entries in contribution.parts.items():
+            bucket = self.totals[dimension]
+            for key, (usd, amount) in entries.items():
+                row = bucket.setdefault(key, [0.0, 0.0, 0])
+                row[0] += sign * usd
+                row[1] += sign * amount
+                row[2] += sign
+                if row[2] <= 0:
+                    del bucket[key]  # drop instead of keeping float residue
+        if not self.contributions:
+            self.total_usd = 0.0
+
+    def update(self, account: Account, snapshot: BalanceSnapshot) -> None:
+        """Swap in this account's contribution if its snapshot changed since it was last applied."""
+        current = self.contributions.get(account.id)
+        if current is not None and current.version == snapshot.version:
+            return
+        if current is not None:
+            self._apply(current, -1)
+        new = _contribution(account, snapshot)
+        self.contributions[account.id] = new
+        self._apply(new, 1)
+        self.revision += 1
+
+    def remove(self, account_id: int) -> None:
+        current = self.contributions.pop(account_id, None)
+        if current is not None:
+            self._apply(current, -1)
+            self.revision += 1
+
+    def to_dict(self) -> dict:
+        def rows(dimension: str) -> list[dict]:
+            out = [
+                {"key": key, "usd_value": round(usd, 2), "accounts": n, **({"amount": amount} if dimension == "asset" else {})}
+                for key, (usd, amount, n) in self.totals[dimension].items()
+            ]
+            out.sort(key=lambda r: r["usd_value"], reverse=True)
+            return out
+
+        return {
+            "total_usd": round(self.total_usd, 2),
+            "accounts": len(self.contributions),
+            "accounts_with_errors": self.errors,
+            "unpriced_balances": self.unpriced,
+            "by_asset": rows("asset"),
+            "by_chain": rows("chain"),
+            "by_type": rows("type"),
+            "by_provider": rows("provider"),
+        }
+
+
+class PortfolioRollups:
+    def __init__(self) -> None:
+        self._profiles: dict[int, PortfolioRollup] = {}
+        self._account_profile: dict[int, int] = {}
+
+    def get(self, profile_id: int) -> PortfolioRollup:
+        return self._profiles.setdefault(profile_id, PortfolioRollup())
+
+    def update(self, account: Account, snapshot: BalanceSnapshot) -> None:
+        self._account_profile[account.id] = account.profile_id
+        self.get(account.profile_id).update(account, snapshot)
+
+    def remove_account(self, account_id: int) -> None:
+        profile_id = self._account_profile.pop(account_id, None)
+        if profile_id is not None and profile_id in self._profiles:
+            self._profiles[profile_id].remove(account_id)
+
+    def remove_profile(self, profile_id: int) -> None:
+        rollup = self._profiles.pop(profile_id, None)
+        if rollup is not None:
+            for account_id in rollup.contributions:
+                self._account_profile.pop(account_id, None)
+
+
+portfolio_rollups = PortfolioRollups()
@@ -0,0 +1,246 @@
+"""
+Request-scoped span tracing with OpenTelemetry-compatible span fields (trace/span ids, parent, kind, unix-nano
+times, attributes, status). Each HTTP request gets a root span; account fetches, adapter calls, upstream HTTP
+calls and DB queries become child spans through a contextvar. Finished traces go to an in-memory ring buffer
+served by /debug/traces; no collector needed. Attributes never carry credentials or full upstream URLs.
+"""
+import os
+import re
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Iterator
+
+from app.config import get_settings
+
+# Not traced: scrapes and the trace viewer itself.
+_UNTRACED_PREFIXES = ("/health", "/metrics", "/debug")
+# Path segments that look like keys, addresses or tokens are replaced in span attributes.
+_OPAQUE_SEGMENT = re.compile(r"^[A-Za-z0-9_\-]{24,}$")
+
+
+def _new_id(n_bytes: int) -> str:
+    return os.urandom(n_bytes).hex()
+
+
+def redact_path(path: str) -> str:
+    return "/".join("***" if _OPAQUE_SEGMENT.match(seg) else seg for seg in path.split("/"))
+
+
+@dataclass
+class Span:
+    trace: "Trace"
+    name: str
+    span_id: str
+    parent_span_id: str | None
+    kind: str = "INTERNAL"  # INTERNAL | SERVER | CLIENT
+    start_ns: int = field(default_factory=time.time_ns)
+    end_ns: int | None = None
+    attributes: dict[str, Any] = field(default_factory=dict)
+    status: str = "UNSET"  # UNSET | OK | ERROR
+    status_message: str | None = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_error(self, exc: BaseException | str) -> None:
+        self.status = "ERROR"
+        self.status_message = exc if isinstance(exc, str) else f"{type(exc).__name__}: {exc}"
+
+    def end(self) -> None:
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+
+    def to_otel(self) -> dict:
+        return {
+            "traceId": self.trace.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_span_id or "",
+            "name": self.name,
+            "kind": f"SPAN_KIND_{self.kind}",
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or self.start_ns),
+            "attributes": [{"key": k, "value": _otel_value(v)} for k, v in self.attributes.items()],
+            "status": {"code": f"STATUS_CODE_{self.status}", **({"message": self.status_message} if self.status_message else {})},
+        }
+
+
+def _otel_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class Trace:
+    def __init__(self, max_spans: int):
+        self.trace_id = _new_id(16)
+        self.spans: list[Span] = []
+        self.max_spans = max_spans
+        self.dropped = 0
+        self.closed = False
+
+    def new_span(self, name: str, parent: Span | None, kind: str, attributes: dict) -> Span | None:
+        if self.closed:
+            return None  # e.g. a background task spawned by a finished request
+        if len(self.spans) >= self.max_spans:
+            self.dropped += 1
+            return None
+        span = Span(
+            trace=self,
+            name=name,
+            span_id=_new_id(8),
+            parent_span_id=parent.span_id if parent else None,
+            kind=kind,
+            attributes=dict(attributes),
+        )
+        self.spans.append(span)
+        return span
+
+    @property
+    def root(self) -> Span:
+        return self.spans[0]
+
+    def summary(self) -> dict:
+        root = self.root
+        return {
+            "trace_id": self.trace_id,
+            "name": root.name,
+            "start": root.start_ns / 1e9,
+            "duration_ms": round(((root.end_ns or root.start_ns) - root.start_ns) / 1e6, 2),
+            "status": root.status,
+            "http_status": root.attributes.get("http.response.status_code"),
+            "spans": len(self.spans),
+            "dropped_spans": self.dropped,
+        }
+
+    def waterfall(self) -> dict:
+        """Spans in start order with offsets from the root and their depth, for a waterfall view."""
+        root = self.root
+        depth: dict[str, int] = {}
+        rows = []
+        for span in sorted(self.spans, key=lambda s: s.start_ns):
+            d = depth.get(span.parent_span_id, -1) + 1 if span.parent_span_id else 0
+            depth[span.span_id] = d
+            end = span.end_ns or span.start_ns
+            rows.append({
+                "span_id": span.span_id,
+                "parent_span_id": span.parent_span_id,
+                "name": span.name,
+                "kind": span.kind,
+                "depth": d,
+                "offset_ms": round((span.start_ns - root.start_ns) / 1e6, 2),
+                "duration_ms": round((end - span.start_ns) / 1e6, 2),
+                "status": span.status,
+                "status_message": span.status_message,
+                "attributes": span.attributes,
+            })
+        return {**self.summary(), "waterfall": rows}
+
+    def to_otlp(self) -> dict:
+        """OTLP/JSON export shape (resourceSpans), e.g. for loading into a trace viewer."""
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": "mantracker-backend"}}]},
+                "scopeSpans": [{"scope": {"name": "app.tracing"}, "spans": [s.to_otel() for s in self.spans]}],
+            }]
+        }
+
+
+_current_span: ContextVar[Span | None] = ContextVar("current_span", default=None)
+
+
+class TraceBuffer:
+    """Last N finished traces."""
+
+    def __init__(self) -> None:
+        self._traces: deque[Trace] = deque(maxlen=max(1, get_settings().trace_buffer_size))
+
+    def add(self, trace: Trace) -> None:
+        self._traces.append(trace)
+
+    def list(self) -> list[Trace]:
+        return list(reversed(self._traces))
+
+    def get(self, trace_id: str) -> Trace | None:
+        return next((t for t in self._traces if t.trace_id == trace_id), None)
+
+    def clear(self) -> None:
+        self._traces.clear()
+
+
+traces = TraceBuffer()
+
+
+def current_span() -> Span | None:
+    return _current_span.get()
+
+
+def start_span(name: str, kind: str = "INTERNAL", **attributes: Any) -> Span | None:
+    """Child of the current span, without making it current (for paired callbacks such as DB events)."""
+    parent = _current_span.get()
+    if parent is None:
+        return None
+    return parent.trace.new_span(name, parent, kind, attributes)
+
+
+@contextmanager
+def span(name: str, kind: str = "INTERNAL", **attributes: Any) -> Iterator[Span | None]:
+    """Child span of the current one for the duration of the block; a no-op outside a traced request."""
+    s = start_span(name, kind, **attributes)
+    if s is None:
+        yield None
+        return
+    token = _current_span.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.set_error(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        s.end()
+
+
+class TracingMiddleware:
+    """ASGI middleware: one trace per HTTP request, stored in the ring buffer when the response is done."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get("path", "")
+        if scope["type"] != "http" or not get_settings().tracing_enabled or path.startswith(_UNTRACED_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+        trace = Trace(max_spans=get_settings().trace_max_spans)
+        root = trace.new_span(
+            f"{scope['method']} {path}",
+            None,
+            "SERVER",
+            {"http.request.method": scope["method"], "url.path": redact_path(path)},
+        )
+        token = _current_span.set(root)
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                root.set_attribute("http.response.status_code", message["status"])
+                if message["status"] >= 500:
+                    root.set_error(f"HTTP {message['status']}")
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        except BaseException as e:
+            root.set_error(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            root.end()
+            trace.closed = True
+            traces.add(trace)
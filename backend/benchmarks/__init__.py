@@ -0,0 +1,4 @@
+"""
+Benchmarks for the balance aggregation hot path, run against local stand-ins for every upstream API.
+Start with: python -m benchmarks.run --help (from backend/).
+"""
@@ -0,0 +1,83 @@
+"""
+Local stand-in for an Electrum server (newline-delimited JSON-RPC over TCP, batches included), for trying
+BTC_BACKEND=electrum without a real Fulcrum/electrs. Answers server.version, blockchain.scripthash.get_balance
+and blockchain.scripthash.get_history; addresses given with --used have a balance and one history entry,
+every other script hash is empty and unused.
+
+Run standalone: python -m benchmarks.electrum_standin --port 50001 --used bc1q... --balance-sats 5000
+then start the backend with BTC_BACKEND=electrum BTC_ELECTRUM_HOST=127.0.0.1 BTC_ELECTRUM_PORT=50001
+BTC_ELECTRUM_SSL=false.
+"""
+import argparse
+import asyncio
+import json
+
+from app.adapters.btc_backends import electrum_scripthash
+
+
+class ElectrumStandIn:
+    def __init__(self, used: dict[str, int], latency_ms: float = 0.0):
+        self.used = used  # script hash -> confirmed sats
+        self.latency = latency_ms / 1000.0
+        self.requests = 0  # lines received (a batch counts once)
+        self.calls = 0  # JSON-RPC calls answered
+
+    @classmethod
+    def for_addresses(cls, addresses: list[str], balance_sats: int, latency_ms: float = 0.0) -> "ElectrumStandIn":
+        return cls({electrum_scripthash(a): balance_sats for a in addresses}, latency_ms)
+
+    def _result(self, method: str, params: list) -> object:
+        if method == "server.version":
+            return ["electrum-standin", "1.4"]
+        scripthash = params[0] if params else ""
+        if method == "blockchain.scripthash.get_balance":
+            return {"confirmed": self.used.get(scripthash, 0), "unconfirmed": 0}
+        if method == "blockchain.scripthash.get_history":
+            return [{"tx_hash": "00" * 32, "height": 1}] if scripthash in self.used else []
+        raise ValueError(f"unknown method {method}")
+
+    def _answer(self, item: dict) -> dict:
+        self.calls += 1
+        try:
+            return {"jsonrpc": "2.0", "id": item.get("id"), "result": self._result(item["method"], item.get("params") or [])}
+        except Exception as e:
+            return {"jsonrpc": "2.0", "id": item.get("id"), "error": {"code": -32601, "message": str(e)}}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while line := await reader.readline():
+                self.requests += 1
+                msg = json.loads(line)
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                out = [self._answer(item) for item in msg] if isinstance(msg, list) else self._answer(msg)
+                writer.write((json.dumps(out) + "\n").encode())
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> asyncio.Server:
+        return await asyncio.start_server(self.handle, host, port, limit=2**24)
+
+
+async def _serve(args: argparse.Namespace) -> None:
+    standin = ElectrumStandIn.for_addresses(args.used, args.balance_sats, args.latency_ms)
+    server = await standin.start(args.host, args.port)
+    async with server:
+        await server.serve_forever()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve a local stand-in Electrum server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=50001)
+    parser.add_argument("--used", action="append", default=[], metavar="ADDRESS", help="address with a balance and history")
+    parser.add_argument("--balance-sats", type=int, default=5000, help="confirmed balance of each --used address")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="delay before each response")
+    asyncio.run(_serve(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Fake CCXT exchange ("benchfake") for benchmarks. Implements the async ccxt calls the exchange adapter makes
+(fetch_balance, load_markets, fetch_tickers, fetch_ticker, close) as REST calls to the exchange stand-in in
+benchmarks.upstreams, through the shared upstream client, so latency, errors and call counts apply as for
+any other upstream.
+"""
+from typing import Any
+
+from ccxt.base.errors import BadSymbol, ExchangeNotAvailable, RateLimitExceeded
+
+from app.adapters.http import upstream_client
+
+EXCHANGE_ID = "benchfake"
+BASE_URL = "https://exchange.bench.invalid"
+
+
+class BenchExchange:
+    id = EXCHANGE_ID
+
+    def __init__(self, config: dict | None = None):
+        self.config = config or {}
+        self.markets: dict[str, Any] | None = None
+        self._client = upstream_client(timeout=10.0)
+
+    async def _get(self, path: str) -> Any:
+        r = await self._client.get(BASE_URL + path, headers={"X-Api-Key": self.config.get("apiKey", "")})
+        if r.status_code == 429:
+            raise RateLimitExceeded(f"{EXCHANGE_ID} 429 Too Many Requests")
+        if r.status_code >= 500:
+            raise ExchangeNotAvailable(f"{EXCHANGE_ID} {r.status_code}")
+        if r.status_code >= 400:
+            raise BadSymbol(f"{EXCHANGE_ID} {r.status_code} {path}")
+        return r.json()
+
+    async def fetch_balance(self) -> dict:
+        data = await self._get("/balance")
+        return {"total": data["total"], "free": data["total"], "used": {k: 0 for k in data["total"]}}
+
+    async def load_markets(self) -> dict:
+        if self.markets is None:
+            self.markets = {m["symbol"]: m for m in await self._get("/markets")}
+        return self.markets
+
+    async def fetch_tickers(self) -> dict:
+        return await self._get("/tickers")
+
+    async def fetch_ticker(self, symbol: str) -> dict:
+        return await self._get("/ticker/" + symbol.replace("/", "-").replace(":", "-"))
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+def install() -> None:
+    """Register the fake exchange with ccxt.async_support so accounts with provider "benchfake" use it."""
+    import ccxt.async_support as ccxt
+
+    setattr(ccxt, EXCHANGE_ID, BenchExchange)
+    if EXCHANGE_ID not in ccxt.exchanges:
+        ccxt.exchanges.append(EXCHANGE_ID)
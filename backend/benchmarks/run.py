@@ -0,0 +1,419 @@
+"""
+Benchmark the balance aggregation hot path against local upstream stand-ins.
+
+Starts benchmarks.upstreams in a subprocess, then runs one worker process per (target, account count) so
+every scenario starts with cold caches and its peak RSS is its own. Each worker seeds a fresh SQLite
+database with a mix of accounts, redirects every upstream request to the stand-ins (innermost transport
+layer, so metrics and traces still see the real hosts) and drives one target:
+
+  aggregate  aggregate_portfolio() called directly
+  portfolio  GET /portfolio through the ASGI app (middleware, routing, serialization included)
+  summary    GET /portfolio/summary?refresh=true
+  batch      POST /accounts/balances, in chunks of the endpoint's maximum
+
+Reported per scenario: cold (first) iteration, p50/p95/p99 over all iterations, per-account fetch
+p50/p95/p99, upstream calls per service, accounts with errors and peak RSS.
+
+  python -m benchmarks.run --accounts 1,10,100 --targets aggregate,portfolio
+  python -m benchmarks.run --accounts 1000 --latency-ms 20 --service evm_rpc:latency_ms=150,error_rate=0.02
+"""
+import argparse
+import asyncio
+import functools
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.upstreams import SERVICES, add_profile_arguments
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TARGETS = ("aggregate", "portfolio", "summary", "batch")
+
+# Account kind -> (account type, provider)
+ACCOUNT_KINDS: dict[str, tuple[str, str]] = {
+    "bitcoin": ("wallet", "bitcoin"),
+    "ethereum": ("wallet", "ethereum"),
+    "arbitrum": ("wallet", "arbitrum"),
+    "base": ("wallet", "base"),
+    "polygon": ("wallet", "polygon"),
+    "evm-all": ("wallet", "evm"),
+    "solana": ("wallet", "solana"),
+    "hypercore": ("wallet", "hypercore"),
+    "exchange": ("exchange", "benchfake"),
+}
+DEFAULT_MIX = "bitcoin,ethereum,arbitrum,solana,hypercore,exchange"
+
+
+def parse_mix(spec: str) -> list[str]:
+    """"bitcoin=2,solana" -> ["bitcoin", "bitcoin", "solana"]; accounts cycle through this list."""
+    kinds: list[str] = []
+    for item in filter(None, (s.strip() for s in spec.split(","))):
+        kind, _, weight = item.partition("=")
+        if kind not in ACCOUNT_KINDS:
+            raise ValueError(f"Unknown account kind {kind!r} (expected one of {', '.join(ACCOUNT_KINDS)})")
+        kinds.extend([kind] * int(weight or 1))
+    if not kinds:
+        raise ValueError("Empty account mix")
+    return kinds
+
+
+def credentials_for(kind: str, i: int) -> dict:
+    """Distinct credentials per account so per-address caches don't collapse accounts into one."""
+    if kind == "bitcoin":
+        return {"address": f"bc1qbench{i:032d}"}
+    if kind == "solana":
+        return {"address": f"Bench{i:039d}"}
+    if kind == "exchange":
+        return {"api_key": f"bench-key-{i}", "secret": f"bench-secret-{i}"}
+    return {"address": "0x" + format(i + 1, "040x")}
+
+
+def percentiles(values: list[float]) -> dict[str, float | None]:
+    """p50/p95/p99 (linear interpolation between closest ranks), in the input unit."""
+    if not values:
+        return {"p50": None, "p95": None, "p99": None}
+    ordered = sorted(values)
+
+    def pct(p: float) -> float:
+        k = (len(ordered) - 1) * p
+        lo = int(k)
+        hi = min(lo + 1, len(ordered) - 1)
+        return round(ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo), 2)
+
+    return {"p50": pct(0.50), "p95": pct(0.95), "p99": pct(0.99)}
+
+
+def peak_rss_mb() -> float | None:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+# --- Worker (one scenario per process) ---
+
+
+def _redirect_layer(port: int):
+    import httpx
+
+    class RedirectTransport(httpx.AsyncBaseTransport):
+        """Send every upstream request to the local stand-ins; the Host header keeps the original host."""
+
+        def __init__(self, inner: httpx.AsyncBaseTransport):
+            self._inner = inner
+
+        async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+            request.url = request.url.copy_with(scheme="http", host="127.0.0.1", port=port)
+            return await self._inner.handle_async_request(request)
+
+        async def aclose(self) -> None:
+            await self._inner.aclose()
+
+    return RedirectTransport
+
+
+async def _seed(n_accounts: int, mix: list[str]) -> tuple[int, list[int]]:
+    from app.db import async_session
+    from app.models import Account, AccountCredential, AccountType, Profile
+    from app.security.crypto import ensure_keyring_ready
+    from app.services.credential_store import encrypt_credential_payload
+
+    await ensure_keyring_ready()
+    async with async_session() as db:
+        profile = Profile(name="benchmark")
+        db.add(profile)
+        await db.flush()
+        accounts = []
+        for i in range(n_accounts):
+            kind = mix[i % len(mix)]
+            account_type, provider = ACCOUNT_KINDS[kind]
+            accounts.append(
+                Account(
+                    profile_id=profile.id,
+                    name=f"{kind}-{i}",
+                    type=AccountType(account_type),
+                    provider=provider,
+                    credential=AccountCredential(encrypted_payload=encrypt_credential_payload(credentials_for(kind, i))),
+                )
+            )
+        db.add_all(accounts)
+        await db.commit()
+        return profile.id, [a.id for a in accounts]
+
+
+async def _run_scenario(config: dict) -> dict:
+    import httpx
+
+    from app.adapters.http import add_transport_layer
+    from app.adapters import wallet_adapter
+    from app.main import app
+    from app.services import portfolio_aggregator
+    from benchmarks import fake_exchange
+
+    upstreams_url = f"http://127.0.0.1:{config['port']}"
+    add_transport_layer(_redirect_layer(config["port"]), innermost=True)
+    fake_exchange.install()
+    if not config["solana_pacing"]:
+        # Public-RPC courtesy pacing (1 s between Solana calls) would dominate every run; off unless asked for.
+        wallet_adapter._SOLANA_RPC_DELAY = 0.0
+
+    # Per-account fetch latency, measured around the adapter dispatch.
+    account_ms: list[float] = []
+    fetch_account_balances = portfolio_aggregator.fetch_account_balances
+
+    @functools.wraps(fetch_account_balances)
+    async def timed_fetch(db, account):
+        started = time.perf_counter()
+        try:
+            return await fetch_account_balances(db, account)
+        finally:
+            account_ms.append((time.perf_counter() - started) * 1000)
+
+    portfolio_aggregator.fetch_account_balances = timed_fetch
+
+    target = config["target"]
+    iteration_ms: list[float] = []
+    errors = 0
+    async with app.router.lifespan_context(app), httpx.AsyncClient(base_url=upstreams_url) as control:
+        profile_id, account_ids = await _seed(config["accounts"], parse_mix(config["mix"]))
+        setup_rss = peak_rss_mb()
+        await control.post("/_bench/reset")
+        headers = {"X-Profile-Id": str(profile_id)}
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers, timeout=None) as client:
+            from app.db import async_session
+            from app.routers.accounts import MAX_BATCH_ACCOUNTS
+
+            async def once() -> int:
+                """One pass over the target; returns how many accounts came back with an error."""
+                if target == "aggregate":
+                    async with async_session() as db:
+                        entries = await portfolio_aggregator.aggregate_portfolio(db, profile_id)
+                elif target == "portfolio":
+                    r = await client.get("/portfolio")
+                    r.raise_for_status()
+                    entries = r.json()
+                elif target == "summary":
+                    r = await client.get("/portfolio/summary", params={"refresh": "true"})
+                    r.raise_for_status()
+                    return r.json()["accounts_with_errors"]
+                else:
+                    entries = []
+                    for i in range(0, len(account_ids), MAX_BATCH_ACCOUNTS):
+                        chunk = account_ids[i : i + MAX_BATCH_ACCOUNTS]
+                        r = await client.post("/accounts/balances", json={"account_ids": chunk})
+                        r.raise_for_status()
+                        entries.extend(r.json())
+                return sum(1 for e in entries if e.get("error"))
+
+            first_calls: dict[str, int] = {}
+            for i in range(config["iterations"]):
+                started = time.perf_counter()
+                errors = await once()
+                iteration_ms.append((time.perf_counter() - started) * 1000)
+                if i == 0:
+                    first_calls = (await control.get("/_bench/stats")).json()["calls"]
+        stats = (await control.get("/_bench/stats")).json()
+
+    total_calls = sum(stats["calls"].values())
+    return {
+        "target": target,
+        "accounts": config["accounts"],
+        "iterations": config["iterations"],
+        "cold_ms": round(iteration_ms[0], 2),
+        "iteration_ms": percentiles(iteration_ms),
+        "account_fetch_ms": percentiles(account_ms),
+        "upstream_calls": stats["calls"],
+        "upstream_calls_cold": sum(first_calls.values()),
+        "upstream_calls_per_iteration": round(total_calls / config["iterations"], 1),
+        "upstream_statuses": stats["statuses"],
+        "accounts_with_errors": errors,
+        "setup_rss_mb": setup_rss,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def _worker(config: dict) -> None:
+    result = asyncio.run(_run_scenario(config))
+    print("RESULT " + json.dumps(result), flush=True)
+
+
+# --- Orchestrator ---
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start_upstreams(args: argparse.Namespace, port: int) -> subprocess.Popen:
+    cmd = [
+        sys.executable, "-m", "benchmarks.upstreams",
+        "--port", str(port),
+        "--seed", str(args.seed),
+        "--latency-ms", str(args.latency_ms),
+        "--jitter-ms", str(args.jitter_ms),
+        "--error-rate", str(args.error_rate),
+        "--rate-limit-rate", str(args.rate_limit_rate),
+    ]
+    for spec in args.service:
+        cmd += ["--service", spec]
+    proc = subprocess.Popen(cmd, cwd=BACKEND_DIR)
+    deadline = time.monotonic() + 15
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit("Upstream stand-ins failed to start")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.terminate()
+    raise SystemExit("Upstream stand-ins did not start listening")
+
+
+def _worker_env(db_path: str) -> dict:
+    env = dict(os.environ)
+    env.update(
+        DATABASE_URL=f"sqlite+aiosqlite:///{db_path}",
+        # Credentials are encrypted with a throwaway key; no passphrase prompt.
+        ENCRYPTION_KEY="benchmark-only-encryption-key",
+        BTC_BACKEND="esplora",
+        BTC_ESPLORA_URL="https://mempool.space/api",
+        ALCHEMY_API_KEY="",
+        SOLANA_RPC_URL="",
+        LIVE_BALANCES_ENABLED="false",
+        STARTUP_WARMUP="false",
+    )
+    # Budgets and breakers would make call counts and errors depend on quota/breaker state rather than the code
+    # under test (and error-rate scenarios would trip breakers); set them in the environment to benchmark them.
+    env.setdefault("UPSTREAM_BUDGET_ENFORCE", "false")
+    env.setdefault("CIRCUIT_BREAKER_ENABLED", "false")
+    return env
+
+
+def _run_worker(config: dict) -> dict:
+    with tempfile.TemporaryDirectory(prefix="mantracker-bench-") as tmp:
+        proc = subprocess.run(
+            [sys.executable, "-m", "benchmarks.run", "--worker", json.dumps(config)],
+            cwd=BACKEND_DIR,
+            env=_worker_env(os.path.join(tmp, "bench.db")),
+            capture_output=True,
+            text=True,
+        )
+    for line in reversed(proc.stdout.splitlines()):
+        if line.startswith("RESULT "):
+            return json.loads(line[len("RESULT "):])
+    sys.stderr.write(proc.stderr[-4000:])
+    raise SystemExit(f"Benchmark worker failed ({config['target']}, {config['accounts']} accounts)")
+
+
+def _print_table(results: list[dict]) -> None:
+    columns = (
+        ("target", lambda r: r["target"]),
+        ("accounts", lambda r: r["accounts"]),
+        ("cold ms", lambda r: r["cold_ms"]),
+        ("p50 ms", lambda r: r["iteration_ms"]["p50"]),
+        ("p95 ms", lambda r: r["iteration_ms"]["p95"]),
+        ("p99 ms", lambda r: r["iteration_ms"]["p99"]),
+        ("acct p50", lambda r: r["account_fetch_ms"]["p50"]),
+        ("acct p95", lambda r: r["account_fetch_ms"]["p95"]),
+        ("acct p99", lambda r: r["account_fetch_ms"]["p99"]),
+        ("calls cold", lambda r: r["upstream_calls_cold"]),
+        ("calls/iter", lambda r: r["upstream_calls_per_iteration"]),
+        ("errors", lambda r: r["accounts_with_errors"]),
+        ("peak RSS MB", lambda r: r["peak_rss_mb"]),
+    )
+    rows = [[str(get(r)) for _, get in columns] for r in results]
+    widths = [max(len(name), *(len(row[i]) for row in rows)) for i, (name, _) in enumerate(columns)]
+    print("  ".join(name.rjust(w) for (name, _), w in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(cell.rjust(w) for cell, w in zip(row, widths)))
+    print()
+    for r in results:
+        calls = ", ".join(f"{s}={n}" for s, n in sorted(r["upstream_calls"].items()))
+        print(f"{r['target']} x{r['accounts']}: upstream calls ({r['iterations']} iterations): {calls or 'none'}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark balance aggregation against local upstream stand-ins.",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=f"Upstream services: {', '.join(SERVICES)}\nAccount kinds: {', '.join(ACCOUNT_KINDS)}",
+    )
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--accounts", default="1,10,100", help="comma-separated account counts, 1-1000 (default 1,10,100)")
+    parser.add_argument("--targets", default="aggregate,portfolio,batch", help=f"comma-separated, from: {', '.join(TARGETS)}")
+    parser.add_argument("--iterations", type=int, default=5, help="runs per scenario; the first one is cold (default 5)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"account kinds, cycled; weights as kind=N (default {DEFAULT_MIX})")
+    parser.add_argument("--solana-pacing", action="store_true", help="keep the 1 s pacing between Solana RPC calls")
+    parser.add_argument("--seed", type=int, default=0, help="seed for latency jitter and injected errors")
+    parser.add_argument("--json", metavar="PATH", help="also write results as JSON")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    if args.worker:
+        _worker(json.loads(args.worker))
+        return
+
+    counts = [int(c) for c in args.accounts.split(",") if c.strip()]
+    targets = [t.strip() for t in args.targets.split(",") if t.strip()]
+    if any(c < 1 or c > 1000 for c in counts):
+        parser.error("--accounts values must be between 1 and 1000")
+    if unknown := [t for t in targets if t not in TARGETS]:
+        parser.error(f"unknown targets: {', '.join(unknown)}")
+    if args.iterations < 1:
+        parser.error("--iterations must be at least 1")
+    parse_mix(args.mix)
+
+    port = _free_port()
+    upstreams = _start_upstreams(args, port)
+    results = []
+    try:
+        for target in targets:
+            for count in counts:
+                config = {
+                    "target": target,
+                    "accounts": count,
+                    "iterations": args.iterations,
+                    "mix": args.mix,
+                    "port": port,
+                    "solana_pacing": args.solana_pacing,
+                }
+                print(f"running {target} with {count} accounts...", file=sys.stderr, flush=True)
+                results.append(_run_worker(config))
+    finally:
+        upstreams.terminate()
+        upstreams.wait()
+
+    _print_table(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(
+                {
+                    "latency_ms": args.latency_ms,
+                    "jitter_ms": args.jitter_ms,
+                    "error_rate": args.error_rate,
+                    "rate_limit_rate": args.rate_limit_rate,
+                    "service_overrides": args.service,
+                    "mix": args.mix,
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+"""
+Local stand-ins for the upstream APIs the adapters call: mempool.space (Esplora), EVM JSON-RPC, Solana RPC,
+Hyperliquid info, Jupiter, DefiLlama, CoinGecko, DIA, the Solana token list and a fake exchange REST API
+(served to benchmarks.fake_exchange). One ASGI app answers for all of them and picks the service from the
+Host header, which the benchmark's redirect transport leaves untouched.
+
+Each service has its own latency, jitter, error rate (HTTP 503) and rate-limit rate (HTTP 429). Calls are
+counted per service; GET /_bench/stats returns the counts and POST /_bench/reset clears them.
+
+Run standalone: python -m benchmarks.upstreams --port 8900 --latency-ms 50 --jitter-ms 20
+"""
+import argparse
+import asyncio
+import json
+import random
+from dataclasses import asdict, dataclass
+from urllib.parse import parse_qs
+
+# Service -> hosts the adapters use for it.
+SERVICE_HOSTS: dict[str, tuple[str, ...]] = {
+    "mempool": ("mempool.space",),
+    "evm_rpc": (
+        "eth.llamarpc.com",
+        "rpc.ankr.com",
+        "arb1.arbitrum.io",
+        "mainnet.optimism.io",
+        "api.avax.network",
+        "mainnet.base.org",
+        "bsc-dataseed.binance.org",
+        "rpc.hyperliquid.xyz",
+    ),
+    "solana_rpc": ("api.mainnet-beta.solana.com",),
+    "hyperliquid": ("api.hyperliquid.xyz",),
+    "jupiter": ("lite-api.jup.ag",),
+    "defillama": ("coins.llama.fi",),
+    "coingecko": ("api.coingecko.com",),
+    "diadata": ("api.diadata.org",),
+    "token_list": ("raw.githubusercontent.com",),
+    "exchange": ("exchange.bench.invalid",),
+}
+SERVICES = tuple(SERVICE_HOSTS)
+_SERVICE_BY_HOST = {host: service for service, hosts in SERVICE_HOSTS.items() for host in hosts}
+
+SOL_MINT = "So11111111111111111111111111111111111111112"
+USDC_MINT = "EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v"
+# Held by every Solana wallet but missing from the token list, so it is dropped like real spam tokens.
+SPAM_MINT = "BenchSpam1111111111111111111111111111111111"
+
+COINGECKO_PRICES = {
+    "ethereum": 3000.0,
+    "matic-network": 0.5,
+    "avalanche-2": 25.0,
+    "binancecoin": 500.0,
+    "hyperliquid": 30.0,
+    "tether": 1.0,
+    "usd-coin": 1.0,
+    "binance-usd": 1.0,
+}
+JUPITER_PRICES = {SOL_MINT: 150.0, USDC_MINT: 1.0, "Es9vMFrzaCERmJfrF4H2FYD4KCoNkY11McCe8BenwNYB": 1.0}
+EXCHANGE_TICKERS = {"BTC/USDT": 60000.0, "ETH/USDT": 3000.0, "SOL/USDT": 150.0, "USDC/USDT": 1.0}
+# XYZ has no ticker (single-ticker lookups fail) and USDT has no USD pair (stablecoin fallback pricing).
+EXCHANGE_BALANCE = {"BTC": 0.5, "ETH": 3.0, "SOL": 20.0, "USDC": 200.0, "USDT": 1000.0, "XYZ": 5.0}
+
+
+@dataclass
+class ServiceProfile:
+    latency_ms: float = 50.0
+    jitter_ms: float = 20.0
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+
+    def delay(self, rng: random.Random) -> float:
+        return max(0.0, self.latency_ms + rng.uniform(-self.jitter_ms, self.jitter_ms)) / 1000.0
+
+
+def parse_service_override(spec: str) -> tuple[str, dict]:
+    """"evm_rpc:latency_ms=200,error_rate=0.05" -> ("evm_rpc", {"latency_ms": 200.0, "error_rate": 0.05})."""
+    service, _, fields = spec.partition(":")
+    if service not in SERVICE_HOSTS:
+        raise ValueError(f"Unknown service {service!r} (expected one of {', '.join(SERVICES)})")
+    values = {}
+    for item in filter(None, fields.split(",")):
+        key, _, value = item.partition("=")
+        if key not in ServiceProfile.__dataclass_fields__:
+            raise ValueError(f"Unknown setting {key!r} for {service}")
+        values[key] = float(value)
+    return service, values
+
+
+class MockUpstreams:
+    """ASGI app serving every stand-in service."""
+
+    def __init__(self, default: ServiceProfile, overrides: dict[str, dict] | None = None, seed: int = 0):
+        self.profiles = {s: ServiceProfile(**{**asdict(default), **(overrides or {}).get(s, {})}) for s in SERVICES}
+        self.calls: dict[str, int] = {}
+        self.statuses: dict[str, int] = {}
+        self._rng = random.Random(seed)
+
+    def stats(self) -> dict:
+        return {"calls": dict(self.calls), "statuses": dict(self.statuses), "profiles": {s: asdict(p) for s, p in self.profiles.items()}}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    await send({"type": "lifespan.startup.complete"})
+                else:
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        path = scope["path"]
+        if path.startswith("/_bench/"):
+            if path == "/_bench/reset":
+                self.calls.clear()
+                self.statuses.clear()
+            await self._send(send, 200, self.stats())
+            return
+
+        headers = dict(scope["headers"])
+        host = headers.get(b"host", b"").decode().split(":")[0]
+        service = _SERVICE_BY_HOST.get(host, "unknown")
+        self.calls[service] = self.calls.get(service, 0) + 1
+        profile = self.profiles.get(service, ServiceProfile())
+        await asyncio.sleep(profile.delay(self._rng))
+
+        roll = self._rng.random()
+        if roll < profile.rate_limit_rate:
+            status, payload = 429, {"error": "rate limited"}
+        elif roll < profile.rate_limit_rate + profile.error_rate:
+            status, payload = 503, {"error": "service unavailable"}
+        else:
+            query = parse_qs(scope.get("query_string", b"").decode())
+            try:
+                request_json = json.loads(body) if body else None
+            except ValueError:
+                request_json = None
+            status, payload = self._respond(service, scope["method"], path, query, request_json)
+        self.statuses[str(status)] = self.statuses.get(str(status), 0) + 1
+        await self._send(send, status, payload)
+
+    @staticmethod
+    async def _send(send, status: int, payload) -> None:
+        data = json.dumps(payload).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(data)).encode())],
+        })
+        await send({"type": "http.response.body", "body": data})
+
+    def _respond(self, service: str, method: str, path: str, query: dict, body) -> tuple[int, object]:
+        handler = getattr(self, f"_{service}", None)
+        if handler is None:
+            return 404, {"error": "unknown upstream"}
+        return handler(method, path, query, body)
+
+    # --- Services ---
+
+    def _mempool(self, method, path, query, body):
+        # GET /api/address/{address}
+        if "/address/" not in path:
+            return 404, {"error": "not found"}
+        return 200, {
+            "chain_stats": {"funded_txo_sum": 150_000_000, "spent_txo_sum": 50_000_000, "tx_count": 3},
+            "mempool_stats": {"funded_txo_sum": 0, "spent_txo_sum": 0, "tx_count": 0},
+        }
+
+    def _evm_rpc(self, method, path, query, body):
+        def one(req: dict) -> dict:
+            rpc = req.get("method")
+            if rpc == "eth_getBalance":
+                result = hex(15 * 10**17)  # 1.5 native
+            elif rpc == "eth_call":
+                result = "0x" + format(250 * 10**6, "064x")  # 250 of a 6-decimal token
+            else:
+                return {"jsonrpc": "2.0", "id": req.get("id"), "error": {"code": -32601, "message": "method not found"}}
+            return {"jsonrpc": "2.0", "id": req.get("id"), "result": result}
+
+        if isinstance(body, list):
+            return 200, [one(r) for r in body]
+        return 200, one(body or {})
+
+    def _solana_rpc(self, method, path, query, body):
+        body = body or {}
+        rpc = body.get("method")
+        if rpc == "getBalance":
+            result = {"context": {"slot": 1}, "value": 2_500_000_000}
+        elif rpc == "getTokenAccountsByOwner":
+
+            def token_account(mint: str, ui_amount: str, decimals: int) -> dict:
+                amount = {"amount": str(int(float(ui_amount) * 10**decimals)), "decimals": decimals, "uiAmountString": ui_amount}
+                return {"account": {"data": {"parsed": {"info": {"mint": mint, "tokenAmount": amount}}}}}
+
+            result = {"context": {"slot": 1}, "value": [token_account(USDC_MINT, "100.5", 6), token_account(SPAM_MINT, "1000000", 0)]}
+        else:
+            return 200, {"jsonrpc": "2.0", "id": body.get("id"), "error": {"code": -32601, "message": "method not found"}}
+        return 200, {"jsonrpc": "2.0", "id": body.get("id"), "result": result}
+
+    def _hyperliquid(self, method, path, query, body):
+        kind = (body or {}).get("type")
+        if kind == "allMids":
+            return 200, {"BTC": "60000.0", "ETH": "3000.0", "HYPE": "30.0", "@107": "30.1"}
+        if kind == "spotMeta":
+            return 200, {
+                "tokens": [{"name": "USDC", "index": 0}, {"name": "HYPE", "index": 150}],
+                "universe": [{"name": "@107", "tokens": [150, 0], "index": 107}],
+            }
+        if kind == "clearinghouseState":
+            return 200, {"withdrawable": "1250.0", "marginSummary": {"accountValue": "1250.0"}, "assetPositions": []}
+        if kind == "spotClearinghouseState":
+            return 200, {"balances": [{"coin": "USDC", "total": "500.0"}, {"coin": "HYPE", "total": "12.5"}]}
+        if kind == "subAccounts":
+            return 200, None
+        return 422, {"error": f"unknown info type {kind!r}"}
+
+    def _jupiter(self, method, path, query, body):
+        ids = ",".join(query.get("ids", [])).split(",")
+        return 200, {mint: {"usdPrice": JUPITER_PRICES[mint], "decimals": 6} for mint in ids if mint in JUPITER_PRICES}
+
+    def _defillama(self, method, path, query, body):
+        # GET /prices/current/{chain:address,...}
+        coins = path.rsplit("/", 1)[-1].split(",")
+        return 200, {"coins": {c: {"price": 1.0, "symbol": "TKN", "decimals": 6, "confidence": 0.99} for c in coins if ":" in c}}
+
+    def _coingecko(self, method, path, query, body):
+        if path.endswith("/simple/price"):
+            ids = ",".join(query.get("ids", [])).split(",")
+            return 200, {i: {"usd": COINGECKO_PRICES[i]} for i in ids if i in COINGECKO_PRICES}
+        if "/simple/token_price/" in path:
+            contracts = ",".join(query.get("contract_addresses", [])).split(",")
+            return 200, {c.lower(): {"usd": 1.0} for c in contracts if c}
+        return 404, {"error": "not found"}
+
+    def _diadata(self, method, path, query, body):
+        return 200, {"Symbol": "HYPE", "Price": 30.0}
+
+    def _token_list(self, method, path, query, body):
+        return 200, {
+            "tokens": [
+                {"address": SOL_MINT, "symbol": "SOL", "name": "Wrapped SOL"},
+                {"address": USDC_MINT, "symbol": "USDC", "name": "USD Coin"},
+            ]
+        }
+
+    def _exchange(self, method, path, query, body):
+        if path == "/balance":
+            return 200, {"total": EXCHANGE_BALANCE}
+        if path == "/markets":
+            return 200, [{"symbol": s, "base": s.split("/")[0], "quote": s.split("/")[1]} for s in EXCHANGE_TICKERS]
+        if path == "/tickers":
+            return 200, {s: {"symbol": s, "last": p} for s, p in EXCHANGE_TICKERS.items()}
+        if path.startswith("/ticker/"):
+            symbol = path[len("/ticker/"):].replace("-", "/")
+            if symbol in EXCHANGE_TICKERS:
+                return 200, {"symbol": symbol, "last": EXCHANGE_TICKERS[symbol]}
+            return 400, {"error": f"bad symbol {symbol}"}
+        return 404, {"error": "not found"}
+
+
+def add_profile_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="base latency of every upstream (default 50)")
+    parser.add_argument("--jitter-ms", type=float, default=20.0, help="uniform +/- jitter (default 20)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of calls answered with 503")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction of calls answered with 429")
+    parser.add_argument(
+        "--service",
+        action="append",
+        default=[],
+        metavar="NAME:KEY=VALUE,...",
+        help=f"per-service override, e.g. evm_rpc:latency_ms=200,error_rate=0.05 (services: {', '.join(SERVICES)})",
+    )
+
+
+def profiles_from_args(args: argparse.Namespace) -> tuple[ServiceProfile, dict[str, dict]]:
+    default = ServiceProfile(args.latency_ms, args.jitter_ms, args.error_rate, args.rate_limit_rate)
+    overrides: dict[str, dict] = {}
+    for spec in args.service:
+        service, values = parse_service_override(spec)
+        overrides.setdefault(service, {}).update(values)
+    return default, overrides
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve local stand-ins for all upstream APIs.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--seed", type=int, default=0)
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    default, overrides = profiles_from_args(args)
+
+    import uvicorn
+
+    uvicorn.run(MockUpstreams(default, overrides, args.seed), host=args.host, port=args.port, log_level="warning", access_log=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -98,7 +98,7 @@ export const profiles = {
     const blob = await res.blob()
     const disp = res.headers.get('Content-Disposition')
     const match = disp?.match(/filename="?([^";]+)"?/)
-    const filename = match ? match[1].trim() : `profile-${suggestedName.replace(/\s+/g, '-')}.json`
+    const filename = match ? match[1].trim() : `profile-${suggestedName.replace(/\s+/g, '-')}.ndjson`
     const url = URL.createObjectURL(blob)
     const a = document.createElement('a')
     a.href = url
@@ -153,6 +153,13 @@ export const accounts = {
         throw e;
       });
   },
+  /** Balances for many accounts in one request; errors are reported per account. */
+  balancesBatch: (ids: number[], options?: RequestInit) =>
+    api<AccountBalancesResponse[]>('/accounts/balances', {
+      method: 'POST',
+      body: JSON.stringify({ account_ids: ids }),
+      ...options,
+    }),
   create: (body: AccountCreate) =>
     api<AccountSummary>('/accounts', {
       method: 'POST',
@@ -180,6 +187,9 @@ export const portfolio = {
         throw e;
       });
   },
+  /** Server-side totals by asset, chain, account type and provider. */
+  summary: (refresh = false) =>
+    api<PortfolioSummary>(`/portfolio/summary${refresh ? '?refresh=true' : ''}`),
 };
 
 export interface ProfileSummary {
@@ -222,6 +232,25 @@ export interface PortfolioAccount {
   error: string | null;
 }
 
+export interface PortfolioSummaryRow {
+  key: string;
+  usd_value: number;
+  accounts: number;
+  /** Only for by_asset rows */
+  amount?: number;
+}
+
+export interface PortfolioSummary {
+  total_usd: number;
+  accounts: number;
+  accounts_with_errors: number;
+  unpriced_balances: number;
+  by_asset: PortfolioSummaryRow[];
+  by_chain: PortfolioSummaryRow[];
+  by_type: PortfolioSummaryRow[];
+  by_provider: PortfolioSummaryRow[];
+}
+
 export interface AccountBalancesResponse {
   id: number;
   balances: BalanceItem[];
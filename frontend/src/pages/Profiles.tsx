@@ -92,11 +92,11 @@ export default function Profiles() {
 
       <section className="section">
         <h2>Import profile</h2>
-        <p className="muted small">Upload a previously exported .json file. Use the same app setup (ENCRYPTION_KEY) for credentials to work.</p>
+        <p className="muted small">Upload a previously exported .ndjson (or older .json) file. Use the same app setup (ENCRYPTION_KEY) for credentials to work.</p>
         <input
           ref={fileInputRef}
           type="file"
-          accept=".json"
+          accept=".ndjson,.json"
           onChange={handleImport}
           style={{ display: 'none' }}
         />
@@ -1,5 +1,5 @@
 /**
- * Detect wallet address type from string (Bitcoin, EVM, Solana).
+ * Detect wallet address type from string (Bitcoin address/xpub/descriptor, EVM, Solana).
  * Used to auto-set chain when user pastes or types an address.
  */
 
@@ -9,6 +9,9 @@ const EVM_REGEX = /^0x[a-fA-F0-9]{40}$/
 const BITCOIN_BECH32_REGEX = /^bc1[a-z0-9]{39,59}$/
 const BITCOIN_LEGACY_REGEX = /^[13][a-km-zA-HJ-NP-Z1-9]{25,34}$/
 const BASE58_REGEX = /^[1-9A-HJ-NP-Za-km-z]+$/
+/** Bitcoin HD wallet: extended public key (xpub/ypub/zpub) or single-key output descriptor. */
+const BITCOIN_XPUB_REGEX = /^[xyz]pub[1-9A-HJ-NP-Za-km-z]{100,112}$/
+const BITCOIN_DESCRIPTOR_REGEX = /^(pkh|wpkh|sh\(wpkh|tr)\(.*[xyz]pub.*\)(#[a-z0-9]{8})?$/
 
 export function detectAddressType(input: string): DetectedAddressType {
   const s = input.trim()
@@ -17,6 +20,7 @@ export function detectAddressType(input: string): DetectedAddressType {
   if (EVM_REGEX.test(s)) return 'ethereum'
   if (BITCOIN_BECH32_REGEX.test(s)) return 'bitcoin'
   if (BITCOIN_LEGACY_REGEX.test(s)) return 'bitcoin'
+  if (BITCOIN_XPUB_REGEX.test(s) || BITCOIN_DESCRIPTOR_REGEX.test(s)) return 'bitcoin'
   if (s.length >= 32 && s.length <= 44 && BASE58_REGEX.test(s)) return 'solana'
 
   return null